@@ -0,0 +1,127 @@
+# ble_scanner.py
+# Continuous BLE discovery of Meshtastic radios. Devices are reported as soon as
+# they advertise and kept in a cache, saved in the data directory, so the device
+# list is filled instantly, after a restart too.
+
+import json
+import logging
+import os
+import time
+
+from meshtastic_mac_client.core.paths import user_data_dir
+from meshtastic_mac_client.core.update_dispatcher import DEVICE
+
+logger = logging.getLogger(__name__)
+
+# GATT service every Meshtastic radio advertises
+MESHTASTIC_SERVICE_UUID = "6ba1b218-15a8-461f-9fa8-5dcae273eafd"
+# Devices not seen for this long are dropped from the saved cache
+REMEMBER_FOR = 30 * 86400
+
+class DiscoveredDevice:
+    __slots__ = ('name', 'address', 'rssi', 'last_seen')
+
+    def __init__(self, name, address, rssi, last_seen):
+        self.name = name
+        self.address = address
+        self.rssi = rssi
+        self.last_seen = last_seen
+
+
+class BleScanner:
+    """
+    Wraps a BleakScanner running in the background with a detection callback.
+
+    Only advertisements carrying the Meshtastic service UUID are kept. Each
+    detection updates the cache (RSSI, last seen) and is posted to the
+    dispatcher as a DEVICE event keyed by address, so a chatty device costs at
+    most one UI update per frame. The cache is saved to `cache_path` when a
+    new device is found and when scanning stops; devices loaded from it are
+    listed (without RSSI) until they advertise again.
+    """
+
+    def __init__(self, dispatcher, stale_after=120.0, cache_path=None):
+        self.dispatcher = dispatcher
+        self.stale_after = stale_after  # Devices not seen for this long are hidden
+        self.cache_path = cache_path or os.path.join(user_data_dir(), "ble_devices.json")
+        self.cache = {}                 # address -> DiscoveredDevice
+        self._remembered = set()        # Addresses loaded from cache_path, not seen since
+        self._scanner = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                saved = json.load(f)
+            for entry in saved:
+                address = entry['address']
+                self.cache[address] = DiscoveredDevice(entry['name'], address, None, entry['last_seen'])
+                self._remembered.add(address)
+        except Exception as e:
+            logger.error(f"Failed to read BLE device cache {self.cache_path}: {e}")
+
+    def save(self):
+        cutoff = time.time() - REMEMBER_FOR
+        saved = [{'name': d.name, 'address': d.address, 'last_seen': d.last_seen}
+                 for d in self.cache.values() if d.last_seen >= cutoff]
+        try:
+            with open(self.cache_path, "w") as f:
+                json.dump(saved, f)
+        except Exception as e:
+            logger.error(f"Failed to save BLE device cache {self.cache_path}: {e}")
+
+    @property
+    def is_running(self):
+        return self._scanner is not None
+
+    async def start(self):
+        if self._scanner is not None:
+            return
+        # Imported here: bleak is only needed once the user scans
+        from bleak import BleakScanner
+        # The UUID filter is applied by the OS where supported (required on macOS)
+        self._scanner = BleakScanner(detection_callback=self._on_detection,
+                                     service_uuids=[MESHTASTIC_SERVICE_UUID])
+        try:
+            await self._scanner.start()
+            logger.info("Background BLE scan started")
+        except Exception:
+            self._scanner = None
+            raise
+
+    async def stop(self):
+        scanner, self._scanner = self._scanner, None
+        if scanner is None:
+            return
+        try:
+            await scanner.stop()
+            logger.info("Background BLE scan stopped")
+        except Exception as e:
+            logger.warning(f"Stopping BLE scan failed: {e}")
+        self.save()
+
+    def _on_detection(self, device, advertisement_data):
+        uuids = [u.lower() for u in (advertisement_data.service_uuids or [])]
+        if MESHTASTIC_SERVICE_UUID not in uuids:
+            return
+        name = advertisement_data.local_name or device.name or device.address
+        found = self.cache.get(device.address)
+        new = found is None
+        if new:
+            found = self.cache[device.address] = DiscoveredDevice(name, device.address, None, None)
+            logger.info(f"Found Meshtastic device {name} ({device.address})")
+        self._remembered.discard(device.address)
+        found.name = name
+        found.rssi = advertisement_data.rssi
+        found.last_seen = time.time()
+        if new:
+            self.save()
+        self.dispatcher.post(DEVICE, device.address, found)
+
+    def devices(self):
+        """Devices seen recently, strongest signal first, then saved ones not seen yet this run."""
+        cutoff = time.time() - self.stale_after
+        listed = [d for d in self.cache.values() if d.last_seen >= cutoff or d.address in self._remembered]
+        return sorted(listed, key=lambda d: d.rssi if d.rssi is not None else -999, reverse=True)
@@ -0,0 +1,100 @@
+# connection_supervisor.py
+# Brings dropped radios back without user action.
+
+import asyncio
+import logging
+import random
+import time
+
+from meshtastic_mac_client.core.radio import LOST, DISCONNECTED
+from meshtastic_mac_client.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class ConnectionSupervisor:
+    """
+    Reconnects radios that dropped.
+
+    A radio is considered dropped when the library publishes
+    meshtastic.connection.lost for it, or when the periodic health check finds
+    its interface no longer connected (BLE links can die silently). Retries
+    wait base_delay * 2**attempt, capped at max_delay and scaled by a random
+    factor so several gateways that lost the same link don't retry in lockstep.
+    """
+
+    def __init__(self, manager, base_delay=1.0, max_delay=60.0, health_interval=10.0):
+        self.manager = manager
+        self.loop = manager.loop
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.health_interval = health_interval
+        self._tasks = {}          # radio name -> reconnect task
+        self._health_task = None
+
+    def start(self):
+        if self._health_task is None or self._health_task.done():
+            self._health_task = self.loop.create_task(self._health_loop())
+
+    def stop(self):
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        for name in list(self._tasks):
+            self.cancel(name)
+
+    def cancel(self, name):
+        """Stop reconnecting a radio (e.g. the user disconnected it)."""
+        task = self._tasks.pop(name, None)
+        if task and not task.done():
+            task.cancel()
+
+    def is_reconnecting(self, name):
+        task = self._tasks.get(name)
+        return task is not None and not task.done()
+
+    def backoff(self, attempt):
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def radio_lost(self, radio):
+        """Called on the loop thread when a connected radio drops."""
+        if radio.state == DISCONNECTED or self.is_reconnecting(radio.name):
+            return
+        radio.drops += 1
+        radio.mark_down()
+        # Nodes not heard after our last packet from this radio are already up to date
+        radio.resync_since = radio.last_heard or radio.connected_at
+        metrics.incr("radio_drops", radio=radio.name)
+        self.manager._set_state(radio, LOST)
+        self._tasks[radio.name] = self.loop.create_task(self._reconnect(radio))
+
+    async def _reconnect(self, radio):
+        lost_at = time.monotonic()
+        await self.manager._release_client(radio)
+
+        attempt = 0
+        while radio.state != DISCONNECTED:
+            delay = self.backoff(attempt)
+            attempt += 1
+            logger.info(f"Reconnecting {radio.name} in {delay:.1f}s (attempt {attempt})")
+            await asyncio.sleep(delay)
+            if radio.state == DISCONNECTED:
+                break
+            # Retries stay LOST rather than flickering through CONNECTING
+            if await self.manager._open(radio, retry=True):
+                radio.reconnects += 1
+                metrics.incr("radio_reconnects", radio=radio.name)
+                metrics.observe("radio.reconnect", time.monotonic() - lost_at)
+                logger.info(f"Reconnected {radio.name} after {time.monotonic() - lost_at:.1f}s")
+                break
+        self._tasks.pop(radio.name, None)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for radio in self.manager.connected_radios():
+                # MeshInterface keeps a threading.Event that is cleared when the link dies
+                flag = getattr(radio.client, 'isConnected', None)
+                if flag is not None and hasattr(flag, 'is_set') and not flag.is_set():
+                    logger.warning(f"Radio {radio.name} stopped responding")
+                    self.radio_lost(radio)
@@ -1,22 +1,98 @@
 # database.py
 
 import sqlite3
+import calendar
+import math
 import os
+import queue
+import threading
+import time
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
+
+from meshtastic_mac_client.core.metrics import metrics
+from meshtastic_mac_client.core.migrations import migrate, pending_backfills
+from meshtastic_mac_client.core.paths import default_db_path
 
 logger = logging.getLogger(__name__)
 
+# Sentinel placed on the write queue to stop the writer thread
+_STOP = object()
+
+# Seconds a writer commit waits for a lock held by another connection
+WRITER_BUSY_TIMEOUT = 120.0
+
+# close() waits this long plus a little per queued write for the writer to finish
+CLOSE_MIN_TIMEOUT = 2.0
+CLOSE_SECONDS_PER_WRITE = 0.001
+
+# Columns of the telemetry table that can be queried as a time series
+TELEMETRY_METRICS = ('battery_level', 'voltage', 'rssi', 'snr', 'channel_utilization', 'air_util_tx')
+
+# Node columns written by save_node(); an update only touches the ones that changed
+NODE_COLUMNS = ('short_name', 'long_name', 'snr', 'battery', 'last_heard', 'position_lat', 'position_lon', 'source')
+
+# Tables whose rows carry a change sequence (see get_changes_since), with their key
+# column and its Python type (deleted_rows.row_id stores every key as text)
+CHANGE_TRACKED = {'nodes': ('id', str), 'messages': ('id', int)}
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters (haversine)."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * 6371000.0 * math.asin(min(1.0, math.sqrt(a)))
+
 class DatabaseManager:
-    def __init__(self, db_path="meshtastic.db"):
-        self.db_path = db_path
+    def __init__(self, db_path=None, batch_size=200, flush_interval=0.25, max_queue=10000,
+                 position_min_distance=25.0, position_min_interval=300.0):
+        self.db_path = db_path or default_db_path()
+        self.batch_size = batch_size          # Commit after this many queued writes...
+        self.flush_interval = flush_interval  # ...or after this many seconds, whichever comes first
+
+        # Track decimation: a position is stored only if the node moved at least
+        # position_min_distance meters or position_min_interval seconds passed
+        self.position_min_distance = position_min_distance
+        self.position_min_interval = position_min_interval
+        self._last_position = {}              # node_id -> (time, lat, lon) of the last stored point, or None
+        self._position_lock = threading.Lock()
+        self.has_fts = False                  # Set by init_db if SQLite was built with FTS5
+        self.schema_version = 0               # PRAGMA user_version after init_db's migrations
+        self._backfills_done = set()
         self.init_db()
 
+        # One long-lived connection for reads from the UI/event loop thread.
+        # WAL mode lets it read while the writer thread holds a transaction.
+        self._read_conn = self._connect()
+        self._read_lock = threading.Lock()
+
+        # Writes are funnelled through a bounded queue into a single writer thread so
+        # pubsub callbacks never wait on a commit/fsync.
+        self.max_queue = max_queue
+        self._write_queue = queue.Queue(maxsize=max_queue)
+        self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self._writer.start()
+        metrics.gauge("db_write_queue", self._write_queue.qsize)
+
+    def _connect(self, timeout=5.0):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=timeout)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across application crashes in WAL mode and skips an fsync per commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
     def init_db(self):
-        """Initialize SQLite tables."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+        """
+        Create the baseline schema, then apply pending migrations (see
+        migrations.py). Schema changes go in a new migration, not here.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            # Only takes effect on a new, empty database; Maintenance converts older ones
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
                 CREATE TABLE IF NOT EXISTS messages (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     node_id TEXT,
@@ -26,7 +102,7 @@ class DatabaseManager:
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
-            cursor.execute('''
+            conn.execute('''
                 CREATE TABLE IF NOT EXISTS nodes (
                     id TEXT PRIMARY KEY,
                     short_name TEXT,
@@ -39,24 +115,139 @@ class DatabaseManager:
                 )
             ''')
             conn.commit()
+            self.schema_version = migrate(conn)
+            # Created by a migration unless SQLite lacks FTS5
+            self.has_fts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+            ).fetchone() is not None
+        finally:
+            conn.close()
+
+    # --- Background writer ---
+
+    def _execute(self, sql, params=()):
+        """Queue a write for the writer thread. Blocks only if the queue is full."""
+        self._write_queue.put((sql, params))
+
+    def _writer_loop(self):
+        # Waits out a maintenance VACUUM (see Maintenance._convert) rather than dropping the batch
+        conn = self._connect(timeout=WRITER_BUSY_TIMEOUT)
+        stopping = False
+        while not stopping:
+            item = self._write_queue.get()
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+
+            # Group commit: keep draining until the batch is full or the interval elapses;
+            # a flush() waiter commits what is queued right away
+            while len(batch) < self.batch_size and item is not _STOP and not isinstance(item, threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._write_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            waiters = []
+            start = time.perf_counter()
+            try:
+                with conn:
+                    for item in batch:
+                        if item is _STOP:
+                            stopping = True
+                        elif isinstance(item, threading.Event):
+                            waiters.append(item)
+                        else:
+                            sql, params = item
+                            try:
+                                conn.execute(sql, params)
+                            except sqlite3.Error as e:
+                                logger.error(f"Database write failed: {e}")
+            except sqlite3.Error as e:
+                logger.error(f"Database commit failed: {e}")
+            finally:
+                metrics.observe("db.commit", time.perf_counter() - start)
+                metrics.incr("db_writes", len(batch))
+                for event in waiters:
+                    event.set()
+                for _ in batch:
+                    self._write_queue.task_done()
+        conn.close()
+
+    def flush(self, timeout=5.0):
+        """Block until every write queued so far has been committed."""
+        if not self._writer.is_alive():
+            return True
+        done = threading.Event()
+        self._write_queue.put(done)
+        return done.wait(timeout)
 
-    def save_message(self, node_id, role, payload, channel):
+    def shutdown_timeout(self, pending=None):
+        """Seconds close() allows for committing `pending` queued writes (default: the current queue)."""
+        if pending is None:
+            pending = self._write_queue.qsize()
+        return CLOSE_MIN_TIMEOUT + pending * CLOSE_SECONDS_PER_WRITE
+
+    def close(self, timeout=None):
+        """
+        Flush pending writes, stop the writer thread and close connections.
+        `timeout` defaults to shutdown_timeout(). Returns False, after logging
+        how many writes were left uncommitted, if the writer did not finish in time.
+        """
+        finished = True
+        if self._writer.is_alive():
+            timeout = self.shutdown_timeout() if timeout is None else timeout
+            deadline = time.monotonic() + timeout
+            try:
+                self._write_queue.put(_STOP, timeout=timeout)
+                self._writer.join(max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                pass
+            if self._writer.is_alive():
+                finished = False
+                logger.error(f"Database writer did not finish within {timeout:.1f}s; "
+                             f"{self._write_queue.qsize()} queued writes were not committed")
+        with self._read_lock:
+            self._read_conn.close()
+        return finished
+
+    def _query(self, sql, params=()):
+        with metrics.timer("db.query"), self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    # --- Writes ---
+
+    def save_message(self, node_id, role, payload, channel, status=None, local_id=None, source=None,
+                     packet_id=None):
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO messages (node_id, role, payload, channel)
-                    VALUES (?, ?, ?, ?)
-                ''', (node_id, role, payload, channel))
-                conn.commit()
+            self._execute('''
+                INSERT INTO messages (node_id, role, payload, channel, status, local_id, source, time, packet_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (node_id, role, payload, channel, status, local_id, source, time.time(), packet_id))
         except Exception as e:
             logger.error(f"Failed to save message: {e}")
 
-    def save_node(self, node):
-        """Save or update node info using dictionary-safe lookups."""
+    def update_message_status(self, local_id, status, packet_id=None):
+        """Record the delivery state of an outgoing message."""
+        try:
+            self._execute('''
+                UPDATE messages SET status = ?, packet_id = COALESCE(?, packet_id)
+                WHERE local_id = ?
+            ''', (status, packet_id, local_id))
+        except Exception as e:
+            logger.error(f"Failed to update message status: {e}")
+
+    def save_node(self, node, source=None):
+        """
+        Save or update node info using dictionary-safe lookups; source is the radio
+        that reported it. Fields missing from `node` keep their stored values and a
+        row whose values did not change is not rewritten.
+        """
         user = node.get('user', {})
         node_id = user.get('id')
-        
+
         if not node_id:
             return # Skip nodes with no ID yet
 
@@ -65,59 +256,357 @@ class DatabaseManager:
         lat = pos.get('latitude')
         lon = pos.get('longitude')
 
+        # When the radio last heard the node (not when we were told about it)
+        last_heard = node.get('lastHeard')
+        last_heard = datetime.fromtimestamp(last_heard) if last_heard else datetime.now()
+
+        device_metrics = node.get('deviceMetrics') or node.get('device_metrics') or {}
+        battery = device_metrics.get('batteryLevel', device_metrics.get('battery_level'))
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR REPLACE INTO nodes
-                    (id, short_name, long_name, snr, battery, last_heard, position_lat, position_lon)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    node_id,
-                    user.get('shortName'),
-                    user.get('longName'),
-                    node.get('snr', 0),
-                    node.get('device_metrics', {}).get('battery_level'),
-                    datetime.now().isoformat(),
-                    lat,
-                    lon
-                ))
-                conn.commit()
+            updates = ", ".join(f"{c} = COALESCE(excluded.{c}, nodes.{c})" for c in NODE_COLUMNS if c != 'last_heard')
+            changed = " OR ".join(f"(excluded.{c} IS NOT NULL AND excluded.{c} IS NOT nodes.{c})"
+                                  for c in NODE_COLUMNS if c != 'last_heard')
+            changed += " OR excluded.last_heard > COALESCE(nodes.last_heard, '')"
+            self._execute(f'''
+                INSERT INTO nodes (id, {', '.join(NODE_COLUMNS)})
+                VALUES (?, {', '.join('?' * len(NODE_COLUMNS))})
+                ON CONFLICT (id) DO UPDATE SET {updates},
+                    last_heard = MAX(excluded.last_heard, COALESCE(nodes.last_heard, ''))
+                WHERE {changed}
+            ''', (
+                node_id,
+                user.get('shortName'),
+                user.get('longName'),
+                node.get('snr'),
+                battery,
+                last_heard.isoformat(),
+                lat,
+                lon,
+                source
+            ))
         except Exception as e:
             logger.error(f"Error saving node {node_id}: {e}")
 
+    def save_position(self, node_id, timestamp, lat, lon, altitude=None, snr=None, rssi=None, source=None):
+        """
+        Append a track point unless it is within position_min_distance meters and
+        position_min_interval seconds of the node's last stored point.
+        Returns True if the point was stored.
+        """
+        if not node_id or lat is None or lon is None:
+            return False
+        timestamp = timestamp or time.time()
+        if node_id not in self._last_position:
+            # First point since startup: compare with the stored track, so the NodeDB
+            # replay on connect doesn't store each node's last fix again
+            stored = self._newest_position(node_id)
+            with self._position_lock:
+                self._last_position.setdefault(node_id, stored)
+        with self._position_lock:
+            last = self._last_position.get(node_id)
+            if last is not None:
+                last_time, last_lat, last_lon = last
+                if (abs(timestamp - last_time) < self.position_min_interval
+                        and distance_m(last_lat, last_lon, lat, lon) < self.position_min_distance):
+                    return False
+            self._last_position[node_id] = (timestamp, lat, lon)
+        try:
+            self._execute('''
+                INSERT INTO node_positions (node_id, time, lat, lon, altitude, snr, rssi, source)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (node_id, timestamp, lat, lon, altitude, snr, rssi, source))
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save position for {node_id}: {e}")
+            return False
+
+    def _newest_position(self, node_id):
+        """(time, lat, lon) of a node's newest stored track point, or None."""
+        try:
+            rows = self._query('''
+                SELECT time, lat, lon FROM node_positions WHERE node_id = ?
+                ORDER BY time DESC LIMIT 1
+            ''', (node_id,))
+        except Exception as e:
+            logger.error(f"Failed to load the last position of {node_id}: {e}")
+            return None
+        return tuple(rows[0]) if rows else None
+
+    def save_telemetry(self, node_id, metrics, timestamp=None, source=None):
+        """Store one telemetry sample. `metrics` maps TELEMETRY_METRICS names to values."""
+        if not node_id:
+            return
+        try:
+            self._execute(f'''
+                INSERT INTO telemetry (node_id, timestamp, source, {', '.join(TELEMETRY_METRICS)})
+                VALUES (?, ?, ?, {', '.join('?' * len(TELEMETRY_METRICS))})
+            ''', (
+                node_id,
+                timestamp or time.time(),
+                source,
+                *(metrics.get(m) for m in TELEMETRY_METRICS)
+            ))
+        except Exception as e:
+            logger.error(f"Failed to save telemetry for {node_id}: {e}")
+
+    # --- Reads ---
+
     def get_all_nodes(self):
-        """Fetch all nodes for the Manager cache."""
-        nodes = {}
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM nodes")
-                for row in cursor.fetchall():
-                    nodes[row['id']] = {
-                        'id': row['id'],
-                        'user': {
-                            'longName': row['long_name'],
-                            'shortName': row['short_name'],
-                            'id': row['id']
-                        },
-                        'snr': row['snr'],
-                        'position_lat': row['position_lat'],
-                        'position_lon': row['position_lon']
-                    }
+        """Fetch all node rows for the manager's NodeRegistry (see NodeRegistry.preload)."""
+        try:
+            return self._query("SELECT * FROM nodes")
         except Exception as e:
             logger.error(f"Error loading nodes: {e}")
-        return nodes
+            return []
+
+    def get_changes_since(self, seq, tables=None, limit=1000):
+        """
+        Rows inserted, updated or deleted after change sequence `seq`:
+        {'seq': ..., 'more': bool, <table>: [rows], 'deleted': {<table>: [ids]}}
+        for the tables in CHANGE_TRACKED (or just `tables`). Pass the returned
+        seq on the next call; at most `limit` rows per table come back, and
+        'more' says there is more to fetch. Served from the change_seq indexes,
+        so polling an idle database costs a few index lookups.
+
+        Messages stored before change tracking existed are numbered by a
+        background backfill (migrations.MESSAGES_CHANGE_SEQ), below every live
+        change; a consumer of message changes should start over from 0 once it
+        has finished.
+        """
+        tables = tables or list(CHANGE_TRACKED)
+        result = {'seq': seq, 'more': False, 'deleted': {t: [] for t in tables}}
+        try:
+            with metrics.timer("db.changes"), self._read_lock:
+                conn = self._read_conn
+                conn.execute("BEGIN")   # One snapshot across all the queries below
+                try:
+                    upto = conn.execute("SELECT seq FROM change_counter WHERE id = 0").fetchone()[0]
+                    for table in tables:
+                        rows = conn.execute(f'''
+                            SELECT * FROM {table} WHERE change_seq > ? AND change_seq <= ?
+                            ORDER BY change_seq LIMIT ?
+                        ''', (seq, upto, limit)).fetchall()
+                        if len(rows) == limit:
+                            upto, result['more'] = rows[-1]['change_seq'], True
+                        result[table] = rows
+                    deleted = conn.execute(f'''
+                        SELECT seq, table_name, row_id FROM deleted_rows
+                        WHERE seq > ? AND seq <= ? AND table_name IN ({', '.join('?' * len(tables))})
+                        ORDER BY seq LIMIT ?
+                    ''', (seq, upto, *tables, limit)).fetchall()
+                    if len(deleted) == limit:
+                        upto, result['more'] = deleted[-1]['seq'], True
+                finally:
+                    conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Error fetching changes since {seq}: {e}")
+            return result
+
+        # A later, truncated query may have moved `upto` down; the rest comes next call
+        for table in tables:
+            result[table] = [r for r in result[table] if r['change_seq'] <= upto]
+        for row in deleted:
+            if row['seq'] <= upto:
+                # Same type as the key of the rows served above
+                key_type = CHANGE_TRACKED[row['table_name']][1]
+                result['deleted'][row['table_name']].append(key_type(row['row_id']))
+        result['seq'] = upto
+        return result
 
     def get_nodes(self):
         """Fetch all nodes as rows for the UI list."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute('SELECT * FROM nodes ORDER BY last_heard DESC')
-                return cursor.fetchall()
+            return self._query('SELECT * FROM nodes ORDER BY last_heard DESC')
         except Exception as e:
             logger.error(f"Error fetching nodes for list: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def get_messages_page(self, channel, before_id=None, limit=100):
+        """
+        Fetch one page of a channel's history, oldest first.
+
+        Pages are keyed on (channel, id): pass the smallest id already shown as
+        `before_id` to get the page before it. Cost does not depend on history size.
+        """
+        try:
+            if before_id is None:
+                rows = self._query('''
+                    SELECT * FROM messages WHERE channel = ?
+                    ORDER BY id DESC LIMIT ?
+                ''', (channel, limit))
+            else:
+                rows = self._query('''
+                    SELECT * FROM messages WHERE channel = ? AND id < ?
+                    ORDER BY id DESC LIMIT ?
+                ''', (channel, before_id, limit))
+            return rows[::-1]
+        except Exception as e:
+            logger.error(f"Error fetching messages for channel {channel}: {e}")
+            return []
+
+    def _backfilled(self, name):
+        """True once the named migration backfill (see migrations.py) has finished."""
+        if name not in self._backfills_done:
+            with self._read_lock:
+                if name not in pending_backfills(self._read_conn):
+                    self._backfills_done.add(name)
+        return name in self._backfills_done
+
+    def search_messages(self, query, channel=None, node_id=None, since=None, limit=50):
+        """
+        Full-text search over stored messages, best matches first.
+
+        `since` is a datetime or an ISO 8601 string ('2025-01-01', '2025-01-01 12:00:00');
+        without a timezone it is taken as UTC. Each row has
+        id, node_id, role, channel, timestamp and a `snippet` with matches in [brackets].
+        """
+        terms = query.split()
+        if not terms:
+            return []
+
+        filters, params = [], []
+        if channel is not None:
+            filters.append("m.channel = ?")
+            params.append(channel)
+        if node_id is not None:
+            filters.append("m.node_id = ?")
+            params.append(node_id)
+        if since is not None:
+            try:
+                since = since if isinstance(since, datetime) else datetime.fromisoformat(since)
+            except (TypeError, ValueError):
+                logger.error(f"Message search: invalid since {since!r}, expected an ISO 8601 date or time")
+                return []
+            if since.tzinfo is not None:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            since_seconds = calendar.timegm(since.timetuple())
+            if self._backfilled('messages_time'):
+                # Indexed unix seconds (see migrations.MESSAGES_TIME)
+                filters.append("m.time >= ?")
+                params.append(since_seconds)
+            else:
+                filters.append("m.timestamp >= ?")
+                params.append(time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(since_seconds)))
+        where = "".join(f" AND {f}" for f in filters)
+
+        try:
+            # Until older messages are indexed, LIKE is the only search that sees them
+            if self.has_fts and self._backfilled('messages_fts'):
+                # Quote every term so user input can't produce FTS syntax errors;
+                # the last term is a prefix match for search-as-you-type.
+                match = " ".join('"' + t.replace('"', '""') + '"' for t in terms) + "*"
+                return self._query(f'''
+                    SELECT m.id, m.node_id, m.role, m.channel, m.timestamp,
+                           snippet(messages_fts, 0, '[', ']', '...', 12) AS snippet
+                    FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+                    WHERE messages_fts MATCH ?{where}
+                    ORDER BY rank LIMIT ?
+                ''', (match, *params, limit))
+
+            likes = " AND ".join("m.payload LIKE ?" for _ in terms)
+            return self._query(f'''
+                SELECT m.id, m.node_id, m.role, m.channel, m.timestamp, m.payload AS snippet
+                FROM messages m
+                WHERE {likes}{where}
+                ORDER BY m.id DESC LIMIT ?
+            ''', (*(f"%{t}%" for t in terms), *params, limit))
+        except Exception as e:
+            logger.error(f"Message search failed: {e}")
+            return []
+
+    def get_positions(self, node_id, start=None, end=None, limit=None):
+        """A node's track as rows of (time, lat, lon, altitude, snr, rssi), oldest first."""
+        sql = '''
+            SELECT time, lat, lon, altitude, snr, rssi FROM node_positions
+            WHERE node_id = ? AND time >= ? AND time <= ?
+            ORDER BY time
+        '''
+        params = [node_id, start if start is not None else 0, end if end is not None else time.time() + 86400]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        try:
+            return self._query(sql, params)
+        except Exception as e:
+            logger.error(f"Error fetching positions for {node_id}: {e}")
+            return []
+
+    def get_tracks(self, start, end, bbox=None):
+        """
+        Every node's track points in [start, end] as {node_id: [(time, lat, lon), ...]},
+        each list oldest first. bbox = (south, west, north, east) limits the area.
+        """
+        sql = "SELECT node_id, time, lat, lon FROM node_positions WHERE time >= ? AND time <= ?"
+        params = [start, end]
+        if bbox:
+            sql += " AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?"
+            params += [bbox[0], bbox[2], bbox[1], bbox[3]]
+        tracks = {}
+        try:
+            for row in self._query(sql + " ORDER BY node_id, time", params):
+                tracks.setdefault(row['node_id'], []).append((row['time'], row['lat'], row['lon']))
+        except Exception as e:
+            logger.error(f"Error fetching tracks: {e}")
+        return tracks
+
+    def get_signal_grid(self, start, end, cell_deg, bbox=None, metric='snr'):
+        """
+        Track points in [start, end] aggregated into square cells of cell_deg degrees.
+        Rows of (lat, lon, mean, count) with lat/lon the cell's south-west corner;
+        `metric` is 'snr' or 'rssi'.
+        """
+        if metric not in ('snr', 'rssi'):
+            raise ValueError(f"Unknown signal metric: {metric}")
+        # Offset to positive values so the integer cast floors instead of truncating toward zero
+        sql = f'''
+            SELECT CAST((lat + 90.0) / ? AS INTEGER) AS gy,
+                   CAST((lon + 180.0) / ? AS INTEGER) AS gx,
+                   AVG({metric}) AS mean, COUNT(*) AS count
+            FROM node_positions
+            WHERE time >= ? AND time <= ? AND {metric} IS NOT NULL
+        '''
+        params = [cell_deg, cell_deg, start, end]
+        if bbox:
+            sql += " AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?"
+            params += [bbox[0], bbox[2], bbox[1], bbox[3]]
+        sql += " GROUP BY gy, gx"
+        try:
+            return [(row['gy'] * cell_deg - 90.0, row['gx'] * cell_deg - 180.0, row['mean'], row['count'])
+                    for row in self._query(sql, params)]
+        except Exception as e:
+            logger.error(f"Error building signal grid: {e}")
+            return []
+
+    def get_telemetry_nodes(self):
+        """Node IDs that have stored telemetry."""
+        try:
+            return [row['node_id'] for row in self._query('SELECT DISTINCT node_id FROM telemetry ORDER BY node_id')]
+        except Exception as e:
+            logger.error(f"Error fetching telemetry nodes: {e}")
+            return []
+
+    def get_telemetry_buckets(self, node_id, metric, start, end, resolution):
+        """
+        Aggregate one metric for a node into fixed-width time buckets.
+
+        `start`/`end` are unix seconds and `resolution` is the bucket width in seconds.
+        Returns rows of (bucket_start, min, max, mean, count), skipping empty buckets.
+        """
+        if metric not in TELEMETRY_METRICS:
+            raise ValueError(f"Unknown telemetry metric: {metric}")
+        resolution = max(1.0, float(resolution))
+        try:
+            return self._query(f'''
+                SELECT CAST((timestamp - :start) / :res AS INTEGER) * :res + :start AS bucket_start,
+                       MIN({metric}) AS min, MAX({metric}) AS max, AVG({metric}) AS mean,
+                       COUNT({metric}) AS count
+                FROM telemetry
+                WHERE node_id = :node_id AND timestamp >= :start AND timestamp < :end
+                  AND {metric} IS NOT NULL
+                GROUP BY bucket_start
+                ORDER BY bucket_start
+            ''', {'node_id': node_id, 'start': start, 'end': end, 'res': resolution})
+        except Exception as e:
+            logger.error(f"Error querying telemetry for {node_id}: {e}")
+            return []
@@ -0,0 +1,149 @@
+# geo.py
+# Map-side downsampling done in Python before anything is sent to the page:
+# Douglas-Peucker track simplification and per-zoom grid cells.
+
+import math
+
+import numpy as np
+
+# Web Mercator: meters per pixel at zoom 0 on the equator (256 px tiles)
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+def meters_per_pixel(zoom, lat):
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / (2 ** zoom)
+
+def tolerance_deg(zoom, lat, pixels=1.0):
+    """Simplification tolerance in degrees: `pixels` screen pixels at this zoom."""
+    return pixels * meters_per_pixel(zoom, lat) / 111320.0
+
+def cell_size_deg(zoom, cells_per_tile=16):
+    """Grid cell edge in degrees of longitude so one 256 px tile holds cells_per_tile cells across."""
+    return 360.0 / (2 ** zoom) / cells_per_tile
+
+# Segments shorter than this are measured in plain Python; numpy's per-call
+# overhead only pays off on longer runs of points
+_NUMPY_MIN_SEGMENT = 64
+
+def douglas_peucker(points, epsilon):
+    """
+    Simplify a polyline. `points` are sequences whose [1] and [2] are lat/lon
+    (e.g. (time, lat, lon) rows); kept points are returned unchanged, in order.
+    Iterative, so long tracks cannot hit the recursion limit.
+    """
+    n = len(points)
+    if n < 3 or epsilon <= 0:
+        return list(points)
+
+    lat_list = [p[1] for p in points]
+    lon_list = [p[2] for p in points]
+    lat = np.array(lat_list)
+    lon = np.array(lon_list)
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    eps_sq = epsilon * epsilon
+
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ay, ax = lat_list[first], lon_list[first]
+        dy, dx = lat_list[last] - ay, lon_list[last] - ax
+        length_sq = dx * dx + dy * dy
+
+        if last - first > _NUMPY_MIN_SEGMENT:
+            py, px = lat[first + 1:last] - ay, lon[first + 1:last] - ax
+            if length_sq == 0:
+                dist = px * px + py * py
+            else:
+                # Squared distance from the segment (projection clamped to its ends)
+                t = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0)
+                dist = (px - t * dx) ** 2 + (py - t * dy) ** 2
+            i = int(dist.argmax())
+            max_dist, index = float(dist[i]), first + 1 + i
+        else:
+            max_dist, index = -1.0, None
+            for i in range(first + 1, last):
+                py, px = lat_list[i] - ay, lon_list[i] - ax
+                if length_sq == 0:
+                    dist = px * px + py * py
+                else:
+                    t = min(1.0, max(0.0, (px * dx + py * dy) / length_sq))
+                    dist = (px - t * dx) ** 2 + (py - t * dy) ** 2
+                if dist > max_dist:
+                    max_dist, index = dist, i
+
+        if max_dist > eps_sq:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [p for p, k in zip(points, keep) if k]
+
+def radial_filter(points, epsilon):
+    """Drop points closer than epsilon to the previous kept point (cheap O(n) pre-pass)."""
+    if len(points) < 3:
+        return list(points)
+    kept = [points[0]]
+    eps_sq = epsilon * epsilon
+    prev_lat, prev_lon = points[0][1], points[0][2]
+    for p in points[1:-1]:
+        if (p[1] - prev_lat) ** 2 + (p[2] - prev_lon) ** 2 > eps_sq:
+            kept.append(p)
+            prev_lat, prev_lon = p[1], p[2]
+    kept.append(points[-1])
+    return kept
+
+def simplify_track(points, zoom, pixels=1.0):
+    """
+    Radial filter then Douglas-Peucker, both at a tolerance of `pixels` screen
+    pixels for the given zoom.
+    """
+    if len(points) < 3:
+        return list(points)
+    epsilon = tolerance_deg(zoom, points[0][1], pixels)
+    return douglas_peucker(radial_filter(points, epsilon), epsilon)
+
+# --- Slippy map tiles ---
+
+def tile_x(lon, zoom):
+    return int((lon + 180.0) / 360.0 * (2 ** zoom))
+
+def tile_y(lat, zoom):
+    lat = max(-85.0511, min(85.0511, lat))
+    rad = math.radians(lat)
+    return int((1.0 - math.log(math.tan(rad) + 1.0 / math.cos(rad)) / math.pi) / 2.0 * (2 ** zoom))
+
+def tile_lon(x, zoom):
+    return x / (2 ** zoom) * 360.0 - 180.0
+
+def tile_lat(y, zoom):
+    n = math.pi - 2.0 * math.pi * y / (2 ** zoom)
+    return math.degrees(math.atan(math.sinh(n)))
+
+def world_pixel(lat, lon, zoom):
+    """Web Mercator pixel coordinates (256 px tiles) of a point at a zoom level."""
+    lat = max(-85.0511, min(85.0511, lat))
+    rad = math.radians(lat)
+    size = 256.0 * (2 ** zoom)
+    return ((lon + 180.0) / 360.0 * size,
+            (1.0 - math.log(math.tan(rad) + 1.0 / math.cos(rad)) / math.pi) / 2.0 * size)
+
+def tile_range(bbox, zoom, margin=1):
+    """
+    Tiles covering bbox = (south, west, north, east) plus `margin` tiles on each
+    side, as (zoom, x0, y0, x1, y1). Equal ranges mean the same data, so small
+    pans inside the loaded tiles need no new query.
+    """
+    south, west, north, east = bbox
+    last = 2 ** zoom - 1
+    x0 = max(0, tile_x(west, zoom) - margin)
+    x1 = min(last, tile_x(east, zoom) + margin)
+    y0 = max(0, tile_y(north, zoom) - margin)
+    y1 = min(last, tile_y(south, zoom) + margin)
+    return (zoom, x0, y0, x1, y1)
+
+def tile_range_bbox(tiles):
+    """(south, west, north, east) covered by a tile_range()."""
+    zoom, x0, y0, x1, y1 = tiles
+    return (tile_lat(y1 + 1, zoom), tile_lon(x0, zoom), tile_lat(y0, zoom), tile_lon(x1 + 1, zoom))
@@ -0,0 +1,94 @@
+# interfaces.py
+# Creates the radio interface for a connection. Every backend publishes on the
+# same pubsub topics, so MeshtasticManager does not care which one it talks to.
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Interface kinds understood by create_interface()
+BLE = "ble"
+SERIAL = "serial"
+TCP = "tcp"
+SIMULATED = "sim"
+REPLAY = "replay"
+
+# Port meshtasticd and WiFi-enabled radios listen on
+DEFAULT_TCP_PORT = 4403
+
+def parse_tcp_address(address):
+    """
+    'host', 'host:port', '[v6]' or '[v6]:port' -> (host, port). A bare IPv6
+    address (more than one colon, no brackets) is a host on DEFAULT_TCP_PORT.
+    """
+    address = (address or "localhost").strip()
+    if address.startswith("["):
+        host, _, rest = address[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+        return host, int(port) if port.isdigit() else DEFAULT_TCP_PORT
+    if address.count(":") > 1:
+        return address, DEFAULT_TCP_PORT
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        return address, DEFAULT_TCP_PORT
+    return host, int(port)
+
+def find_serial_ports():
+    """
+    Serial ports that look like Meshtastic radios, as (device, description) pairs.
+    Uses the library's USB vendor list, so unrelated serial devices are skipped.
+    """
+    try:
+        from meshtastic.util import findPorts
+        from serial.tools import list_ports
+        descriptions = {p.device: p.description for p in list_ports.comports()}
+        return [(port, descriptions.get(port) or port) for port in findPorts(True)]
+    except Exception as e:
+        logger.error(f"Serial port detection failed: {e}")
+        return []
+
+def _hooked(cls, on_created):
+    """
+    cls, or a subclass that passes each instance to on_created(interface)
+    before the library constructor connects. Interfaces publish their NodeDB
+    while still being constructed, so this is the only way to know which
+    object those events come from.
+    """
+    if on_created is None:
+        return cls
+    class Hooked(cls):
+        def __init__(self, *args, **kwargs):
+            on_created(self)
+            super().__init__(*args, **kwargs)
+    Hooked.__name__ = Hooked.__qualname__ = cls.__name__
+    return Hooked
+
+def create_interface(kind, address=None, on_created=None, **options):
+    """
+    Build and connect an interface. on_created(interface), if given, is
+    called with the new object before it connects (see _hooked).
+
+    ble:    address is the BLE device address
+    serial: address is the port (e.g. /dev/cu.usbserial-0001); None auto-detects
+    tcp:    address is "host", "host:port" or "[v6]:port" (default port 4403), e.g. meshtasticd
+    sim:    options are passed to SimulatedInterface (node_count, packets_per_second, ...)
+    replay: address is a file written by PacketRecorder; options: speed, repeat
+    """
+    if kind == BLE:
+        # Imported here: the meshtastic BLE stack is slow to import and not needed to show the UI
+        from meshtastic.ble_interface import BLEInterface
+        return _hooked(BLEInterface, on_created)(address=address, noProto=False)
+    if kind == SERIAL:
+        from meshtastic.serial_interface import SerialInterface
+        return _hooked(SerialInterface, on_created)(devPath=address)
+    if kind == TCP:
+        from meshtastic.tcp_interface import TCPInterface
+        host, port = parse_tcp_address(address)
+        return _hooked(TCPInterface, on_created)(hostname=host, portNumber=port)
+    if kind == SIMULATED:
+        from meshtastic_mac_client.core.simulator import SimulatedInterface
+        return _hooked(SimulatedInterface, on_created)(**options)
+    if kind == REPLAY:
+        from meshtastic_mac_client.core.simulator import ReplayInterface
+        return _hooked(ReplayInterface, on_created)(address, **options)
+    raise ValueError(f"Unknown interface kind: {kind}")
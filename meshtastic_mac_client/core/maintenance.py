@@ -0,0 +1,356 @@
+# maintenance.py
+# Background upkeep of the database: migration backfills, retention (old rows
+# are archived, then deleted), incremental vacuum and planner statistics. Runs on its own thread
+# and connection, in small transactions, so the writer thread and the UI only
+# ever wait for one chunk.
+
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from meshtastic_mac_client.core.metrics import metrics
+from meshtastic_mac_client.core.migrations import pending_backfills, run_backfills
+from meshtastic_mac_client.core.paths import archive_dir, user_data_dir
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+# How each table can be pruned: the column rows age by, how that column stores
+# time, the column that orders rows for count limits, and whether pruned rows
+# are archived. Time kinds: 'utc_text' (SQLite CURRENT_TIMESTAMP),
+# 'unix' (seconds), 'local_iso' (datetime.isoformat() in local time).
+TABLES = {
+    'messages': {'time': 'timestamp', 'kind': 'utc_text', 'order': 'id', 'archive': True},
+    'telemetry': {'time': 'timestamp', 'kind': 'unix', 'order': 'id', 'archive': True},
+    'node_positions': {'time': 'time', 'kind': 'unix', 'order': 'id', 'archive': True},
+    'nodes': {'time': 'last_heard', 'kind': 'local_iso', 'order': 'last_heard', 'archive': True},
+    # Delete tombstones for get_changes_since(); only the newest are useful
+    'deleted_rows': {'time': None, 'kind': None, 'order': 'seq', 'archive': False},
+}
+
+# Per table: max_age_days and/or max_rows (None: no limit)
+DEFAULT_RETENTION = {
+    'messages': {'max_age_days': 365, 'max_rows': None},
+    'telemetry': {'max_age_days': 30, 'max_rows': None},
+    'node_positions': {'max_age_days': 90, 'max_rows': None},
+    'nodes': {'max_age_days': 180, 'max_rows': None},
+    'deleted_rows': {'max_age_days': None, 'max_rows': 100000},
+}
+
+# Task name -> seconds between runs
+SCHEDULE = {
+    'prune': 6 * 3600,
+    'vacuum': DAY,
+    'analyze': 7 * DAY,
+}
+
+START_DELAY = 60          # Leave startup alone
+CHECK_INTERVAL = 600      # How often to look for due tasks
+CHUNK_ROWS = 5000         # Rows deleted per transaction
+CHUNK_PAUSE = 0.05        # Pause between chunks so the writer thread gets the lock
+VACUUM_PAGES = 2000       # Pages freed per incremental_vacuum step
+# An older database without incremental auto_vacuum is converted with a full
+# VACUUM, which locks it for the duration; above this size that waits until
+# the client is idle (see Maintenance.is_idle)
+CONVERT_MAX_BYTES = 64 * 1024 * 1024
+# Returned by a task that could not run yet: it is retried at the next check
+# instead of after its interval
+DEFERRED = "deferred"
+# Pruned rows not yet moved into the monthly archives (see Maintenance._stage)
+PENDING_PREFIX = "pending-"
+ARCHIVE_TOKEN = "archive:"
+
+def load_retention(path=None):
+    """DEFAULT_RETENTION with overrides from retention.json in the data directory."""
+    policies = {table: dict(policy) for table, policy in DEFAULT_RETENTION.items()}
+    path = path or os.path.join(user_data_dir(), "retention.json")
+    if not os.path.exists(path):
+        return policies
+    try:
+        with open(path) as f:
+            overrides = json.load(f)
+        for table, policy in overrides.items():
+            if table not in TABLES:
+                logger.warning(f"Ignoring retention policy for unknown table {table}")
+                continue
+            policies.setdefault(table, {}).update(policy)
+    except Exception as e:
+        logger.error(f"Failed to read retention policies from {path}: {e}")
+    return policies
+
+def _time_value(kind, seconds):
+    """A unix time in the form a table stores it, for comparisons in SQL."""
+    if kind == 'utc_text':
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(seconds))
+    if kind == 'local_iso':
+        return datetime.fromtimestamp(seconds).isoformat()
+    return seconds
+
+def _month(kind, value):
+    """YYYY-MM of a stored time value, naming the archive file a row goes to."""
+    if value is None:
+        return "unknown"
+    if kind == 'unix':
+        return time.strftime('%Y-%m', time.gmtime(value))
+    return str(value)[:7]
+
+
+class Maintenance:
+    """
+    Runs the tasks in SCHEDULE when due. The last run of each task is kept in
+    the maintenance_state table, so a client that is restarted often still
+    prunes on schedule and one that was closed for a month catches up once.
+    """
+
+    def __init__(self, db, policies=None, start_delay=START_DELAY, on_pruned=None, is_idle=None):
+        self.db_path = db.db_path
+        self.policies = policies if policies is not None else load_retention()
+        self.on_pruned = on_pruned   # on_pruned({table: rows removed}), called on this thread
+        self.is_idle = is_idle       # is_idle() -> True while little is being written (no radio connected)
+        self._conversion_noted = False
+        self.start_delay = start_delay
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        if self._stop.wait(self.start_delay):
+            return
+        # Autocommit connection; transactions are opened explicitly per chunk
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            while not self._stop.is_set():
+                # Backfills queued by schema migrations go first; pruning rows the
+                # search index does not have yet would corrupt it (see FtsBackfill)
+                if self._backfill(conn):
+                    self.run_due(conn)
+                self._stop.wait(CHECK_INTERVAL)
+        finally:
+            conn.close()
+
+    def _backfill(self, conn):
+        """Run pending migration backfills; True once none are left."""
+        try:
+            run_backfills(conn, self._stop)
+            return not pending_backfills(conn)
+        except Exception as e:
+            logger.error(f"Database backfill failed: {e}")
+            return False
+
+    def run_due(self, conn, now=None):
+        """Run every task whose interval has passed. Returns the names of the tasks run."""
+        now = now or time.time()
+        last_runs = dict(conn.execute("SELECT task, last_run FROM maintenance_state").fetchall())
+        ran = []
+        for task, interval in SCHEDULE.items():
+            if self._stop.is_set():
+                break
+            if now - last_runs.get(task, 0) < interval:
+                continue
+            start = time.perf_counter()
+            try:
+                result = getattr(self, task)(conn)
+                # Only a completed run counts; a failed or deferred one is retried at the next check
+                if result != DEFERRED and not self._stop.is_set():
+                    conn.execute("INSERT OR REPLACE INTO maintenance_state (task, last_run) VALUES (?, ?)",
+                                 (task, now))
+                    ran.append(task)
+            except Exception as e:
+                logger.error(f"Database maintenance task {task} failed: {e}")
+            finally:
+                metrics.observe("db.maintenance", time.perf_counter() - start)
+        return ran
+
+    # --- Retention ---
+
+    def prune(self, conn, now=None):
+        """Apply every retention policy. Returns {table: rows removed}."""
+        now = now or time.time()
+        self._recover_archives(conn)
+        removed = {}
+        for table, policy in self.policies.items():
+            if self._stop.is_set():
+                break
+            count = self.prune_table(conn, table, policy, now)
+            if count:
+                removed[table] = count
+                metrics.incr("rows_pruned", count, table=table)
+                logger.info(f"Pruned {count} rows from {table}")
+        if removed and self.on_pruned:
+            self.on_pruned(removed)
+        return removed
+
+    def _conditions(self, conn, table, policy, now):
+        spec = TABLES[table]
+        conditions, params = [], []
+        max_age_days = policy.get('max_age_days')
+        if max_age_days is not None and spec['time']:
+            conditions.append(f"{spec['time']} < ?")
+            params.append(_time_value(spec['kind'], now - max_age_days * DAY))
+        max_rows = policy.get('max_rows')
+        if max_rows is not None:
+            # Order value of the newest row over the limit; it and everything older go
+            row = conn.execute(
+                f"SELECT {spec['order']} FROM {table} ORDER BY {spec['order']} DESC LIMIT 1 OFFSET ?",
+                (max_rows,)
+            ).fetchone()
+            if row is not None:
+                conditions.append(f"{spec['order']} <= ?")
+                params.append(row[0])
+        return conditions, params
+
+    def prune_table(self, conn, table, policy, now):
+        spec = TABLES[table]
+        conditions, params = self._conditions(conn, table, policy, now)
+        if not conditions:
+            return 0
+        archive = spec['archive'] and policy.get('archive', True)
+        select = (f"SELECT rowid, * FROM {table} WHERE {' OR '.join(conditions)} "
+                  f"ORDER BY {spec['order']} LIMIT {CHUNK_ROWS}")
+        total = 0
+        while not self._stop.is_set():
+            staged = None
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(select, params)
+                columns = [d[0] for d in cursor.description]
+                rows = cursor.fetchall()
+                if rows:
+                    if archive:
+                        staged = self._stage(table, spec, columns[1:], [row[1:] for row in rows])
+                        # Commits together with the delete; tells _recover_archives the rows are gone
+                        conn.execute("INSERT INTO maintenance_state (task, last_run) VALUES (?, ?)",
+                                     (ARCHIVE_TOKEN + staged, now))
+                    conn.executemany(f"DELETE FROM {table} WHERE rowid = ?", [(row[0],) for row in rows])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                if staged:
+                    self._discard(staged)
+                raise
+            if staged:
+                self._publish(conn, staged)
+            total += len(rows)
+            if len(rows) < CHUNK_ROWS:
+                break
+            time.sleep(CHUNK_PAUSE)
+        return total
+
+    # Archiving is two-phase so every pruned row ends up in the archive exactly
+    # once: rows are written to a pending file before the delete, and moved
+    # into the monthly archive only after the delete committed.
+
+    def _stage(self, table, spec, columns, rows):
+        """Write rows about to be deleted to a pending file in the archive directory; returns its name."""
+        time_index = columns.index(spec['time'])
+        name = f"{PENDING_PREFIX}{table}-{uuid.uuid4().hex}.jsonl"
+        with open(os.path.join(archive_dir(), name), "w", encoding="utf-8") as f:
+            for row in rows:
+                month = _month(spec['kind'], row[time_index])
+                f.write(json.dumps([table, month, dict(zip(columns, row))], default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return name
+
+    def _discard(self, name):
+        try:
+            os.remove(os.path.join(archive_dir(), name))
+        except OSError as e:
+            logger.error(f"Failed to remove pending archive {name}: {e}")
+
+    def _publish(self, conn, name):
+        """
+        Append a pending file's rows as JSON lines to <table>-YYYY-MM.jsonl.gz.
+        Each append adds a gzip member, which gzip readers concatenate
+        transparently.
+        """
+        directory = archive_dir()
+        path = os.path.join(directory, name)
+        by_file = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                table, month, row = json.loads(line)
+                by_file.setdefault(f"{table}-{month}.jsonl.gz", []).append(row)
+        for filename, rows in by_file.items():
+            with gzip.open(os.path.join(directory, filename), "at", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+        os.remove(path)
+        conn.execute("DELETE FROM maintenance_state WHERE task = ?", (ARCHIVE_TOKEN + name,))
+
+    def _recover_archives(self, conn):
+        """Finish pending files left by an interrupted prune: publish committed ones, drop the rest."""
+        committed = {row[0][len(ARCHIVE_TOKEN):] for row in conn.execute(
+            "SELECT task FROM maintenance_state WHERE task LIKE ?", (ARCHIVE_TOKEN + '%',))}
+        directory = archive_dir()
+        for name in os.listdir(directory):
+            if not name.startswith(PENDING_PREFIX):
+                continue
+            if name in committed:
+                logger.info(f"Archiving rows from interrupted prune {name}")
+                self._publish(conn, name)
+            else:
+                # The delete rolled back; the rows are still in the database
+                self._discard(name)
+            committed.discard(name)
+        for name in committed:
+            conn.execute("DELETE FROM maintenance_state WHERE task = ?", (ARCHIVE_TOKEN + name,))
+
+    # --- Space and statistics ---
+
+    def vacuum(self, conn):
+        """Checkpoint the WAL and return free pages to the filesystem."""
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if mode != 2:
+            return self._convert(conn)
+        freed = 0
+        while not self._stop.is_set():
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            # executescript steps the pragma to completion; execute() would free one page
+            conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+            freed += min(free, VACUUM_PAGES)
+            time.sleep(CHUNK_PAUSE)
+        if freed:
+            logger.info(f"Incremental vacuum freed {freed} pages")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    def _convert(self, conn):
+        """Switch an existing database to incremental auto_vacuum, which takes one full VACUUM."""
+        size = os.path.getsize(self.db_path) // (1024 * 1024)
+        if size * 1024 * 1024 > CONVERT_MAX_BYTES and not (self.is_idle and self.is_idle()):
+            if not self._conversion_noted:
+                logger.info(f"Database is {size} MB without incremental vacuum; "
+                            f"it will be converted the next time no radio is connected")
+                self._conversion_noted = True
+            return DEFERRED
+        logger.info(f"Converting the {size} MB database to incremental vacuum...")
+        start = time.perf_counter()
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        logger.info(f"Enabled incremental vacuum on the database in {time.perf_counter() - start:.1f}s "
+                    f"({os.path.getsize(self.db_path) // (1024 * 1024)} MB now)")
+
+    def analyze(self, conn):
+        """Refresh the statistics the query planner picks indexes by."""
+        # Sample each index instead of reading whole tables
+        conn.execute("PRAGMA analysis_limit=1000")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
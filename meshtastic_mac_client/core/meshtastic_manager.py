@@ -1,161 +1,384 @@
 import asyncio
+import collections
+import functools
 import logging
-from bleak import BleakScanner
+import threading
+import time
 from pubsub import pub
-from meshtastic.ble_interface import BLEInterface
 from meshtastic_mac_client.core.database import DatabaseManager
+from meshtastic_mac_client.core.update_dispatcher import UpdateDispatcher, NODE, MESSAGE, TELEMETRY, RADIO
+from meshtastic_mac_client.core.outbound_queue import OutboundQueue
+from meshtastic_mac_client.core.interfaces import create_interface, find_serial_ports, BLE
+from meshtastic_mac_client.core.metrics import metrics
+from meshtastic_mac_client.core.radio import Radio, CONNECTING, CONNECTED, DISCONNECTED
+from meshtastic_mac_client.core.connection_supervisor import ConnectionSupervisor
+from meshtastic_mac_client.core.ble_scanner import BleScanner
+from meshtastic_mac_client.core.node_registry import NodeRegistry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Packets remembered for de-duplicating traffic heard by more than one radio
+SEEN_PACKETS = 4096
+
 class MeshtasticManager:
     def __init__(self, db_manager, loop):
         self.db = db_manager
         self.loop = loop
-        self.client = None
-        self.is_connected = False
-        self.on_message_received_cb = None
-        self.on_node_updated_cb = None
+
+        # Connected interfaces by name; every row stored is tagged with the radio it came from
+        self.radios = {}
+        self._radio_by_interface = {}  # id(interface) -> name
+
+        # (sender, packet id) of recent packets, so a packet heard by two radios is stored once
+        self._seen = collections.OrderedDict()
+        self._seen_lock = threading.Lock()
+
+        # UI consumers subscribe here; events are batched and delivered on the loop
+        self.dispatcher = UpdateDispatcher(loop)
+
+        # Outgoing messages: radio writes, duty cycle, ACK tracking and retries
+        self.outbound = OutboundQueue(self)
+
+        # Reconnects radios that drop
+        self.supervisor = ConnectionSupervisor(self)
+
+        # Background BLE discovery; found devices are posted as DEVICE events
+        self.scanner = BleScanner(self.dispatcher)
         
-        self.nodes = self.db.get_all_nodes()
-        logger.info(f"Pre-loaded {len(self.nodes)} nodes from database.")
+        # Filled from the database by preload_nodes() so startup never waits on SQLite.
+        # Shared by all radios: a node heard by several radios has one record.
+        self.nodes = NodeRegistry()
 
         pub.subscribe(self.on_message_received, "meshtastic.receive.text")
         pub.subscribe(self.on_node_update, "meshtastic.node.updated")
-        
-        self.on_telemetry_received_cb = None
         pub.subscribe(self.on_telemetry_received, "meshtastic.receive.telemetry")
+        pub.subscribe(self.on_position_received, "meshtastic.receive.position")
+        pub.subscribe(self.on_any_packet, "meshtastic.receive")
+        pub.subscribe(self.on_connection_established, "meshtastic.connection.established")
+        pub.subscribe(self.on_connection_lost, "meshtastic.connection.lost")
 
-    async def scan_devices(self):
-        """Scan for Meshtastic BLE devices."""
-        logger.info("Scanning for BLE devices...")
-        try:
-            # First scan to populate Bleak's internal cache
-            await BleakScanner.discover(timeout=2.0)
-            devices = await BleakScanner.discover(timeout=5.0)
+        # Queue depths for the Diagnostics tab
+        metrics.gauge("dispatcher_pending", self.dispatcher.pending_count)
+        metrics.gauge("dispatcher_merged", lambda: self.dispatcher.stats['merged'])
+        metrics.gauge("dispatcher_dropped", lambda: self.dispatcher.stats['dropped'])
+        metrics.gauge("outbound_queue", self.outbound.pending)
+        metrics.gauge("radios_connected", lambda: len(self.connected_radios()))
+
+    # --- Radios ---
+
+    @property
+    def is_connected(self):
+        """True while at least one radio is connected."""
+        return bool(self.connected_radios())
+
+    @property
+    def client(self):
+        """The primary (first connected) radio's interface, used for sending and config."""
+        return self.get_client()
+
+    def connected_radios(self):
+        return [r for r in self.radios.values() if r.state == CONNECTED]
+
+    def get_client(self, name=None):
+        """Interface of the named radio, or of the primary radio if name is None."""
+        if name is not None:
+            radio = self.radios.get(name)
+            return radio.client if radio and radio.state == CONNECTED else None
+        for radio in self.connected_radios():
+            return radio.client
+        return None
+
+    def source_of(self, interface):
+        """
+        Name of the radio that published a pubsub event, or None if unknown.
+        Interfaces are mapped as soon as they are created (see _open), so
+        events from a NodeDB download during connect resolve too, however
+        many radios are connecting at once.
+        """
+        return self._radio_by_interface.get(id(interface))
 
-            return [d for d in devices if d.name]
+    def _set_state(self, radio, state):
+        radio.state = state
+        radio.since = time.time()
+        logger.info(f"Radio {radio.name}: {state}")
+        self.dispatcher.post(RADIO, radio.name, radio.info())
+
+    def _in_use(self, name):
+        radio = self.radios.get(name)
+        return radio is not None and radio.state != DISCONNECTED
+
+    def _unique_name(self, name):
+        if not self._in_use(name):
+            return name
+        n = 2
+        while self._in_use(f"{name} ({n})"):
+            n += 1
+        return f"{name} ({n})"
+
+    def _is_duplicate(self, packet):
+        """True if another radio already delivered this packet."""
+        packet_id = packet.get('id')
+        if not packet_id or len(self.radios) < 2:
+            return False
+        key = (packet.get('from'), packet_id)
+        with self._seen_lock:
+            if key in self._seen:
+                return True
+            self._seen[key] = True
+            if len(self._seen) > SEEN_PACKETS:
+                self._seen.popitem(last=False)
+        return False
+
+    def on_any_packet(self, packet, interface=None):
+        """Counts every received packet by port number and radio."""
+        source = self.source_of(interface)
+        radio = self.radios.get(source)
+        if radio:
+            radio.packets += 1
+            radio.last_heard = time.time()
+        portnum = packet.get('decoded', {}).get('portnum', 'ENCRYPTED')
+        metrics.incr("packets", portnum=portnum, radio=source or "unknown")
+
+    def on_connection_established(self, interface=None):
+        # The library reconnected on its own; during connect() and supervisor retries
+        # _open() sets the state once the handshake is done
+        radio = self.radios.get(self._radio_by_interface.get(id(interface)))
+        if (radio and radio.state not in (CONNECTED, CONNECTING)
+                and not self.supervisor.is_reconnecting(radio.name)):
+            self.loop.call_soon_threadsafe(self._set_state, radio, CONNECTED)
+
+    def on_connection_lost(self, interface=None):
+        radio = self.radios.get(self._radio_by_interface.get(id(interface)))
+        if radio and radio.state == CONNECTED:
+            self.loop.call_soon_threadsafe(self.supervisor.radio_lost, radio)
+
+    async def preload_nodes(self):
+        """Load the cached NodeDB in a worker thread; live updates already received win."""
+        stored = await self.loop.run_in_executor(None, self.db.get_all_nodes)
+        added = self.nodes.preload(stored)
+        logger.info(f"Pre-loaded {added} nodes from database.")
+
+    async def scan_devices(self, timeout=5.0):
+        """
+        Start the background BLE scanner (if it is not running) and return the
+        Meshtastic devices seen so far. Only waits, up to `timeout`, when nothing
+        is cached yet; later detections arrive as DEVICE events.
+        """
+        try:
+            await self.scanner.start()
+            deadline = self.loop.time() + timeout
+            while not self.scanner.devices() and self.loop.time() < deadline:
+                await asyncio.sleep(0.1)
+            return self.scanner.devices()
         except Exception as e:
             logger.error(f"Scan failed: {e}")
             return []
 
-    async def connect(self, device_address):
-        """Connect to a specific device using Meshtastic library."""
+    async def stop_scan(self):
+        await self.scanner.stop()
+
+    async def scan_serial_ports(self):
+        """Serial ports with a Meshtastic radio attached, as (device, description) pairs."""
+        return await self.loop.run_in_executor(None, find_serial_ports)
+
+    async def connect(self, device_address, kind=BLE, name=None, **options):
+        """
+        Connect another radio (BLE, serial, TCP, or simulated/replayed, see core.interfaces)
+        alongside any already connected. Returns the radio's name, or False.
+        """
+        if kind == BLE:
+            # Scanning competes with the connection for the BLE radio
+            await self.scanner.stop()
+        name = self._unique_name(name or device_address or kind)
+        radio = Radio(name, kind, device_address, options)
+        self.radios[name] = radio
+        if await self._open(radio):
+            logger.info(f"Connected to: {name}")
+            self.supervisor.start()
+            return name
+        self._set_state(radio, DISCONNECTED)
+        return False
+
+    async def _open(self, radio, retry=False):
+        """
+        Create the radio's interface; used for the first connect and by the
+        supervisor, whose retries (`retry`) leave the radio LOST until they succeed.
+        """
+        if not retry:
+            self._set_state(radio, CONNECTING)
+        created = []
+
+        def on_created(interface):
+            # Runs before the handshake, so the NodeDB it downloads is attributed to this radio
+            created.append(interface)
+            self._radio_by_interface[id(interface)] = radio.name
+
         try:
-            self.client = BLEInterface(address=device_address, noProto=False)
-            
-            self.is_connected = True
-            self.device_name = device_address
-            logger.info(f"Connected to: {self.device_name}")
-            return True
+            # The handshake blocks (NodeDB download); keep the loop and other radios running
+            radio.client = await self.loop.run_in_executor(
+                None, functools.partial(create_interface, radio.kind, radio.address,
+                                        on_created=on_created, **radio.options)
+            )
         except Exception as e:
-            logger.error(f"Failed to connect: {e}")
+            for interface in created:
+                self._radio_by_interface.pop(id(interface), None)
+            logger.error(f"Failed to connect {radio.name}: {e}")
+            return False
+        if radio.state == DISCONNECTED:
+            # The user gave up on this radio while the handshake was running
+            await self._release_client(radio)
             return False
+        radio.resync_since = None
+        radio.mark_connected()
+        self._set_state(radio, CONNECTED)
+        return True
 
-    async def disconnect(self):
-        """Disconnect safely without hanging the event loop."""
-        if not self.client:
-            return
+    async def disconnect(self, name=None):
+        """Disconnect one radio, or all of them, without hanging the event loop."""
+        radios = [self.radios[name]] if name in self.radios else (list(self.radios.values()) if name is None else [])
+        await asyncio.gather(*(self._close_radio(r) for r in radios if r.state != DISCONNECTED))
+
+    async def _close_radio(self, radio):
+        logger.info(f"Initiating disconnect sequence for {radio.name}...")
+        self.supervisor.cancel(radio.name)
+        radio.mark_down()
+        self._set_state(radio, DISCONNECTED)
+        await self._release_client(radio)
 
-        logger.info("Initiating disconnect sequence...")
+    async def _release_client(self, radio):
+        """Close and forget a radio's interface (if any) without changing its state."""
+        client, radio.client = radio.client, None
+        if client is None:
+            return
+        # Forget the interface first so its connection.lost event is not reported as a drop
+        self._radio_by_interface.pop(id(client), None)
         try:
             # We use the executor because client.close() is a blocking I/O call
             await asyncio.wait_for(
-                self.loop.run_in_executor(None, self.client.close),
+                self.loop.run_in_executor(None, client.close),
                 timeout=3.0
             )
-            logger.info("Meshtastic interface closed successfully.")
+            logger.info(f"Meshtastic interface {radio.name} closed successfully.")
         except asyncio.TimeoutError:
-            logger.warning("Radio did not acknowledge disconnect in time; forcing cleanup.")
+            logger.warning(f"Radio {radio.name} did not acknowledge disconnect in time; forcing cleanup.")
         except Exception as e:
             logger.error(f"Unexpected error during disconnect: {e}")
-        finally:
-            self.client = None
-            self.is_connected = False
-            logger.info("Manager state reset to disconnected.")
-
-    def get_local_node_name(self):
-        """Returns the Long Name of the connected radio."""
-        if not self.client or not self.is_connected:
+
+    def get_local_node_name(self, name=None):
+        """Returns the Long Name of a connected radio (the primary one by default)."""
+        client = self.get_client(name)
+        if not client:
             return None
         try:
             # Check the library's metadata first
-            my_info = self.client.getMyNodeInfo()
+            my_info = client.getMyNodeInfo()
             if my_info and 'user' in my_info:
                 return my_info['user'].get('longName')
             
             # Fallback to the ID (e.g., !8c32abcd)
-            return self.client.myId
+            return client.myId
         except Exception as e:
             logger.error(f"Failed to get local node name: {e}")
             return "Meshtastic Radio"
 
     def on_message_received(self, packet, interface):
         """Callback for incoming packets."""
-        try:
-            data = packet.get('decoded', {})
-            if data.get('portnum') == 'TEXT_MESSAGE_APP' or 'text' in data:
-                payload = data.get('text', '')
-                sender_id = packet.get('fromId') or packet.get('from')
-                channel = packet.get('channel', 0)
+        with metrics.timer("manager.on_message_received"):
+            try:
+                data = packet.get('decoded', {})
+                if data.get('portnum') == 'TEXT_MESSAGE_APP' or 'text' in data:
+                    payload = data.get('text', '')
+                    sender_id = packet.get('fromId') or packet.get('from')
+                    channel = packet.get('channel', 0)
 
-                if not payload: return
+                    if not payload or self._is_duplicate(packet): return
 
-                # Save to DB
-                self.db.save_message(sender_id, "REMOTE", payload, channel)
+                    # Save to DB, tagged with the radio that heard it
+                    packet_id = packet.get('id')
+                    self.db.save_message(sender_id, "REMOTE", payload, channel, source=self.source_of(interface),
+                                         packet_id=packet_id)
 
-                # Update UI
-                display_name = self.get_node_display_name(sender_id)
-                if self.on_message_received_cb:
-                    self.loop.call_soon_threadsafe(
-                        self.on_message_received_cb, display_name, "REMOTE", payload, channel
-                    )
-        except Exception as e:
-               logger.error(f"Error processing message: {e}")
+                    # Update UI (messages are never merged); the packet id matches the
+                    # row to its stored copy once it is committed (see ChatMessageModel.prepend)
+                    display_name = self.get_node_display_name(sender_id)
+                    self.dispatcher.post(MESSAGE, None, (display_name, "REMOTE", payload, channel, packet_id))
+            except Exception as e:
+                   logger.error(f"Error processing message: {e}")
 
     def on_node_update(self, node, interface=None):
-        """Update the local node cache and database."""
-        try:
-            # Extract IDs
-            num_id = node.get('num')
-            hex_id = node.get('user', {}).get('id')
+        """Update the node registry and database. The library's dict is never modified."""
+        with metrics.timer("manager.on_node_update"):
+            try:
+                source = self.source_of(interface)
+                existing = self.nodes.get(node.get('num') or node.get('user', {}).get('id'))
 
-            # Normalize the node structure for the UI components
-            # This ensures both DB nodes and Live nodes have 'position_lat'
-            if 'position' in node:
-                node['position_lat'] = node['position'].get('latitude')
-                node['position_lon'] = node['position'].get('longitude')
+                # After a reconnect the radio replays its whole NodeDB; only nodes
+                # heard since we lost contact have anything new.
+                radio = self.radios.get(source)
+                if (radio is not None and radio.resync_since and existing is not None
+                        and (node.get('lastHeard') or 0) <= radio.resync_since):
+                    metrics.incr("resync_skipped")
+                    return
 
-            # Update cache
-            if num_id: self.nodes[num_id] = node
-            if hex_id: self.nodes[hex_id] = node
+                # Merges with what other radios reported for the same node
+                record, changed = self.nodes.update(node, source)
+                if record is None or not changed:
+                    return
 
-            # Persist to database
-            self.db.save_node(node)
+                # Persist to database
+                self.db.save_node(record.to_node(), source=source)
+                pos = node.get('position')
+                if pos and record.lat is not None:
+                    self.db.save_position(record.id, pos.get('time') or record.last_heard,
+                                          record.lat, record.lon, record.altitude,
+                                          snr=record.snr, source=source)
 
-            # Notify UI components (Map and List)
-            if self.on_node_updated_cb:
-                self.loop.call_soon_threadsafe(self.on_node_updated_cb, node)
+                # Notify UI components (Map and List); repeated updates for a node merge
+                self.dispatcher.post(NODE, record.num, record)
 
-        except Exception as e:
-            logger.error(f"Error in on_node_update: {e}")
+            except Exception as e:
+                logger.error(f"Error in on_node_update: {e}")
+
+    def on_position_received(self, packet, interface=None):
+        """
+        Position reports. The library updates its NodeDB for these without
+        publishing meshtastic.node.updated, so the track, registry and map are updated here.
+        """
+        with metrics.timer("manager.on_position_received"):
+            try:
+                pos = packet.get('decoded', {}).get('position', {})
+                lat, lon = pos.get('latitude'), pos.get('longitude')
+                if lat is None or lon is None or self._is_duplicate(packet):
+                    return
+                sender = packet.get('from') or packet.get('fromId')
+                rx_time = packet.get('rxTime') or int(time.time())
+                source = self.source_of(interface)
+
+                record, changed = self.nodes.update_position(sender, lat, lon, pos.get('altitude'),
+                                                             heard=rx_time, source=source)
+                node_id = record.id if record else packet.get('fromId')
+                self.db.save_position(node_id, pos.get('time') or rx_time, lat, lon, pos.get('altitude'),
+                                      snr=packet.get('rxSnr'), rssi=packet.get('rxRssi'), source=source)
+                if not changed:
+                    return # Unknown until its NodeInfo arrives, or nothing new
+                self.db.save_node(record.to_node(), source=source)
+                self.dispatcher.post(NODE, record.num, record)
+            except Exception as e:
+                logger.error(f"Error processing position: {e}")
 
     def get_node_display_name(self, node_id):
-        node = self.nodes.get(node_id)
-        if node and 'user' in node:
-            long_name = node['user'].get('longName', 'Unknown')
-            hex_id = node['user'].get('id', node_id)
-            return f"{long_name} <small>({hex_id})</small>"
-        return f"Unknown <small>({node_id})</small>"
-
-    async def send_text(self, text, channel_index=0, destination=None):
-        if not self.is_connected or not self.client:
+        return self.nodes.display_name(node_id)
+
+    async def send_text(self, text, channel_index=0, destination=None, radio=None):
+        """
+        Queue a text message; returns its local id for delivery tracking, or False.
+        Sent through the named radio, or the primary one if radio is None.
+        """
+        if not self.get_client(radio):
             return False
-        target = destination if destination is not None else 0xFFFFFFFF
         try:
-            self.client.sendText(text, destinationId=target, channelIndex=channel_index)
-            self.db.save_message("USER", "USER", text, channel_index)
-            return True
+            return self.outbound.submit(text, channel_index, destination, radio=radio)
         except Exception as e:
             logger.error(f"Send failed: {e}")
             return False
@@ -200,19 +423,31 @@ class MeshtasticManager:
 
     def on_telemetry_received(self, packet, interface):
         """Callback for incoming telemetry data (battery, voltage, etc)."""
-        try:
-            data = packet.get('decoded', {}).get('telemetry', {})
-            device_metrics = data.get('deviceMetrics', {})
-
-            # Extract Battery Voltage and SNR/RSSI
-            battery = device_metrics.get('batteryLevel') # Percentage
-            voltage = device_metrics.get('voltage')      # Voltage
-            rx_rssi = packet.get('rxRssi')               # Signal strength
-
-            if self.on_telemetry_received_cb:
-                # Send the data to the UI thread
-                self.loop.call_soon_threadsafe(
-                    self.on_telemetry_received_cb, voltage, rx_rssi
-                )
-        except Exception as e:
-            logger.error(f"Error parsing telemetry: {e}")
\ No newline at end of file
+        with metrics.timer("manager.on_telemetry_received"):
+            try:
+                if self._is_duplicate(packet):
+                    return
+                data = packet.get('decoded', {}).get('telemetry', {})
+                device_metrics = data.get('deviceMetrics', {})
+
+                # Extract Battery Voltage and SNR/RSSI
+                battery = device_metrics.get('batteryLevel') # Percentage
+                voltage = device_metrics.get('voltage')      # Voltage
+                rx_rssi = packet.get('rxRssi')               # Signal strength
+                sender_id = packet.get('fromId') or packet.get('from')
+                timestamp = packet.get('rxTime') or time.time()
+
+                # Persist the full sample so history survives restarts
+                self.db.save_telemetry(sender_id, {
+                    'battery_level': battery,
+                    'voltage': voltage,
+                    'rssi': rx_rssi,
+                    'snr': packet.get('rxSnr'),
+                    'channel_utilization': device_metrics.get('channelUtilization'),
+                    'air_util_tx': device_metrics.get('airUtilTx'),
+                }, timestamp, source=self.source_of(interface))
+
+                # Send the data to the UI thread; never merged, so the live plot gets every sample
+                self.dispatcher.post(TELEMETRY, None, (sender_id, timestamp, voltage, rx_rssi))
+            except Exception as e:
+                logger.error(f"Error parsing telemetry: {e}")
\ No newline at end of file
@@ -0,0 +1,197 @@
+# metrics.py
+# Lightweight counters, timers and gauges for the hot path. Shown in the
+# Diagnostics tab and exportable as JSON or Prometheus text.
+
+import asyncio
+import collections
+import functools
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Recent samples kept per timer for percentiles
+RESERVOIR_SIZE = 2048
+
+
+class Timer:
+    """Durations for one stage: totals plus a ring of recent samples for p50/p99."""
+
+    __slots__ = ('count', 'total', 'max', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = collections.deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.samples.append(seconds)
+
+    def percentile(self, sorted_samples, p):
+        if not sorted_samples:
+            return 0.0
+        index = min(len(sorted_samples) - 1, int(round(p * (len(sorted_samples) - 1))))
+        return sorted_samples[index]
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'max': self.max,
+            'p50': self.percentile(ordered, 0.50),
+            'p99': self.percentile(ordered, 0.99),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = collections.defaultdict(int)   # (name, labels) -> count
+        self._timers = {}                                # name -> Timer
+        self._gauges = {}                                # name -> callable
+
+    # --- Recording ---
+
+    def incr(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = Timer()
+            timer.observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator form of timer()."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def gauge(self, name, fn):
+        """Register a callable sampled at snapshot time (e.g. a queue depth)."""
+        with self._lock:
+            self._gauges[name] = fn
+
+    # --- Reading ---
+
+    def snapshot(self):
+        """
+        Current values as a JSON-friendly dict. Counters only ever grow; a
+        consumer that wants rates keeps its previous snapshot and passes both
+        to rates(), so any number of readers can sample independently.
+        """
+        now = time.monotonic()
+        with self._lock:
+            counters = dict(self._counters)
+            timers = {name: t.summary() for name, t in self._timers.items()}
+            gauges = dict(self._gauges)
+
+        counter_rows = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(counters.items())]
+
+        gauge_values = {}
+        for name, fn in sorted(gauges.items()):
+            try:
+                gauge_values[name] = fn()
+            except Exception:
+                gauge_values[name] = None
+
+        return {
+            'timestamp': time.time(),
+            'monotonic': now,
+            'counters': counter_rows,
+            'timers': timers,
+            'gauges': gauge_values,
+        }
+
+    def to_prometheus(self, snapshot=None):
+        """Prometheus text exposition format."""
+        snap = snapshot or self.snapshot()
+        lines = []
+
+        def metric_name(name):
+            return "meshtastic_" + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+        def label_text(labels):
+            if not labels:
+                return ""
+            parts = []
+            for k, v in sorted(labels.items()):
+                v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                parts.append(f'{k}="{v}"')
+            return "{" + ",".join(parts) + "}"
+
+        seen = set()
+        for row in snap['counters']:
+            name = metric_name(row['name']) + "_total"
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{label_text(row['labels'])} {row['value']}")
+
+        for stage, t in sorted(snap['timers'].items()):
+            name = metric_name(stage) + "_seconds"
+            lines.append(f"# TYPE {name} summary")
+            lines.append(f'{name}{{quantile="0.5"}} {t["p50"]:.6f}')
+            lines.append(f'{name}{{quantile="0.99"}} {t["p99"]:.6f}')
+            lines.append(f"{name}_sum {t['sum']:.6f}")
+            lines.append(f"{name}_count {t['count']}")
+
+        for gauge, value in snap['gauges'].items():
+            if value is None:
+                continue
+            name = metric_name(gauge)
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def rates(snapshot, previous):
+    """
+    Per-second rate of each counter between two snapshot()s, as counter rows.
+    Without a previous snapshot every rate is 0.
+    """
+    if not previous:
+        return [dict(row, value=0.0) for row in snapshot['counters']]
+    elapsed = max(snapshot['monotonic'] - previous['monotonic'], 1e-9)
+    last = {(r['name'], tuple(sorted(r['labels'].items()))): r['value'] for r in previous['counters']}
+    return [dict(row, value=(row['value'] - last.get((row['name'], tuple(sorted(row['labels'].items()))), 0)) / elapsed)
+            for row in snapshot['counters']]
+
+
+async def monitor_loop_lag(interval=0.5):
+    """Record how late the event loop wakes up from a sleep (UI responsiveness)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        metrics.observe("event_loop_lag", max(0.0, loop.time() - start - interval))
+
+
+# Shared registry for the whole application
+metrics = Metrics()
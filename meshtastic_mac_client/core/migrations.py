@@ -0,0 +1,410 @@
+# migrations.py
+# Schema upgrades for existing databases. DatabaseManager.init_db() creates the
+# baseline schema (the two tables every database has had from the start);
+# everything after it is a numbered migration here, applied once and recorded
+# in PRAGMA user_version.
+
+import logging
+import time
+
+from meshtastic_mac_client.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK = 5000     # Rows per backfill transaction
+BACKFILL_PAUSE = 0.05     # Pause between chunks so the writer thread gets the lock
+
+
+class Migration:
+    """One schema step. `apply(conn)` runs inside the transaction that bumps user_version."""
+
+    def __init__(self, version, name, apply):
+        self.version = version
+        self.name = name
+        self.apply = apply
+
+
+class Backfill:
+    """
+    Fills a new column for rows that existed before its migration, in rowid
+    chunks on the maintenance thread. Index such a column with a partial
+    index (`WHERE column IS NOT NULL`): creating it is then a read-only scan,
+    and each chunk adds its rows to the index as it goes, so neither the
+    migration nor any single chunk rewrites the whole table. New rows must be
+    written with the column set.
+    """
+
+    def __init__(self, name, table, column, expression):
+        self.name = name
+        self.table = table
+        self.column = column
+        self.expression = expression   # SQL computing the value from the row's other columns
+
+    def register(self, conn):
+        """Call from the migration that adds the column; queues the rows that exist now."""
+        first, end = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {self.table}").fetchone()
+        if end is not None:
+            conn.execute("INSERT OR REPLACE INTO schema_backfills (name, next_rowid, end_rowid) VALUES (?, ?, ?)",
+                         (self.name, first, end))
+
+    def fill(self, conn, first, last):
+        """Fill the rows with rowids first..last."""
+        conn.execute(f'''
+            UPDATE {self.table} SET {self.column} = {self.expression}
+            WHERE rowid BETWEEN ? AND ? AND {self.column} IS NULL
+        ''', (first, last))
+
+    def run_chunk(self, conn, next_rowid, end_rowid):
+        """Fill one chunk in its own transaction. Returns the next rowid to start from."""
+        upto = min(next_rowid + BACKFILL_CHUNK - 1, end_rowid)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.fill(conn, next_rowid, upto)
+            if upto >= end_rowid:
+                conn.execute("DELETE FROM schema_backfills WHERE name = ?", (self.name,))
+            else:
+                conn.execute("UPDATE schema_backfills SET next_rowid = ? WHERE name = ?", (upto + 1, self.name))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return upto + 1
+
+
+class FtsBackfill(Backfill):
+    """
+    Indexes the rows that existed before an external-content FTS5 table was
+    created; its triggers index the rows written after. Deleting a row that
+    is not indexed yet would corrupt the index, which cannot happen because
+    retention pruning only starts once the backfills are done (Maintenance._run).
+    """
+
+    def __init__(self, name, table, fts_table, columns):
+        super().__init__(name, table, None, None)
+        self.fts_table = fts_table
+        self.columns = ", ".join(columns)
+
+    def fill(self, conn, first, last):
+        conn.execute(f'''
+            INSERT INTO {self.fts_table} (rowid, {self.columns})
+            SELECT rowid, {self.columns} FROM {self.table} WHERE rowid BETWEEN ? AND ?
+        ''', (first, last))
+
+
+class IndexBuild(Backfill):
+    """
+    Creates an index on the maintenance thread rather than in its migration,
+    as one queued step: SQLite builds an index in one go, which on a large
+    table takes seconds. On an empty table it is created right away.
+    Queue it before the Backfill of its column, so it is built while the
+    column is still NULL (a partial index then only scans the table).
+    """
+
+    def __init__(self, name, table, sql):
+        super().__init__(name, table, None, None)
+        self.sql = sql
+
+    def register(self, conn):
+        if conn.execute(f"SELECT 1 FROM {self.table} LIMIT 1").fetchone() is None:
+            conn.execute(self.sql)
+        else:
+            conn.execute("INSERT OR REPLACE INTO schema_backfills (name, next_rowid, end_rowid) VALUES (?, 0, 0)",
+                         (self.name,))
+
+    def fill(self, conn, first, last):
+        conn.execute(self.sql)
+
+
+# --- Migrations ---
+#
+# init_db() runs these before the window opens, so a step only changes the
+# schema (ALTER TABLE ADD COLUMN does not touch the rows) and leaves work that
+# grows with the table, indexes on messages included, to a Backfill. Steps
+# check what exists first, so they also apply cleanly to a database that
+# already has part of the schema.
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _add_column(conn, table, column, decl):
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        return True
+    return False
+
+MESSAGES_LOCAL_ID_INDEX = IndexBuild('idx_messages_local_id', 'messages', '''
+    CREATE INDEX IF NOT EXISTS idx_messages_local_id
+    ON messages (local_id) WHERE local_id IS NOT NULL
+''')
+# Keyset pagination of chat history per channel
+MESSAGES_CHANNEL_INDEX = IndexBuild('idx_messages_channel_id', 'messages',
+                                    "CREATE INDEX IF NOT EXISTS idx_messages_channel_id ON messages (channel, id)")
+
+def _delivery_and_sources(conn):
+    # Delivery tracking for outgoing messages
+    _add_column(conn, 'messages', 'status', 'TEXT')
+    _add_column(conn, 'messages', 'packet_id', 'INTEGER')
+    _add_column(conn, 'messages', 'local_id', 'TEXT')
+    # Name of the radio a row came from (several radios can be connected at once)
+    _add_column(conn, 'messages', 'source', 'TEXT')
+    _add_column(conn, 'nodes', 'source', 'TEXT')
+    MESSAGES_LOCAL_ID_INDEX.register(conn)
+    MESSAGES_CHANNEL_INDEX.register(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_last_heard ON nodes (last_heard)")
+
+def _history_tables(conn):
+    # One row per telemetry/packet sample; timestamp is unix seconds
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS telemetry (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            node_id TEXT NOT NULL,
+            timestamp REAL NOT NULL,
+            battery_level INTEGER,
+            voltage REAL,
+            rssi REAL,
+            snr REAL,
+            channel_utilization REAL,
+            air_util_tx REAL
+        )
+    ''')
+    _add_column(conn, 'telemetry', 'source', 'TEXT')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_node_time ON telemetry (node_id, timestamp)")
+    # Track points (decimated on write); time is unix seconds
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS node_positions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            node_id TEXT NOT NULL,
+            time REAL NOT NULL,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            altitude REAL,
+            snr REAL,
+            rssi REAL,
+            source TEXT
+        )
+    ''')
+    # One node's track, and every node's points in a time window
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_node_positions_node_time ON node_positions (node_id, time)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_node_positions_time ON node_positions (time)")
+    # When each maintenance task last ran (see Maintenance)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_state (
+            task TEXT PRIMARY KEY,
+            last_run REAL NOT NULL
+        )
+    ''')
+
+MESSAGES_FTS = FtsBackfill('messages_fts', 'messages', 'messages_fts', ('payload',))
+
+def _messages_fts(conn):
+    """Full-text index over message payloads, kept in sync by triggers."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'").fetchone()
+    if exists:
+        return
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE messages_fts
+            USING fts5(payload, content='messages', content_rowid='id')
+        ''')
+    except Exception as e:
+        # Search falls back to LIKE (see DatabaseManager.search_messages)
+        logger.warning(f"FTS5 unavailable, message search will use LIKE: {e}")
+        return
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, payload) VALUES (new.id, new.payload);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, payload) VALUES ('delete', old.id, old.payload);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF payload ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, payload) VALUES ('delete', old.id, old.payload);
+            INSERT INTO messages_fts (rowid, payload) VALUES (new.id, new.payload);
+        END
+    ''')
+    # Messages stored before the index existed
+    MESSAGES_FTS.register(conn)
+
+# Rows from before change tracking count as changed once, numbered by rowid
+# below every live change. Nodes are few and numbered by the migration itself.
+MESSAGES_CHANGE_SEQ = Backfill('messages_change_seq', 'messages', 'change_seq', 'rowid')
+CHANGE_SEQ_INDEXES = {
+    table: IndexBuild(f'idx_{table}_change_seq', table, f'''
+        CREATE INDEX IF NOT EXISTS idx_{table}_change_seq
+        ON {table} (change_seq) WHERE change_seq IS NOT NULL
+    ''')
+    for table in ('nodes', 'messages')
+}
+
+def _change_tracking(conn):
+    """
+    One change sequence shared by the tracked tables. Every insert or update
+    stamps the row's change_seq with the next value of change_counter.seq,
+    and every delete leaves a row in deleted_rows. Triggers keep it, so no
+    writer can forget to.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            seq INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO change_counter (id, seq) VALUES (0, 0)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS deleted_rows (
+            seq INTEGER PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_id TEXT NOT NULL
+        )
+    ''')
+    for table in ('nodes', 'messages'):
+        if _add_column(conn, table, 'change_seq', 'INTEGER'):
+            CHANGE_SEQ_INDEXES[table].register(conn)
+            if table == 'messages':
+                MESSAGES_CHANGE_SEQ.register(conn)
+            else:
+                conn.execute(f"UPDATE {table} SET change_seq = rowid")
+            conn.execute(f'''
+                UPDATE change_counter
+                SET seq = MAX(seq, (SELECT COALESCE(MAX(rowid), 0) FROM {table}))
+            ''')
+
+        stamp = f'''
+            UPDATE change_counter SET seq = seq + 1 WHERE id = 0;
+            UPDATE {table} SET change_seq = (SELECT seq FROM change_counter WHERE id = 0)
+            WHERE rowid = new.rowid;
+        '''
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_change_insert AFTER INSERT ON {table} BEGIN
+                {stamp}
+            END
+        ''')
+        # The WHEN clause skips the trigger's own change_seq update (and the backfill's)
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_change_update AFTER UPDATE ON {table}
+            WHEN new.change_seq IS old.change_seq BEGIN
+                {stamp}
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_change_delete AFTER DELETE ON {table} BEGIN
+                UPDATE change_counter SET seq = seq + 1 WHERE id = 0;
+                INSERT INTO deleted_rows (seq, table_name, row_id)
+                SELECT seq, '{table}', old.id FROM change_counter WHERE id = 0;
+            END
+        ''')
+
+# Columns of messages that a change-tracking consumer shows; derived columns
+# filled by backfills are left out so a backfill doesn't mark every row changed
+MESSAGE_CONTENT_COLUMNS = ('node_id', 'role', 'payload', 'channel', 'status', 'packet_id', 'local_id', 'source')
+
+MESSAGES_TIME = Backfill(
+    'messages_time', 'messages', 'time', "CAST(strftime('%s', timestamp) AS REAL)"
+)
+MESSAGES_TIME_INDEX = IndexBuild('idx_messages_time', 'messages',
+                                 "CREATE INDEX IF NOT EXISTS idx_messages_time ON messages (time) WHERE time IS NOT NULL")
+
+def _messages_time(conn):
+    # Unix seconds like the other tables; `timestamp` stays for existing readers
+    if _add_column(conn, 'messages', 'time', 'REAL'):
+        MESSAGES_TIME_INDEX.register(conn)
+        MESSAGES_TIME.register(conn)
+    conn.execute("DROP TRIGGER IF EXISTS messages_change_update")
+    conn.execute(f'''
+        CREATE TRIGGER messages_change_update
+        AFTER UPDATE OF {', '.join(MESSAGE_CONTENT_COLUMNS)} ON messages
+        WHEN new.change_seq IS old.change_seq BEGIN
+            UPDATE change_counter SET seq = seq + 1 WHERE id = 0;
+            UPDATE messages SET change_seq = (SELECT seq FROM change_counter WHERE id = 0)
+            WHERE rowid = new.rowid;
+        END
+    ''')
+
+# Append only; never renumber or edit a migration that has shipped
+MIGRATIONS = [
+    Migration(1, "message delivery state and radio sources", _delivery_and_sources),
+    Migration(2, "telemetry, track and maintenance tables", _history_tables),
+    Migration(3, "full-text message search", _messages_fts),
+    Migration(4, "change tracking", _change_tracking),
+    Migration(5, "messages.time in unix seconds", _messages_time),
+]
+
+BACKFILLS = {b.name: b for b in (
+    MESSAGES_LOCAL_ID_INDEX, MESSAGES_CHANNEL_INDEX, MESSAGES_FTS, *CHANGE_SEQ_INDEXES.values(),
+    MESSAGES_CHANGE_SEQ, MESSAGES_TIME_INDEX, MESSAGES_TIME,
+)}
+
+
+def migrate(conn, migrations=None):
+    """
+    Apply the migrations newer than the database's user_version, in order,
+    each in its own transaction together with its user_version bump. A failed
+    step is rolled back and raised, leaving the database at the last version
+    that applied cleanly. Returns the resulting version.
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    conn.isolation_level = None   # Transactions below are explicit
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_backfills (
+            name TEXT PRIMARY KEY,
+            next_rowid INTEGER NOT NULL,
+            end_rowid INTEGER NOT NULL
+        )
+    ''')
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    latest = migrations[-1].version if migrations else 0
+    if version > latest:
+        logger.warning(f"Database schema version {version} is newer than this client ({latest})")
+        return version
+
+    for migration in migrations:
+        if migration.version <= version:
+            continue
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migration.apply(conn)
+            conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"Database migration {migration.version} ({migration.name}) failed: {e}")
+            raise
+        version = migration.version
+        metrics.observe("db.migration", time.perf_counter() - start)
+        logger.info(f"Applied database migration {version}: {migration.name} "
+                    f"in {time.perf_counter() - start:.2f}s")
+    return version
+
+def pending_backfills(conn):
+    """Names of the backfills not finished yet; their columns are NULL in older rows."""
+    return [row[0] for row in conn.execute("SELECT name FROM schema_backfills")]
+
+def run_backfills(conn, stop=None):
+    """
+    Work through the queued backfills, in the order they were queued, chunk
+    by chunk until they are done or `stop` (a threading.Event) is set;
+    progress is saved per chunk, so an interrupted backfill resumes where it
+    left off. Returns the names finished.
+    """
+    finished = []
+    for name, next_rowid, end_rowid in conn.execute(
+            "SELECT name, next_rowid, end_rowid FROM schema_backfills ORDER BY rowid").fetchall():
+        backfill = BACKFILLS.get(name)
+        if backfill is None:
+            logger.warning(f"Unknown backfill {name} queued in the database")
+            continue
+        start = time.perf_counter()
+        while next_rowid <= end_rowid:
+            if stop is not None and stop.is_set():
+                return finished
+            chunk_start, next_rowid = next_rowid, backfill.run_chunk(conn, next_rowid, end_rowid)
+            metrics.incr("rows_backfilled", next_rowid - chunk_start, backfill=name)
+            time.sleep(BACKFILL_PAUSE)
+        finished.append(name)
+        logger.info(f"Backfill {name} finished in {time.perf_counter() - start:.1f}s")
+    return finished
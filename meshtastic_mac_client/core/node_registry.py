@@ -0,0 +1,254 @@
+# node_registry.py
+# The in-memory NodeDB shared by all radios. One record per node, keyed by its
+# numeric node number, whatever shape the update came in (library dict,
+# database row) and whichever id form the caller has ("!1a2b3c4d" or 439041101).
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+
+def hex_to_num(node_id):
+    """Node number for a "!xxxxxxxx" user id, or None."""
+    if isinstance(node_id, str) and node_id.startswith("!"):
+        try:
+            return int(node_id[1:], 16)
+        except ValueError:
+            return None
+    return None
+
+def num_to_hex(num):
+    return f"!{num:08x}"
+
+def to_timestamp(value):
+    """Unix seconds from a number or the ISO strings stored in the nodes table."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class NodeRecord:
+    """One node. Plain typed attributes; times are unix seconds."""
+
+    __slots__ = ('num', 'id', 'long_name', 'short_name', 'hw_model', 'snr', 'battery', 'voltage',
+                 'last_heard', 'lat', 'lon', 'altitude', 'source', 'sources', 'version')
+
+    def __init__(self, num, node_id=None):
+        self.num = num
+        self.id = node_id or num_to_hex(num)
+        self.long_name = None
+        self.short_name = None
+        self.hw_model = None
+        self.snr = None
+        self.battery = None
+        self.voltage = None
+        self.last_heard = None
+        self.lat = None
+        self.lon = None
+        self.altitude = None
+        self.source = None      # Radio that last reported the node
+        self.sources = ()       # Every radio that has heard it
+        self.version = 0        # NodeRegistry.version when this record last changed
+
+    def display_name(self):
+        return f"{self.long_name or 'Unknown'} ({self.id})"
+
+    def to_node(self):
+        """Library-shaped dict, as DatabaseManager.save_node() expects."""
+        node = {
+            'num': self.num,
+            'user': {'id': self.id, 'longName': self.long_name, 'shortName': self.short_name,
+                     'hwModel': self.hw_model},
+            'snr': self.snr,
+            'lastHeard': self.last_heard,
+            'deviceMetrics': {'batteryLevel': self.battery, 'voltage': self.voltage},
+        }
+        if self.lat is not None and self.lon is not None:
+            node['position'] = {'latitude': self.lat, 'longitude': self.lon, 'altitude': self.altitude}
+        return node
+
+    def to_row(self):
+        """Same keys as a `nodes` table row, for the node list."""
+        last_heard = datetime.fromtimestamp(self.last_heard) if self.last_heard else datetime.now()
+        return {
+            'id': self.id,
+            'long_name': self.long_name,
+            'short_name': self.short_name,
+            'snr': self.snr,
+            'battery': self.battery,
+            'last_heard': last_heard.isoformat(),
+            'position_lat': self.lat,
+            'position_lon': self.lon,
+        }
+
+
+class NodeRegistry:
+    """
+    NodeRecords by node number, with a hex id -> number index.
+
+    Every change bumps `version` and stamps the record with it, so a consumer
+    that remembers the version it last saw can ask for just the records that
+    changed since (changes_since). Updates arrive on the library's threads,
+    so mutations take a lock.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._records = OrderedDict()   # num -> NodeRecord, least recently changed first
+        self._by_hex = {}               # "!xxxxxxxx" -> num
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, key):
+        return self.num_for(key) in self._records
+
+    def num_for(self, key):
+        """Canonical node number for a number, a "!hex" id or a numeric string."""
+        if isinstance(key, int):
+            return key
+        if isinstance(key, str):
+            num = self._by_hex.get(key)
+            if num is not None:
+                return num
+            if key.isdigit():
+                return int(key)
+            return hex_to_num(key)
+        return None
+
+    def get(self, key):
+        return self._records.get(self.num_for(key))
+
+    def records(self):
+        return list(self._records.values())
+
+    def display_name(self, key):
+        record = self.get(key)
+        return record.display_name() if record else f"Unknown ({key})"
+
+    def changes_since(self, version):
+        """(records changed after `version`, current version). Cost is O(changes)."""
+        with self._lock:
+            changed = []
+            for record in reversed(self._records.values()):
+                if record.version <= version:
+                    break
+                changed.append(record)
+            changed.reverse()
+            return changed, self.version
+
+    # --- Updates ---
+
+    def _record(self, num, node_id=None):
+        record = self._records.get(num)
+        if record is None:
+            record = self._records[num] = NodeRecord(num, node_id)
+            self._by_hex[record.id] = num
+            self.version += 1
+            record.version = self.version
+        elif node_id and node_id != record.id:
+            self._by_hex.pop(record.id, None)
+            record.id = node_id
+            self._by_hex[node_id] = num
+        return record
+
+    def _set(self, record, values):
+        """Apply non-None values; returns True (and bumps versions) if anything changed."""
+        changed = False
+        for name, value in values.items():
+            if value is not None and getattr(record, name) != value:
+                setattr(record, name, value)
+                changed = True
+        if changed:
+            self.version += 1
+            record.version = self.version
+            self._records.move_to_end(record.num)
+        return changed
+
+    def _add_source(self, record, source):
+        if source and source not in record.sources:
+            return tuple(sorted(record.sources + (source,)))
+        return None
+
+    def update(self, node, source=None):
+        """
+        Merge a library node dict. Returns (record, changed); record is None if
+        the dict has no usable id. A report older than what another radio
+        already gave us only adds that radio to `sources`.
+        """
+        user = node.get('user') or {}
+        node_id = user.get('id')
+        num = node.get('num')
+        if num is None:
+            num = hex_to_num(node_id)
+        if num is None:
+            return None, False
+
+        pos = node.get('position') or {}
+        metrics = node.get('deviceMetrics') or node.get('device_metrics') or {}
+        last_heard = to_timestamp(node.get('lastHeard'))
+        with self._lock:
+            created = num not in self._records
+            record = self._record(num, node_id)
+            sources = self._add_source(record, source)
+            if record.last_heard and last_heard is not None and last_heard < record.last_heard:
+                return record, self._set(record, {'sources': sources})
+            changed = self._set(record, {
+                'long_name': user.get('longName'),
+                'short_name': user.get('shortName'),
+                'hw_model': user.get('hwModel'),
+                'snr': node.get('snr'),
+                'battery': metrics.get('batteryLevel', metrics.get('battery_level')),
+                'voltage': metrics.get('voltage'),
+                'last_heard': last_heard,
+                'lat': pos.get('latitude'),
+                'lon': pos.get('longitude'),
+                'altitude': pos.get('altitude'),
+                'source': source,
+                'sources': sources,
+            })
+            return record, changed or created
+
+    def update_position(self, key, lat, lon, altitude=None, heard=None, source=None):
+        """Apply a position report to a known node. Returns (record, changed)."""
+        with self._lock:
+            record = self._records.get(self.num_for(key))
+            if record is None:
+                return None, False
+            last_heard = max(heard, record.last_heard or 0) if heard else None
+            return record, self._set(record, {
+                'lat': lat, 'lon': lon, 'altitude': altitude, 'last_heard': last_heard,
+                'source': source, 'sources': self._add_source(record, source),
+            })
+
+    def preload(self, rows):
+        """
+        Add nodes from the database (`nodes` table rows) that are not known yet;
+        records already filled by live updates win. Returns the number added.
+        """
+        added = 0
+        with self._lock:
+            for row in rows:
+                num = hex_to_num(row['id'])
+                if num is None or num in self._records:
+                    continue
+                record = self._record(num, row['id'])
+                self._set(record, {
+                    'long_name': row['long_name'],
+                    'short_name': row['short_name'],
+                    'snr': row['snr'],
+                    'battery': row['battery'],
+                    'last_heard': to_timestamp(row['last_heard']),
+                    'lat': row['position_lat'],
+                    'lon': row['position_lon'],
+                    'source': row['source'],
+                    'sources': (row['source'],) if row['source'] else None,
+                })
+                added += 1
+        return added
@@ -0,0 +1,209 @@
+# outbound_queue.py
+
+import asyncio
+import collections
+import functools
+import logging
+import math
+import random
+import time
+import uuid
+from pubsub import pub
+
+logger = logging.getLogger(__name__)
+
+# Delivery states stored in messages.status
+QUEUED = "queued"
+SENT = "sent"
+ACKED = "acked"
+FAILED = "failed"
+
+# Dispatcher event kind for delivery state changes: payload is (local_id, status)
+STATUS = "status"
+
+BROADCAST = 0xFFFFFFFF
+
+def lora_airtime(payload_bytes, sf=11, bw_khz=250, cr=5, preamble=16):
+    """
+    Time on air in seconds for one LoRa packet (Semtech AN1200.13).
+
+    Defaults match Meshtastic's LongFast preset. `cr` is the coding-rate
+    denominator (5 for 4/5).
+    """
+    t_sym = (2 ** sf) / (bw_khz * 1000)
+    low_dr_optimize = 1 if t_sym > 0.016 else 0
+    t_preamble = (preamble + 4.25) * t_sym
+    payload_symbols = 8 + max(
+        math.ceil((8 * payload_bytes - 4 * sf + 28 + 16) / (4 * (sf - 2 * low_dr_optimize))) * cr,
+        0
+    )
+    return t_preamble + payload_symbols * t_sym
+
+
+class OutboundMessage:
+    __slots__ = ('local_id', 'text', 'channel_index', 'destination', 'radio', 'attempts', 'packet_id', 'status')
+
+    def __init__(self, text, channel_index, destination, radio=None):
+        self.local_id = uuid.uuid4().hex
+        self.text = text
+        self.channel_index = channel_index
+        self.destination = destination
+        self.radio = radio  # Name of the radio to send through; None for the primary
+        self.attempts = 0
+        self.packet_id = None
+        self.status = QUEUED
+
+
+class OutboundQueue:
+    """
+    Serialises outgoing text messages to the radio.
+
+    A single worker task performs the blocking sendText call in an executor,
+    keeps total airtime inside a sliding-window duty cycle, and tracks the
+    packet ID of each send. Routing ACK/NAK packets resolve the message;
+    a NAK or a missing ACK is retried with exponential backoff.
+    """
+
+    def __init__(self, manager, max_retries=3, ack_timeout=30.0, base_backoff=5.0,
+                 duty_cycle=0.10, duty_window=3600.0):
+        self.manager = manager
+        self.loop = manager.loop
+        self.max_retries = max_retries
+        self.ack_timeout = ack_timeout
+        self.base_backoff = base_backoff
+        self.duty_cycle = duty_cycle      # Fraction of duty_window we may spend transmitting
+        self.duty_window = duty_window
+
+        self._queue = asyncio.Queue()
+        self._awaiting = {}               # packet id -> (OutboundMessage, asyncio.Future)
+        self._airtime = collections.deque()  # (monotonic time, seconds on air)
+        self._task = None
+
+        pub.subscribe(self.on_routing, "meshtastic.receive.routing")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._worker())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def pending(self):
+        """Messages waiting to be written to the radio."""
+        return self._queue.qsize()
+
+    def submit(self, text, channel_index=0, destination=None, radio=None):
+        """Queue a message and return its local id (used for status updates)."""
+        msg = OutboundMessage(text, channel_index, destination, radio)
+        self.manager.db.save_message("USER", "USER", text, channel_index, status=QUEUED,
+                                     local_id=msg.local_id, source=radio)
+        self._set_status(msg, QUEUED)
+        self._queue.put_nowait(msg)
+        self.start()
+        return msg.local_id
+
+    def _set_status(self, msg, status):
+        msg.status = status
+        if status != QUEUED:
+            self.manager.db.update_message_status(msg.local_id, status, msg.packet_id)
+        self.manager.dispatcher.post(STATUS, msg.local_id, (msg.local_id, status))
+
+    # --- Duty cycle ---
+
+    def _airtime_used(self, now):
+        while self._airtime and now - self._airtime[0][0] > self.duty_window:
+            self._airtime.popleft()
+        return sum(seconds for _, seconds in self._airtime)
+
+    async def _wait_for_airtime(self, seconds):
+        budget = self.duty_cycle * self.duty_window
+        while True:
+            now = time.monotonic()
+            if self._airtime_used(now) + seconds <= budget or not self._airtime:
+                self._airtime.append((now, seconds))
+                return
+            # Wait until the oldest transmission leaves the window
+            wait = self.duty_window - (now - self._airtime[0][0])
+            logger.info(f"Duty cycle limit reached; delaying send by {wait:.1f}s")
+            await asyncio.sleep(max(wait, 0.1))
+
+    # --- Worker ---
+
+    async def _worker(self):
+        while True:
+            msg = await self._queue.get()
+            try:
+                await self._send(msg)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Send failed: {e}")
+                self._retry_or_fail(msg)
+
+    async def _send(self, msg):
+        msg.attempts += 1
+        client = self.manager.get_client(msg.radio)
+        if not client:
+            raise ConnectionError("not connected")
+
+        # Payload plus ~32 bytes of Meshtastic header/protobuf framing
+        await self._wait_for_airtime(lora_airtime(len(msg.text.encode('utf-8')) + 32))
+
+        target = msg.destination if msg.destination is not None else BROADCAST
+        packet = await self.loop.run_in_executor(None, functools.partial(
+            client.sendText, msg.text, destinationId=target, wantAck=True, channelIndex=msg.channel_index
+        ))
+
+        msg.packet_id = getattr(packet, 'id', None)
+        self._set_status(msg, SENT)
+        if msg.packet_id is None:
+            return # Nothing to match an ACK against
+
+        future = self.loop.create_future()
+        self._awaiting[msg.packet_id] = (msg, future)
+        self.loop.create_task(self._await_ack(msg, future))
+
+    async def _await_ack(self, msg, future):
+        try:
+            acked = await asyncio.wait_for(future, timeout=self.ack_timeout)
+        except asyncio.TimeoutError:
+            acked = False
+            logger.info(f"No ACK for packet {msg.packet_id}")
+        finally:
+            self._awaiting.pop(msg.packet_id, None)
+
+        if acked:
+            self._set_status(msg, ACKED)
+        else:
+            self._retry_or_fail(msg)
+
+    def _retry_or_fail(self, msg):
+        if msg.attempts >= self.max_retries:
+            self._set_status(msg, FAILED)
+            return
+        # Exponential backoff with jitter so retries from several stations don't collide
+        delay = self.base_backoff * (2 ** max(msg.attempts - 1, 0)) * random.uniform(0.8, 1.2)
+        logger.info(f"Retrying message {msg.local_id} in {delay:.1f}s (attempt {msg.attempts + 1})")
+        self.loop.call_later(delay, self._queue.put_nowait, msg)
+
+    # --- ACK/NAK matching (pubsub thread) ---
+
+    def on_routing(self, packet, interface=None):
+        decoded = packet.get('decoded', {})
+        request_id = decoded.get('requestId')
+        if request_id is None:
+            return
+        reason = decoded.get('routing', {}).get('errorReason', 'NONE')
+        self.loop.call_soon_threadsafe(self._resolve, request_id, reason)
+
+    def _resolve(self, request_id, reason):
+        entry = self._awaiting.get(request_id)
+        if not entry:
+            return
+        msg, future = entry
+        if not future.done():
+            if reason != 'NONE':
+                logger.warning(f"Packet {request_id} NAK: {reason}")
+            future.set_result(reason == 'NONE')
@@ -0,0 +1,48 @@
+# paths.py
+# Where the application keeps its files: one per-user data directory,
+# independent of the directory the app was started from.
+
+import logging
+import os
+import shutil
+import sys
+
+logger = logging.getLogger(__name__)
+
+APP_DIR_NAME = "MeshtasticMacClient"
+DB_NAME = "meshtastic.db"
+
+def user_data_dir():
+    """~/Library/Application Support/MeshtasticMacClient on macOS (XDG/AppData elsewhere), created if missing."""
+    if sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    elif os.name == "nt":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    path = os.path.join(base, APP_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def archive_dir():
+    path = os.path.join(user_data_dir(), "archive")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def default_db_path():
+    """
+    The database in the data directory. A meshtastic.db left in the working
+    directory by earlier versions is moved there the first time.
+    """
+    path = os.path.join(user_data_dir(), DB_NAME)
+    legacy = os.path.abspath(DB_NAME)
+    if not os.path.exists(path) and os.path.exists(legacy) and legacy != path:
+        try:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(legacy + suffix):
+                    shutil.move(legacy + suffix, path + suffix)
+            logger.info(f"Moved database from {legacy} to {path}")
+        except OSError as e:
+            logger.error(f"Could not move {legacy} to {path}, using it in place: {e}")
+            return legacy
+    return path
@@ -0,0 +1,62 @@
+# radio.py
+# One radio link managed by MeshtasticManager: how to (re)open it, its state,
+# and uptime/reconnect statistics.
+
+import time
+
+# Per-radio connection states
+CONNECTING = "connecting"
+CONNECTED = "connected"
+LOST = "lost"                  # Dropped; the supervisor is reconnecting
+DISCONNECTED = "disconnected"  # Closed by the user, or never connected
+
+class Radio:
+    """One interface managed by MeshtasticManager."""
+
+    __slots__ = ('name', 'kind', 'address', 'options', 'client', 'state', 'since', 'packets',
+                 'last_heard', 'resync_since', 'connected_at', 'uptime_total', 'drops', 'reconnects')
+
+    def __init__(self, name, kind, address, options=None):
+        self.name = name
+        self.kind = kind
+        self.address = address
+        self.options = options or {}   # Passed to create_interface again on reconnect
+        self.client = None
+        self.state = CONNECTING
+        self.since = time.time()       # When the current state was entered
+        self.packets = 0
+        self.last_heard = None         # Time of the last packet received through this radio
+        self.resync_since = None       # While reconnecting: nodes not heard after this are unchanged
+
+        # Statistics
+        self.connected_at = None
+        self.uptime_total = 0.0        # Seconds connected in earlier sessions
+        self.drops = 0
+        self.reconnects = 0
+
+    def mark_connected(self):
+        self.connected_at = time.time()
+
+    def mark_down(self):
+        if self.connected_at is not None:
+            self.uptime_total += time.time() - self.connected_at
+            self.connected_at = None
+
+    def uptime(self):
+        """Total seconds connected, including the current session."""
+        current = time.time() - self.connected_at if self.connected_at is not None else 0.0
+        return self.uptime_total + current
+
+    def info(self):
+        """Plain dict for the UI (delivered through the dispatcher as RADIO events)."""
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'address': self.address,
+            'state': self.state,
+            'since': self.since,
+            'packets': self.packets,
+            'uptime': self.uptime(),
+            'drops': self.drops,
+            'reconnects': self.reconnects,
+        }
@@ -0,0 +1,79 @@
+# ring_buffer.py
+
+import numpy as np
+
+class RingBuffer:
+    """
+    Ring of up to `capacity` (timestamp, value) samples in numpy arrays.
+
+    Every sample is written twice, at i and i + allocated, so the newest samples
+    are always one contiguous slice. The arrays start at `initial` samples and
+    double while they fill, up to capacity, so a quiet node costs little.
+    append() is amortized O(1) and allocation-free once the ring is full;
+    view() returns numpy views, never copies.
+    """
+
+    def __init__(self, capacity=4096, initial=256):
+        self.capacity = capacity
+        self._allocate(min(initial, capacity))
+        self._index = 0   # Next write position in [0, allocated)
+        self._size = 0
+
+    def _allocate(self, size):
+        self._allocated = size
+        self._t = np.zeros(2 * size, dtype=np.float64)
+        self._v = np.zeros(2 * size, dtype=np.float64)
+
+    def _grow(self):
+        # Only called before the ring wrapped, so the samples are _t[0:size]
+        t, v = self._t[:self._size].copy(), self._v[:self._size].copy()
+        self._allocate(min(2 * self._allocated, self.capacity))
+        n, a = self._size, self._allocated
+        self._t[:n] = self._t[a:a + n] = t
+        self._v[:n] = self._v[a:a + n] = v
+        self._index = n
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, value):
+        if self._size == self._allocated < self.capacity:
+            self._grow()
+        i, a = self._index, self._allocated
+        self._t[i] = self._t[i + a] = timestamp
+        self._v[i] = self._v[i + a] = value
+        self._index = (i + 1) % a
+        if self._size < a:
+            self._size += 1
+
+    def view(self):
+        """Return (timestamps, values) for the stored samples, oldest first."""
+        start = self._index + self._allocated - self._size
+        end = start + self._size
+        return self._t[start:end], self._v[start:end]
+
+    def clear(self):
+        self._index = 0
+        self._size = 0
+
+
+class TelemetryBuffers:
+    """RingBuffers keyed by (node_id, metric), created small on first use."""
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self._buffers = {}
+
+    def append(self, node_id, metric, timestamp, value):
+        key = (node_id, metric)
+        buf = self._buffers.get(key)
+        if buf is None:
+            buf = self._buffers[key] = RingBuffer(self.capacity)
+        buf.append(timestamp, value)
+
+    def get(self, node_id, metric):
+        """Return the buffer for a node/metric, or None if nothing was recorded."""
+        return self._buffers.get((node_id, metric))
+
+    def nodes(self):
+        return sorted({node_id for node_id, _ in self._buffers})
@@ -0,0 +1,280 @@
+# simulator.py
+# Radio stand-ins for running the client without hardware: a synthetic mesh,
+# a recorder for live traffic, and a replay interface for recorded files.
+
+import base64
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+import types
+from pubsub import pub
+
+logger = logging.getLogger(__name__)
+
+BROADCAST = 0xFFFFFFFF
+
+# Default centre for synthetic positions (Longmont, CO, same as the map)
+SIM_CENTER = (40.1672, -105.1019)
+
+SIM_WORDS = ["hello", "copy", "testing", "relay", "battery", "weather", "antenna",
+             "repeater", "signal", "check", "out", "range", "north", "ridge", "ok"]
+
+
+def make_node(i, rng, center=SIM_CENTER, spread_deg=0.3):
+    """A synthetic node dict shaped like the library's NodeDB entries."""
+    num = 0x10000000 + i
+    return {
+        'num': num,
+        'user': {'id': f"!{num:08x}", 'longName': f"Sim Node {i}", 'shortName': f"S{i % 1000:03d}"},
+        'position': {
+            'latitude': center[0] + rng.uniform(-spread_deg, spread_deg),
+            'longitude': center[1] + rng.uniform(-spread_deg, spread_deg),
+        },
+        'snr': round(rng.uniform(-15, 10), 2),
+        'lastHeard': int(time.time()),
+        'deviceMetrics': {
+            'batteryLevel': rng.randint(20, 100),
+            'voltage': round(rng.uniform(3.5, 4.2), 3),
+            'channelUtilization': round(rng.uniform(0, 30), 2),
+            'airUtilTx': round(rng.uniform(0, 5), 2),
+        },
+    }
+
+def make_packet(node, rng=random):
+    """Header fields of a broadcast packet received from `node` (no 'decoded' yet)."""
+    return {
+        'from': node['num'], 'fromId': node['user']['id'],
+        'to': BROADCAST, 'toId': '^all',
+        'id': rng.randint(1, 1 << 31), 'channel': 0,
+        'rxTime': int(time.time()),
+        'rxSnr': round(rng.uniform(-15, 10), 2),
+        'rxRssi': rng.randint(-125, -40),
+        'hopLimit': 3,
+    }
+
+def make_text_packet(node, text, rng=random):
+    """A received text packet from `node`, shaped like the library's packet dicts."""
+    packet = make_packet(node, rng)
+    packet['decoded'] = {'portnum': 'TEXT_MESSAGE_APP', 'text': text, 'payload': text.encode()}
+    return packet
+
+
+class _FakeInterfaceBase:
+    """Minimal surface of meshtastic.mesh_interface.MeshInterface used by the app."""
+
+    def __init__(self, my_num=0x5A5A0001, long_name="Simulated Radio"):
+        self.my_num = my_num
+        self.myInfo = types.SimpleNamespace(my_node_num=my_num)
+        self.localConfig = types.SimpleNamespace(lora=types.SimpleNamespace(region=0, modem_preset=0))
+        self.nodes = {}
+        self.nodesByNum = {}
+        self._my_user = {'id': f"!{my_num:08x}", 'longName': long_name, 'shortName': "SIM"}
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_packet_id = random.randint(1, 1 << 30)
+
+    @property
+    def myId(self):
+        return self._my_user['id']
+
+    def getMyNodeInfo(self):
+        return {'num': self.my_num, 'user': dict(self._my_user)}
+
+    def writeConfig(self, *args, **kwargs):
+        logger.info("Simulated radio: writeConfig ignored")
+
+    def sendText(self, text, destinationId=BROADCAST, wantAck=False, channelIndex=0, **kwargs):
+        self._next_packet_id += 1
+        packet_id = self._next_packet_id
+        if wantAck:
+            # Pretend a neighbour relayed it shortly afterwards
+            threading.Timer(random.uniform(0.2, 1.5), self._publish_ack, (packet_id,)).start()
+        return types.SimpleNamespace(id=packet_id)
+
+    def _publish_ack(self, packet_id):
+        if self._stop.is_set():
+            return
+        pub.sendMessage("meshtastic.receive.routing", packet={
+            'from': self.my_num, 'fromId': self.myId, 'to': self.my_num,
+            'decoded': {'portnum': 'ROUTING_APP', 'requestId': packet_id, 'routing': {'errorReason': 'NONE'}},
+        }, interface=self)
+
+    def _start(self, target):
+        self._thread = threading.Thread(target=target, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        pub.sendMessage("meshtastic.connection.lost", interface=self)
+
+
+class SimulatedInterface(_FakeInterfaceBase):
+    """
+    Synthetic mesh of `node_count` nodes publishing on the library's pubsub topics.
+
+    On start it dumps the whole NodeDB (like a real radio after connecting), then
+    emits `packets_per_second` packets: node/position updates, text messages and
+    telemetry in the given proportions.
+    """
+
+    def __init__(self, node_count=1000, packets_per_second=50.0, text_ratio=0.1,
+                 telemetry_ratio=0.2, seed=None, center=SIM_CENTER, spread_deg=0.3):
+        super().__init__()
+        self.node_count = node_count
+        self.packets_per_second = packets_per_second
+        self.text_ratio = text_ratio
+        self.telemetry_ratio = telemetry_ratio
+        self.rng = random.Random(seed)
+        self.packets_sent = 0
+
+        for i in range(node_count):
+            node = make_node(i, self.rng, center, spread_deg)
+            self.nodesByNum[node['num']] = node
+            self.nodes[node['user']['id']] = node
+        self._nums = list(self.nodesByNum)
+
+        self._start(self._run)
+
+    def _run(self):
+        # Initial NodeDB dump, as a real radio sends during the config handshake
+        for node in list(self.nodesByNum.values()):
+            if self._stop.is_set():
+                return
+            pub.sendMessage("meshtastic.node.updated", node=node, interface=self)
+        pub.sendMessage("meshtastic.connection.established", interface=self)
+
+        interval = 1.0 / self.packets_per_second if self.packets_per_second > 0 else None
+        next_time = time.monotonic()
+        while interval and not self._stop.is_set():
+            self._emit_one()
+            self.packets_sent += 1
+            next_time += interval
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+
+    def _emit_one(self):
+        node = self.nodesByNum[self.rng.choice(self._nums)]
+        roll = self.rng.random()
+
+        if roll < self.text_ratio:
+            text = " ".join(self.rng.choice(SIM_WORDS) for _ in range(self.rng.randint(1, 8)))
+            packet = make_text_packet(node, text, self.rng)
+            pub.sendMessage("meshtastic.receive.text", packet=packet, interface=self)
+
+        elif roll < self.text_ratio + self.telemetry_ratio:
+            metrics = node['deviceMetrics']
+            metrics['voltage'] = round(min(4.2, max(3.3, metrics['voltage'] + self.rng.uniform(-0.02, 0.02))), 3)
+            metrics['batteryLevel'] = max(0, min(100, metrics['batteryLevel'] + self.rng.choice((-1, 0, 0, 1))))
+            packet = make_packet(node, self.rng)
+            packet['decoded'] = {'portnum': 'TELEMETRY_APP', 'telemetry': {
+                'time': packet['rxTime'], 'deviceMetrics': dict(metrics)
+            }}
+            pub.sendMessage("meshtastic.receive.telemetry", packet=packet, interface=self)
+
+        else:
+            # Position report: small random walk
+            pos = node['position']
+            pos['latitude'] += self.rng.uniform(-0.0005, 0.0005)
+            pos['longitude'] += self.rng.uniform(-0.0005, 0.0005)
+            node['lastHeard'] = int(time.time())
+            node['snr'] = round(self.rng.uniform(-15, 10), 2)
+            pub.sendMessage("meshtastic.node.updated", node=node, interface=self)
+
+
+# --- Recording and replay ---
+
+def _encode(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {'$b64': base64.b64encode(value).decode('ascii')}
+    return None  # Protobuf objects and the like are not recorded
+
+def _decode(obj):
+    if len(obj) == 1 and '$b64' in obj:
+        return base64.b64decode(obj['$b64'])
+    return obj
+
+def _strip(value):
+    """Drop keys the library adds that are not JSON-like (e.g. 'raw' protobufs)."""
+    if isinstance(value, dict):
+        return {k: _strip(v) for k, v in value.items() if k != 'raw'}
+    if isinstance(value, list):
+        return [_strip(v) for v in value]
+    return value
+
+
+class PacketRecorder:
+    """
+    Saves live traffic to a gzip file of JSON lines for later replay:
+    {"t": seconds since start, "topic": "...", "data": {...}}.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._t0 = None
+
+    def start(self):
+        self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+        self._t0 = time.monotonic()
+        pub.subscribe(self._on_packet, "meshtastic.receive")
+        pub.subscribe(self._on_node, "meshtastic.node.updated")
+        logger.info(f"Recording packets to {self.path}")
+
+    def stop(self):
+        pub.unsubscribe(self._on_packet, "meshtastic.receive")
+        pub.unsubscribe(self._on_node, "meshtastic.node.updated")
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+        logger.info(f"Recorded {self.count} events to {self.path}")
+
+    def _write(self, topic, data):
+        line = json.dumps({'t': round(time.monotonic() - self._t0, 3), 'topic': topic, 'data': _strip(data)},
+                          default=_encode, separators=(',', ':'))
+        with self._lock:
+            if self._file:
+                self._file.write(line + "\n")
+                self.count += 1
+
+    def _on_packet(self, packet, interface=None, topic=pub.AUTO_TOPIC):
+        self._write(topic.getName(), {'packet': packet})
+
+    def _on_node(self, node, interface=None):
+        self._write("meshtastic.node.updated", {'node': node})
+
+
+class ReplayInterface(_FakeInterfaceBase):
+    """Replays a PacketRecorder file on the original topics, `speed` times faster."""
+
+    def __init__(self, path, speed=1.0, repeat=False):
+        super().__init__(long_name="Replay")
+        self.path = path
+        self.speed = speed
+        self.repeat = repeat
+        self._start(self._run)
+
+    def _run(self):
+        pub.sendMessage("meshtastic.connection.established", interface=self)
+        while not self._stop.is_set():
+            start = time.monotonic()
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if self._stop.is_set():
+                        return
+                    event = json.loads(line, object_hook=_decode)
+                    delay = event['t'] / self.speed - (time.monotonic() - start)
+                    if delay > 0:
+                        self._stop.wait(delay)
+                    pub.sendMessage(event['topic'], interface=self, **event['data'])
+            if not self.repeat:
+                logger.info(f"Replay of {self.path} finished")
+                return
@@ -0,0 +1,51 @@
+# startup_profiler.py
+
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class StartupProfiler:
+    """Records how long each startup phase takes. Enabled with --profile-startup."""
+
+    def __init__(self):
+        self.enabled = False
+        self._t0 = time.perf_counter()
+        self.phases = []   # (name, duration seconds, offset from process start seconds)
+
+    def start(self):
+        self.enabled = True
+        self._t0 = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block of startup work."""
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                end = time.perf_counter()
+                self.phases.append((name, end - begin, end - self._t0))
+                logger.info(f"[startup] {name}: {(end - begin) * 1000:.1f} ms")
+
+    def mark(self, name):
+        """Record a milestone (e.g. first paint) relative to start()."""
+        if self.enabled:
+            offset = time.perf_counter() - self._t0
+            self.phases.append((name, 0.0, offset))
+            logger.info(f"[startup] {name} at {offset * 1000:.1f} ms")
+
+    def report(self):
+        """Log a summary table of all phases recorded so far."""
+        if not self.enabled:
+            return
+        lines = ["Startup profile:", f"  {'phase':<32}{'took (ms)':>12}{'at (ms)':>12}"]
+        for name, duration, offset in self.phases:
+            lines.append(f"  {name:<32}{duration * 1000:>12.1f}{offset * 1000:>12.1f}")
+        logger.info("\n".join(lines))
+
+# Shared instance used by main.py and MainWindow
+profiler = StartupProfiler()
@@ -0,0 +1,137 @@
+# tile_store.py
+# Map tiles from a local MBTiles file (https://github.com/mapbox/mbtiles-spec):
+# a SQLite database with one row per tile, read through an in-memory LRU.
+
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from meshtastic_mac_client.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+DEFAULT_TILES_PATH = os.path.join(ASSETS_DIR, "offline_tiles.mbtiles")
+
+MIME_TYPES = {'png': "image/png", 'jpg': "image/jpeg", 'jpeg': "image/jpeg", 'webp': "image/webp"}
+
+# Missing tiles are cached too, so panning over empty areas doesn't hit SQLite;
+# they count as this many bytes against the cache budget
+MISSING_TILE_COST = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level INTEGER,
+    tile_column INTEGER,
+    tile_row INTEGER,
+    tile_data BLOB
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row);
+"""
+
+def tms_row(y, zoom):
+    """MBTiles stores rows bottom-up (TMS); Leaflet asks for them top-down (XYZ)."""
+    return (2 ** zoom) - 1 - y
+
+
+class MBTilesStore:
+    """
+    Reads (and, for the prefetch tool, writes) an MBTiles file.
+
+    get_tile() takes XYZ coordinates as Leaflet requests them. Hot tiles are
+    kept in an LRU bounded by cache_bytes, so panning back and forth or
+    zooming in and out never goes back to disk.
+    """
+
+    def __init__(self, path, readonly=True, cache_bytes=32 * 1024 * 1024):
+        self.path = path
+        self.readonly = readonly
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()   # (z, x, y) -> bytes, or None for a known missing tile
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.executescript(SCHEMA)
+            self.conn.commit()
+        self.metadata = dict(self.conn.execute("SELECT name, value FROM metadata").fetchall())
+
+    @property
+    def format(self):
+        return self.metadata.get('format', 'png').lower()
+
+    @property
+    def mime_type(self):
+        return MIME_TYPES.get(self.format)
+
+    def zoom_range(self):
+        """(minzoom, maxzoom) from the metadata, or from the tiles if it is missing."""
+        if 'minzoom' in self.metadata and 'maxzoom' in self.metadata:
+            return int(self.metadata['minzoom']), int(self.metadata['maxzoom'])
+        with self._lock:
+            row = self.conn.execute("SELECT MIN(zoom_level), MAX(zoom_level) FROM tiles").fetchone()
+        return (row[0], row[1]) if row[0] is not None else (0, 0)
+
+    def get_tile(self, z, x, y):
+        key = (z, x, y)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                metrics.incr("tile_cache_hits")
+                return self._cache[key]
+
+            metrics.incr("tile_cache_misses")
+            row = self.conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, tms_row(y, z))).fetchone()
+            data = bytes(row[0]) if row else None
+            self._remember(key, data)
+            return data
+
+    def _remember(self, key, data):
+        self._cache[key] = data
+        self._cached_bytes += len(data) if data else MISSING_TILE_COST
+        while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+            _, old = self._cache.popitem(last=False)
+            self._cached_bytes -= len(old) if old else MISSING_TILE_COST
+
+    def cached_bytes(self):
+        return self._cached_bytes
+
+    # --- Writing (prefetch tool) ---
+
+    def existing_tiles(self, zoom):
+        """XYZ (x, y) of the tiles already stored at a zoom level."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT tile_column, tile_row FROM tiles WHERE zoom_level = ?", (zoom,)).fetchall()
+        return {(x, tms_row(row, zoom)) for x, row in rows}
+
+    def put_tiles(self, tiles):
+        """Store [(z, x, y, data)] in one transaction."""
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)",
+                [(z, x, tms_row(y, z), sqlite3.Binary(data)) for z, x, y, data in tiles])
+            self.conn.commit()
+            for z, x, y, _ in tiles:
+                if (z, x, y) in self._cache:
+                    old = self._cache.pop((z, x, y))
+                    self._cached_bytes -= len(old) if old else MISSING_TILE_COST
+
+    def set_metadata(self, values):
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)",
+                                  [(k, str(v)) for k, v in values.items()])
+            self.conn.commit()
+        self.metadata.update({k: str(v) for k, v in values.items()})
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,108 @@
+# update_dispatcher.py
+
+import itertools
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Event kinds published by MeshtasticManager
+NODE = "node"
+MESSAGE = "message"
+TELEMETRY = "telemetry"
+RADIO = "radio"
+DEVICE = "device"
+
+class UpdateDispatcher:
+    """
+    Coalesces radio events into at most one batch per kind per frame.
+
+    post() may be called from any thread (the BLE reader, pubsub). Events are
+    keyed: a newer event with the same key replaces the pending one (counted as
+    merged). Handlers run on the event loop thread and receive a list of payloads.
+    """
+
+    def __init__(self, loop, rate_hz=20, max_pending=5000):
+        self.loop = loop
+        self.interval = 1.0 / rate_hz
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._pending = {}        # kind -> {key: payload}, insertion ordered
+        self._pending_count = 0
+        self._handlers = {}       # kind -> [callable]
+        self._scheduled = False
+        self._last_flush = 0.0
+        self._unique = itertools.count()
+
+        self.stats = {
+            'posted': 0,     # events handed to post()
+            'merged': 0,     # events that replaced a pending event with the same key
+            'dropped': 0,    # events discarded because max_pending was reached
+            'delivered': 0,  # payloads handed to handlers
+            'frames': 0,     # flushes that delivered at least one batch
+        }
+
+    def subscribe(self, kind, handler):
+        """Register handler(batch) for an event kind."""
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def post(self, kind, key, payload):
+        """Queue an event. A key of None means the event is never merged."""
+        if key is None:
+            key = ("unique", next(self._unique))
+
+        with self._lock:
+            self.stats['posted'] += 1
+            pending = self._pending.setdefault(kind, {})
+            if key in pending:
+                self.stats['merged'] += 1
+            elif self._pending_count >= self.max_pending:
+                self.stats['dropped'] += 1
+                return
+            else:
+                self._pending_count += 1
+            pending[key] = payload
+
+            if self._scheduled:
+                return
+            self._scheduled = True
+
+        self.loop.call_soon_threadsafe(self._schedule_flush)
+
+    def _schedule_flush(self):
+        # Never deliver more often than rate_hz
+        delay = max(0.0, self._last_flush + self.interval - self.loop.time())
+        self.loop.call_later(delay, self.flush)
+
+    def flush(self):
+        """Deliver everything pending now. Runs on the event loop thread."""
+        with self._lock:
+            batches = self._pending
+            self._pending = {}
+            self._pending_count = 0
+            self._scheduled = False
+        self._last_flush = self.loop.time()
+
+        if not batches:
+            return
+        self.stats['frames'] += 1
+        for kind, items in batches.items():
+            batch = list(items.values())
+            self.stats['delivered'] += len(batch)
+            for handler in self._handlers.get(kind, []):
+                try:
+                    handler(batch)
+                except Exception as e:
+                    logger.error(f"Error delivering {kind} batch: {e}")
+
+    def pending_count(self):
+        with self._lock:
+            return self._pending_count
+
+    def get_stats(self):
+        """Snapshot of the dispatcher counters."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['pending'] = self._pending_count
+        return stats
@@ -1,20 +1,91 @@
 import sys
 import os
+import argparse
 import asyncio
-import qasync
-from PyQt6.QtWidgets import QApplication
+import logging
 
-# Update this to use the full package name
-from meshtastic_mac_client.ui.main_window import MainWindow
-from meshtastic_mac_client.core.database import DatabaseManager
+from meshtastic_mac_client.core.startup_profiler import profiler
+
+logger = logging.getLogger(__name__)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="meshtastic-mac-client")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="log import and construction time per startup phase")
+    parser.add_argument("--serial", metavar="PORT", nargs="?", const="",
+                        help="connect to a radio on a serial port (auto-detected if PORT is omitted)")
+    parser.add_argument("--tcp", metavar="HOST[:PORT]",
+                        help="connect to a radio or meshtasticd over TCP (default port 4403)")
+    parser.add_argument("--simulate", metavar="NODES[:RATE]",
+                        help="connect to a simulated mesh, e.g. 1000:50 for 1000 nodes at 50 packets/s")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="connect to a replay of a file written with --record")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="replay speed multiplier (default 1.0)")
+    parser.add_argument("--record", metavar="FILE",
+                        help="record all received packets to FILE (gzip JSON lines)")
+    parser.add_argument("--tiles", metavar="FILE", default=None,
+                        help="offline map tiles (MBTiles); default assets/offline_tiles.mbtiles if present")
+    # Unknown arguments are left for Qt
+    return parser.parse_known_args(argv[1:])
+
+def radio_from_args(args):
+    """(kind, address, label, options) for MainWindow, or None to connect manually."""
+    from meshtastic_mac_client.core.interfaces import SERIAL, TCP, SIMULATED, REPLAY
+    if args.serial is not None:
+        return (SERIAL, args.serial or None, args.serial or "Serial (auto-detect)", {})
+    if args.tcp:
+        return (TCP, args.tcp, args.tcp, {})
+    if args.simulate:
+        nodes, _, rate = args.simulate.partition(":")
+        options = {'node_count': int(nodes), 'packets_per_second': float(rate or 10)}
+        return (SIMULATED, None, f"Simulated mesh ({args.simulate})", options)
+    if args.replay:
+        return (REPLAY, args.replay, f"Replay of {args.replay}", {'speed': args.replay_speed})
+    return None
 
 def main():
-    app = QApplication(sys.argv)
-    loop = qasync.QEventLoop(app)
-    asyncio.set_event_loop(loop)
+    args, qt_args = parse_args(sys.argv)
+    if args.profile_startup:
+        logging.basicConfig(level=logging.INFO)
+        profiler.start()
+
+    with profiler.phase("import Qt"):
+        import qasync
+        from PyQt6.QtCore import Qt, QTimer
+        from PyQt6.QtWidgets import QApplication
+
+    with profiler.phase("import ui"):
+        # Update this to use the full package name
+        from meshtastic_mac_client.ui.main_window import MainWindow
+
+    # Lets the Map tab import QtWebEngine lazily, after the application exists
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+
+    # Offline map tiles need their URL scheme registered before QApplication;
+    # QtWebEngine is only imported this early when a tile file exists
+    from meshtastic_mac_client.core.tile_store import DEFAULT_TILES_PATH
+    tiles_path = args.tiles or DEFAULT_TILES_PATH
+    if os.path.exists(tiles_path):
+        with profiler.phase("offline tiles"):
+            from meshtastic_mac_client.ui.tile_scheme import register_tile_scheme
+            register_tile_scheme(tiles_path)
+    elif args.tiles:
+        logger.warning(f"Tile file {args.tiles} not found; the map will use online tiles")
+
+    with profiler.phase("QApplication"):
+        app = QApplication([sys.argv[0]] + qt_args)
+        loop = qasync.QEventLoop(app)
+        asyncio.set_event_loop(loop)
+
+    with profiler.phase("MainWindow"):
+        window = MainWindow(loop, radio=radio_from_args(args), record_path=args.record)
+        window.show()
 
-    window = MainWindow(loop)
-    window.show()
+    def first_paint():
+        profiler.mark("first paint")
+        profiler.report()
+    QTimer.singleShot(0, first_paint)
 
     try:
         with loop:
@@ -23,4 +94,4 @@ def main():
         sys.exit(0)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
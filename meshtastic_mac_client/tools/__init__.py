@@ -0,0 +1 @@
+# Developer Tools
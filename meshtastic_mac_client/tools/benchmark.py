@@ -0,0 +1,324 @@
+# benchmark.py
+#
+# Measures the ingest-to-render path against synthetic meshes and writes the
+# results as JSON so runs from different versions can be compared:
+#
+#   python -m meshtastic_mac_client.tools.benchmark --output bench.json
+#   python -m meshtastic_mac_client.tools.benchmark --compare old.json --output new.json
+#
+# Qt stages run on the offscreen platform and are skipped if PyQt6 (or
+# QtWebEngine for the map) is not installed.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from meshtastic_mac_client.core.database import DatabaseManager
+from meshtastic_mac_client.core.simulator import make_node, make_text_packet, SIM_WORDS, SIM_CENTER
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [100, 1000, 10000]
+
+
+def package_version():
+    try:
+        from importlib.metadata import version
+        return version("meshtastic_mac_client")
+    except Exception:
+        return "unknown"
+
+
+def timed(fn, repeat=3, setup=None):
+    """
+    (best, median) wall time of `repeat` runs of fn(), in seconds. With
+    `setup`, each run is fn(setup()) and setup() is not timed: use it to give
+    every run fresh state, so repeats don't replay data that the first run
+    already stored and that now takes the unchanged/no-op paths.
+    """
+    times = []
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+
+class Bench:
+    def __init__(self, sizes, repeat, workdir):
+        self.sizes = sizes
+        self.repeat = repeat
+        self.workdir = workdir
+        self.results = []
+
+    def record(self, name, nodes, items, best, median):
+        result = {
+            'name': name,
+            'nodes': nodes,
+            'items': items,
+            'best_s': round(best, 6),
+            'median_s': round(median, 6),
+            'per_item_us': round(best / items * 1e6, 3) if items else None,
+            'items_per_s': round(items / best, 1) if best > 0 else None,
+        }
+        self.results.append(result)
+        logger.info(f"{name:<28} n={nodes:<6} best={best * 1000:9.2f} ms  "
+                    f"({result['per_item_us']} us/item)")
+
+    def new_db(self, tag):
+        path = os.path.join(self.workdir, f"{tag}.db")
+        return DatabaseManager(path)
+
+    def run(self):
+        for n in self.sizes:
+            rng = random.Random(n)
+            nodes = [make_node(i, rng) for i in range(n)]
+            texts = [make_text_packet(rng.choice(nodes), " ".join(rng.choices(SIM_WORDS, k=6)), rng)
+                     for _ in range(n)]
+
+            self.bench_database(n, nodes)
+            self.bench_manager(n, nodes, texts)
+            self.bench_node_list(n, nodes)
+            self.bench_clustering(n, nodes)
+            self.bench_map(n, nodes)
+        return self.results
+
+    # --- Stages ---
+
+    def bench_database(self, n, nodes):
+        dbs = []
+        def fresh_db():
+            dbs.append(self.new_db(f"db-{n}-{len(dbs)}"))
+            return dbs[-1]
+        try:
+            def save_and_flush(db):
+                for node in nodes:
+                    db.save_node(node)
+                db.flush(timeout=60)
+            self.record("db.save_node+flush", n, n, *timed(save_and_flush, self.repeat, fresh_db))
+
+            # The reads below don't change anything, so they share the last database
+            db = dbs[-1]
+            self.record("db.get_nodes", n, n, *timed(db.get_nodes, self.repeat))
+            self.record("db.get_all_nodes", n, n, *timed(db.get_all_nodes, self.repeat))
+
+            def all_changes():
+                seq, more = 0, True
+                while more:
+                    changes = db.get_changes_since(seq, tables=['nodes'])
+                    seq, more = changes['seq'], changes['more']
+            self.record("db.get_changes_since(0)", n, n, *timed(all_changes, self.repeat))
+            latest = db.get_changes_since(0, limit=n + 1)['seq']
+            self.record("db.get_changes_since(idle)", n, 1,
+                        *timed(lambda: db.get_changes_since(latest), self.repeat))
+        finally:
+            for db in dbs:
+                db.close()
+
+    def bench_manager(self, n, nodes, texts):
+        from meshtastic_mac_client.core.meshtastic_manager import MeshtasticManager
+        loop = asyncio.new_event_loop()
+        dbs = []
+
+        def fresh_manager():
+            # A manager that has not seen the mesh yet, on its own database
+            db = self.new_db(f"manager-{n}-{len(dbs)}")
+            dbs.append(db)
+            manager = MeshtasticManager(db, loop)
+            # Large enough that the dispatcher never drops during the run
+            manager.dispatcher.max_pending = 10 * n + 10
+            return manager
+
+        def known_mesh():
+            # Messages arrive from nodes the manager already knows
+            manager = fresh_manager()
+            node_updates(manager)
+            manager.db.flush(timeout=60)
+            return manager
+
+        def node_updates(manager):
+            for node in nodes:
+                manager.on_node_update(node)
+
+        def messages(manager):
+            for packet in texts:
+                manager.on_message_received(packet, None)
+
+        try:
+            self.record("manager.on_node_update", n, n, *timed(node_updates, self.repeat, fresh_manager))
+            self.record("manager.on_message_received", n, n, *timed(messages, self.repeat, known_mesh))
+        finally:
+            for db in dbs:
+                db.flush(timeout=60)
+                db.close()
+            loop.close()
+
+    def _qt_app(self):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        try:
+            from PyQt6.QtCore import Qt
+            from PyQt6.QtWidgets import QApplication
+        except ImportError:
+            return None
+        app = QApplication.instance()
+        if app is None:
+            QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+            app = QApplication([sys.argv[0]])
+        return app
+
+    def bench_node_list(self, n, nodes):
+        app = self._qt_app()
+        if app is None:
+            logger.info("PyQt6 not installed; skipping NodeListPanel")
+            return
+        from PyQt6.QtWidgets import QWidget
+        from meshtastic_mac_client.ui.node_list_panel import NodeListPanel
+
+        db = self.new_db(f"list-{n}")
+        try:
+            for node in nodes:
+                db.save_node(node)
+            db.flush(timeout=60)
+
+            host = QWidget()
+            host.db = db
+            panel = NodeListPanel(host)
+
+            def refresh():
+                # From scratch each run, as on startup
+                panel._seq = 0
+                panel.model.set_rows([])
+                panel.refresh_list()
+                app.processEvents()
+            self.record("NodeListPanel.refresh_list", n, n, *timed(refresh, self.repeat))
+
+            rng = random.Random(n)
+            def heard_again():
+                # Every node heard again with a new SNR, so each upsert is a real change
+                heard = time.time()
+                return [dict(node, lastHeard=heard, snr=round(rng.uniform(-20.0, 10.0), 2)) for node in nodes]
+
+            def upserts(updated):
+                panel.upsert_nodes(updated)
+                app.processEvents()
+            self.record("NodeListPanel.upsert_nodes", n, n, *timed(upserts, self.repeat, heard_again))
+            host.deleteLater()
+        finally:
+            db.close()
+
+    def bench_clustering(self, n, nodes):
+        from meshtastic_mac_client.core.clustering import GridClusterer, marker_for
+
+        markers = [marker_for(node) for node in nodes]
+        clusterer = GridClusterer()
+        for marker in markers:
+            clusterer.update(marker)
+
+        def zoom_levels():
+            # Each zoom reassigns every node to a cell and builds the visible items
+            for zoom in range(8, 16):
+                clusterer.set_view(zoom, bench_view(zoom))
+                clusterer.delta()
+        self.record("GridClusterer.zoom 8-15", n, n * 8, *timed(zoom_levels, self.repeat))
+
+        clusterer.set_view(12, bench_view(12))
+        clusterer.delta()
+        def live_updates():
+            for marker in markers[:100]:
+                clusterer.update(dict(marker, lat=marker['lat'] + 0.0001))
+                clusterer.delta()
+        self.record("GridClusterer.update+delta", n, 100, *timed(live_updates, self.repeat))
+
+    def bench_map(self, n, nodes):
+        app = self._qt_app()
+        if app is None:
+            logger.info("PyQt6 not installed; skipping MapPanel")
+            return
+        try:
+            from meshtastic_mac_client.ui.map_panel import MapPanel
+        except ImportError:
+            logger.info("PyQt6-WebEngine not installed; skipping MapPanel")
+            return
+        from PyQt6.QtCore import QEventLoop, QTimer
+
+        panel = MapPanel()
+        panel.clusterer.set_view(12, bench_view(12))
+        # Wait for the one-time page load so update_map produces real deltas
+        wait = QEventLoop()
+        panel.web_view.loadFinished.connect(wait.quit)
+        QTimer.singleShot(15000, wait.quit)
+        wait.exec()
+
+        def full_sync():
+            # Fresh positions each run so every marker is a delta
+            for node in nodes:
+                node['position']['latitude'] += 0.0001
+            panel.update_map(nodes)
+            panel._flush()
+        self.record("MapPanel.update_map+flush", n, n, *timed(full_sync, self.repeat))
+        panel.deleteLater()
+
+
+def bench_view(zoom):
+    """Tile-aligned view around the synthetic mesh, as MapPanel would use at this zoom."""
+    from meshtastic_mac_client.core.geo import tile_range, tile_range_bbox
+    lat, lon = SIM_CENTER
+    return tile_range_bbox(tile_range((lat - 0.3, lon - 0.3, lat + 0.3, lon + 0.3), zoom))
+
+
+def compare(previous, results):
+    """Log the ratio of each result against a previous run (>1.0 means slower)."""
+    old = {(r['name'], r['nodes']): r for r in previous['results']}
+    for r in results:
+        prev = old.get((r['name'], r['nodes']))
+        if prev and prev['best_s']:
+            ratio = r['best_s'] / prev['best_s']
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            logger.info(f"{r['name']:<28} n={r['nodes']:<6} {ratio:6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ingest-to-render path.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="synthetic mesh sizes (default: 100 1000 10000)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    parser.add_argument("--output", default="bench.json", help="JSON results file")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="previous results to compare against")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = Bench(args.sizes, args.repeat, workdir).run()
+
+    report = {
+        'version': package_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote {len(results)} results to {args.output}")
+
+    if previous:
+        compare(previous, results)
+
+if __name__ == "__main__":
+    main()
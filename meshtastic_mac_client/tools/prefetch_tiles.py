@@ -0,0 +1,162 @@
+# prefetch_tiles.py
+#
+# Seeds an MBTiles file for offline use by downloading every tile of a
+# bounding box over a range of zoom levels:
+#
+#   python -m meshtastic_mac_client.tools.prefetch_tiles --bbox 39.9,-105.4,40.3,-104.9 --zooms 8-15
+#
+# Tiles already in the file are skipped, so an interrupted run can be resumed
+# and a larger area can be added later. With --leaflet the Leaflet JS/CSS is
+# downloaded too, so the map page needs no network at all.
+#
+# Respect the tile server's usage policy: the public OpenStreetMap servers
+# forbid bulk downloads, so large areas should use your own or a commercial
+# tile server (--url).
+
+import argparse
+import logging
+import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from meshtastic_mac_client.core.geo import tile_range
+from meshtastic_mac_client.core.tile_store import MBTilesStore, DEFAULT_TILES_PATH, ASSETS_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+USER_AGENT = "meshtastic-mac-client tile prefetch"
+LEAFLET_URL = "https://unpkg.com/leaflet@1.9.4/dist/"
+LEAFLET_FILES = ["leaflet.js", "leaflet.css", "images/layers.png", "images/layers-2x.png",
+                 "images/marker-icon.png", "images/marker-icon-2x.png", "images/marker-shadow.png"]
+
+BATCH_SIZE = 200     # Tiles written per transaction
+RETRIES = 3
+
+
+def parse_bbox(text):
+    south, west, north, east = (float(v) for v in text.split(","))
+    if south >= north or west >= east:
+        raise argparse.ArgumentTypeError("bbox must be SOUTH,WEST,NORTH,EAST")
+    return south, west, north, east
+
+def parse_zooms(text):
+    low, _, high = text.partition("-")
+    low, high = int(low), int(high or low)
+    if not 0 <= low <= high <= 22:
+        raise argparse.ArgumentTypeError("zooms must be MIN-MAX between 0 and 22")
+    return low, high
+
+def tiles_for(bbox, zoom):
+    """All XYZ tiles covering bbox at one zoom level."""
+    _, x0, y0, x1, y1 = tile_range(bbox, zoom, margin=0)
+    return [(zoom, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+def fetch(url, retries=RETRIES):
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    for attempt in range(retries):
+        try:
+            with urllib.request.urlopen(request, timeout=20) as response:
+                return response.read()
+        except Exception as e:
+            if attempt == retries - 1:
+                logger.warning(f"Giving up on {url}: {e}")
+                return None
+            time.sleep(2 ** attempt)
+
+def fetch_tile(url_template, tile):
+    z, x, y = tile
+    return tile, fetch(url_template.format(z=z, x=x, y=y))
+
+def download_leaflet():
+    target = os.path.join(ASSETS_DIR, "leaflet")
+    for name in LEAFLET_FILES:
+        data = fetch(LEAFLET_URL + name)
+        if data is None:
+            return False
+        path = os.path.join(target, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    logger.info(f"Leaflet saved to {target}")
+    return True
+
+def prefetch(store, bbox, zooms, url_template, workers):
+    todo = []
+    for zoom in range(zooms[0], zooms[1] + 1):
+        existing = store.existing_tiles(zoom)
+        todo.extend(t for t in tiles_for(bbox, zoom) if (t[1], t[2]) not in existing)
+    logger.info(f"{len(todo)} tiles to download")
+
+    done = failed = 0
+    batch = []
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (z, x, y), data in pool.map(lambda t: fetch_tile(url_template, t), todo):
+            if data is None:
+                failed += 1
+                continue
+            batch.append((z, x, y, data))
+            done += 1
+            if len(batch) >= BATCH_SIZE:
+                store.put_tiles(batch)
+                batch = []
+                rate = done / (time.monotonic() - started)
+                logger.info(f"{done}/{len(todo)} tiles ({rate:.1f}/s)")
+    if batch:
+        store.put_tiles(batch)
+    return done, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download map tiles into an MBTiles file for offline use.")
+    parser.add_argument("--bbox", type=parse_bbox, required=True, metavar="SOUTH,WEST,NORTH,EAST",
+                        help="area to download, in degrees")
+    parser.add_argument("--zooms", type=parse_zooms, default=(8, 14), metavar="MIN-MAX",
+                        help="zoom levels to download (default: 8-14)")
+    parser.add_argument("--output", default=DEFAULT_TILES_PATH, help="MBTiles file (created or extended)")
+    parser.add_argument("--url", default=DEFAULT_URL, help="tile URL template with {z}, {x} and {y}")
+    parser.add_argument("--workers", type=int, default=2, help="parallel downloads (default: 2)")
+    parser.add_argument("--max-tiles", type=int, default=20000,
+                        help="refuse to start above this many tiles (default: 20000)")
+    parser.add_argument("--leaflet", action="store_true", help="also download Leaflet for a fully offline map")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    total = sum(len(tiles_for(args.bbox, z)) for z in range(args.zooms[0], args.zooms[1] + 1))
+    if total > args.max_tiles:
+        logger.error(f"{total} tiles requested, above --max-tiles {args.max_tiles}; "
+                     "shrink the area or zoom range, or raise the limit")
+        return 1
+
+    if args.leaflet and not download_leaflet():
+        return 1
+
+    store = MBTilesStore(args.output, readonly=False)
+    try:
+        fmt = args.url.rsplit(".", 1)[-1].lower()
+        low, high = args.zooms
+        if store.metadata:
+            low = min(low, int(store.metadata.get('minzoom', low)))
+            high = max(high, int(store.metadata.get('maxzoom', high)))
+        store.set_metadata({
+            'name': store.metadata.get('name', "Meshtastic offline map"),
+            'format': fmt if fmt in ("png", "jpg", "jpeg", "webp") else "png",
+            'type': "baselayer",
+            'version': "1.1",
+            'minzoom': low,
+            'maxzoom': high,
+            'attribution': "&copy; OpenStreetMap contributors",
+        })
+        done, failed = prefetch(store, args.bbox, args.zooms, args.url, args.workers)
+    finally:
+        store.close()
+
+    logger.info(f"Stored {done} tiles in {args.output}" + (f", {failed} failed" if failed else ""))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QVariant
+from PyQt6.QtGui import QColor
+
+# Delivery state of outgoing messages as shown after the text
+STATUS_LABELS = {
+    "queued": "queued",
+    "sent": "sent",
+    "acked": "delivered \u2713",
+    "failed": "failed",
+}
+
+def message_key(row):
+    """Identity of a message shown before it had a database id: local id for ours, packet id for others."""
+    if row.get('local_id'):
+        return ('local', row['local_id'])
+    if row.get('packet_id'):
+        return ('packet', row['packet_id'])
+    return None
+
+class ChatMessageModel(QAbstractListModel):
+    """
+    Messages for one channel, oldest first.
+
+    Rows are plain dicts with at least 'display', 'role' and 'payload'. Older
+    pages are prepended as the user scrolls up, so only loaded pages live in memory
+    and the view only lays out what is visible.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        msg = self._rows[index.row()]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            text = f"[{msg['display']}]: {msg['payload']}"
+            status = msg.get('status')
+            return f"{text}  ({STATUS_LABELS.get(status, status)})" if status else text
+        if role == Qt.ItemDataRole.ForegroundRole:
+            if msg.get('status') == "failed":
+                return QColor("darkred")
+            return QColor("blue") if msg['role'] == "USER" else QColor("darkgreen")
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return str(msg.get('timestamp') or "")
+        return QVariant()
+
+    def oldest_id(self):
+        """Smallest database id loaded so far (the keyset cursor for the next page)."""
+        for msg in self._rows:
+            if msg.get('id') is not None:
+                return msg['id']
+        return None
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self.endResetModel()
+
+    def prepend(self, rows):
+        """
+        Add an older page. A page can contain messages already shown live
+        (appended before their write was committed); those keep their row
+        and take the database id instead of being added twice. Returns the
+        number of rows added.
+        """
+        live = {}
+        for position, row in enumerate(self._rows):
+            key = message_key(row) if row.get('id') is None else None
+            if key is not None:
+                live[key] = position
+        if live:
+            fresh = []
+            for row in rows:
+                position = live.get(message_key(row))
+                if position is None:
+                    fresh.append(row)
+                else:
+                    self._rows[position]['id'] = row['id']
+                    self._rows[position]['timestamp'] = row['timestamp']
+                    index = self.index(position)
+                    self.dataChanged.emit(index, index)
+            rows = fresh
+        if not rows:
+            return 0
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self._rows[0:0] = rows
+        self.endInsertRows()
+        return len(rows)
+
+    def append(self, row):
+        position = len(self._rows)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._rows.append(row)
+        self.endInsertRows()
+
+    def update_status(self, local_id, status):
+        """Update the delivery state of an outgoing message, if it is loaded."""
+        # Outgoing messages being tracked are almost always near the end
+        for row in range(len(self._rows) - 1, -1, -1):
+            if self._rows[row].get('local_id') == local_id:
+                self._rows[row]['status'] = status
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+                return
@@ -1,24 +1,52 @@
-from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QTextEdit,
-                             QHBoxLayout, QPushButton, QComboBox, QLabel)
-from PyQt6.QtCore import pyqtSignal
-from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QTextEdit, QListView, QListWidget,
+                             QHBoxLayout, QPushButton, QComboBox, QLabel, QLineEdit)
+from PyQt6.QtCore import pyqtSignal, QTimer
+from meshtastic_mac_client.core.metrics import metrics
+from meshtastic_mac_client.ui.chat_message_model import ChatMessageModel
 import asyncio
 
+# Messages fetched from the database per scroll-up
+PAGE_SIZE = 100
+# Maximum search hits shown
+SEARCH_LIMIT = 100
+
 class ChatPanel(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.main = parent
         self.layout = QVBoxLayout(self)
 
-        # Message History
-        self.txt_history = QTextEdit()
-        self.txt_history.setReadOnly(True)
-        self.layout.addWidget(self.txt_history)
+        # Search over all stored messages; hits are listed above the history
+        self.txt_search = QLineEdit()
+        self.txt_search.setPlaceholderText("Search messages...")
+        self.txt_search.setClearButtonEnabled(True)
+        self.txt_search.returnPressed.connect(self.run_search)
+        self.txt_search.textChanged.connect(lambda text: None if text else self.list_results.hide())
+        self.layout.addWidget(self.txt_search)
+
+        self.list_results = QListWidget()
+        self.list_results.setMaximumHeight(200)
+        self.list_results.hide()
+        self.layout.addWidget(self.list_results)
+
+        # Message History (virtualized: only visible rows are laid out)
+        self.model = ChatMessageModel(self)
+        self.list_history = QListView()
+        self.list_history.setModel(self.model)
+        self.list_history.setWordWrap(True)
+        self.list_history.setLayoutMode(QListView.LayoutMode.Batched)
+        self.list_history.setBatchSize(PAGE_SIZE)
+        self.list_history.verticalScrollBar().valueChanged.connect(self._on_scroll)
+        self.layout.addWidget(self.list_history)
+        self._has_more = True
+        self._loading = False
+        self._request = 0   # Bumped per channel switch; pages for an earlier one are dropped
 
         # Input Area
         input_layout = QHBoxLayout()
         self.combo_channel = QComboBox()
         self.combo_channel.addItems(["Primary", "Secondary 1", "Secondary 2"])
+        self.combo_channel.currentIndexChanged.connect(self.load_channel)
         input_layout.addWidget(QLabel("Channel:"))
         input_layout.addWidget(self.combo_channel)
 
@@ -32,24 +60,126 @@ class ChatPanel(QWidget):
 
         self.layout.addLayout(input_layout)
 
-    def on_new_message(self, display_name, role, payload, channel):
+        self.load_channel()
+
+    def _row_from_db(self, row):
+        if row['role'] == "USER":
+            display = "Me"
+        else:
+            display = self.main.manager.get_node_display_name(row['node_id'])
+        return {
+            'id': row['id'],
+            'display': display,
+            'role': row['role'],
+            'payload': row['payload'],
+            'timestamp': row['timestamp'],
+            'status': row['status'],
+            'local_id': row['local_id'],
+            'packet_id': row['packet_id'],
+        }
+
+    def load_channel(self, *args):
+        """Show the newest page of the selected channel."""
+        self.model.clear()
+        self._has_more = True
+        self._request += 1
+        asyncio.create_task(self._load_page(self._request, newest=True))
+
+    def load_older(self):
+        """Prepend the page before the oldest loaded message."""
+        if not self._has_more or self._loading:
+            return
+        asyncio.create_task(self._load_page(self._request))
+
+    def _fetch_page(self, channel, before_id, newest):
+        """Executor thread: one page of history."""
+        if newest:
+            # Messages for this channel that arrived while another was shown may still
+            # be queued for writing; commit them so the page includes them
+            self.main.db.flush(timeout=1.0)
+        return self.main.db.get_messages_page(channel, before_id=before_id, limit=PAGE_SIZE)
+
+    async def _load_page(self, request, newest=False):
+        """Query a page off the UI thread, then prepend it."""
+        self._loading = True
+        channel = self.combo_channel.currentIndex()
+        rows = await asyncio.get_running_loop().run_in_executor(
+            None, self._fetch_page, channel, None if newest else self.model.oldest_id(), newest)
+        if request != self._request:
+            return # The channel changed while we were working; its own load is running
+        self._loading = False
+        if len(rows) < PAGE_SIZE:
+            self._has_more = False
+
+        anchor = self.model.index(0)
+        added = self.model.prepend([self._row_from_db(r) for r in rows])
+        if newest:
+            self.list_history.scrollToBottom()
+        elif added and anchor.isValid():
+            # Keep the previously-first message in place instead of jumping to the top
+            self.list_history.scrollTo(self.model.index(added), QListView.ScrollHint.PositionAtTop)
+        # Once laid out, check that the view can scroll up to load more
+        QTimer.singleShot(0, self._fill_view)
+
+    def _fill_view(self):
+        """Load older pages until the history can scroll or runs out; scrolling up loads the rest."""
+        if self._has_more and self.list_history.verticalScrollBar().maximum() == 0:
+            self.load_older()
+
+    def _on_scroll(self, value):
+        scrollbar = self.list_history.verticalScrollBar()
+        if value == scrollbar.minimum() and scrollbar.maximum() > 0:
+            self.load_older()
+
+    def run_search(self):
+        query = self.txt_search.text().strip()
+        self.list_results.clear()
+        if not query:
+            self.list_results.hide()
+            return
+
+        results = self.main.db.search_messages(query, limit=SEARCH_LIMIT)
+        for row in results:
+            name = "Me" if row['role'] == "USER" else self.main.manager.get_node_display_name(row['node_id'])
+            self.list_results.addItem(f"{row['timestamp']}  [ch {row['channel']}] {name}: {row['snippet']}")
+        if not results:
+            self.list_results.addItem("No matches")
+        self.list_results.show()
+
+    @metrics.timed("ui.chat.messages")
+    def on_new_messages(self, messages):
+        """Batch entry point used by the update dispatcher."""
+        for display_name, role, payload, channel, packet_id in messages:
+            self.on_new_message(display_name, role, payload, channel, packet_id=packet_id)
+
+    def on_status_updates(self, updates):
+        """Delivery state changes for outgoing messages (from the outbound queue)."""
+        for local_id, status in updates:
+            self.model.update_status(local_id, status)
+
+    def on_new_message(self, display_name, role, payload, channel, local_id=None, status=None, packet_id=None):
         if not payload: return
-        cursor = self.txt_history.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End)
-        role_color = "blue" if role == "USER" else "darkgreen"
-        cursor.insertHtml(f"<b style='color:{role_color}'>[{display_name}]</b>: {payload}<br>")
-        self.txt_history.setTextCursor(cursor)
-        self.txt_history.ensureCursorVisible()
+        if channel != self.combo_channel.currentIndex():
+            return # Stored in the DB; shown when that channel is opened
+
+        scrollbar = self.list_history.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+        # No database id yet: the row is still in the write queue
+        self.model.append({
+            'id': None, 'display': display_name, 'role': role, 'payload': payload,
+            'local_id': local_id, 'packet_id': packet_id, 'status': status,
+        })
+        if at_bottom:
+            self.list_history.scrollToBottom()
 
     async def send_message(self):
         text = self.txt_input.toPlainText().strip()
         if not text: return
-        
+
         channel_idx = self.combo_channel.currentIndex()
-        success = await self.main.manager.send_text(text, channel_index=channel_idx)
-        
-        if success:
+        local_id = await self.main.manager.send_text(text, channel_index=channel_idx)
+
+        if local_id:
             self.txt_input.clear()
-            # Manually update the UI for the local user
-            self.on_new_message("Me", "USER", text, "Primary")
-            self.txt_input.clear()
\ No newline at end of file
+            # Manually update the UI for the local user; delivery state follows via on_status_updates
+            self.on_new_message("Me", "USER", text, channel_idx, local_id=local_id, status="queued")
@@ -1,8 +1,31 @@
-from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QPushButton,
-                             QComboBox, QLabel, QProgressBar)
-from PyQt6.QtCore import pyqtSignal, QObject
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QListWidget, QListWidgetItem,
+                             QComboBox, QLabel, QLineEdit)
+from PyQt6.QtCore import pyqtSignal, QObject, Qt, QSettings, QTimer
 import asyncio
-from meshtastic_mac_client.core.meshtastic_manager import MeshtasticManager
+from meshtastic_mac_client.core.radio import CONNECTED, DISCONNECTED
+from meshtastic_mac_client.core.interfaces import BLE, SERIAL, TCP, DEFAULT_TCP_PORT
+
+# Where the last successfully connected device is remembered
+SETTINGS_ORG = "Meshtastic"
+SETTINGS_APP = "MeshtasticMacClient"
+
+# (label, interface kind) offered in the connection type selector
+CONNECTION_KINDS = [
+    ("Bluetooth", BLE),
+    ("Serial (USB)", SERIAL),
+    ("TCP (network / meshtasticd)", TCP),
+]
+
+# How often the radio list's uptime figures are redrawn while the tab is shown
+RADIO_STATS_INTERVAL_MS = 1000
+
+def format_duration(seconds):
+    """e.g. 3725 -> '1h02m'."""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    return f"{minutes}m{secs:02d}s"
 
 class ConnectionSignals(QObject):
     connecting = pyqtSignal(str)
@@ -16,24 +39,54 @@ class ConnectionPanel(QWidget):
         self.main = parent
         self.signals = ConnectionSignals()
         self._is_connecting = False  # Add a guard flag
+        self._radio_items = {}       # radio name -> QListWidgetItem
+        self.settings = QSettings(SETTINGS_ORG, SETTINGS_APP)
         self.layout = QVBoxLayout(self)
 
+        # Fast path: reconnect to the last used device without scanning
+        self.btn_last = QPushButton()
+        self.btn_last.clicked.connect(lambda: asyncio.create_task(self.connect_last_device()))
+        self.layout.addWidget(self.btn_last)
+        self._update_last_button()
+
+        # Connection type
+        self.layout.addWidget(QLabel("Connection Type:"))
+        self.combo_kind = QComboBox()
+        for label, kind in CONNECTION_KINDS:
+            self.combo_kind.addItem(label, kind)
+        self.combo_kind.currentIndexChanged.connect(self._on_kind_changed)
+        self.layout.addWidget(self.combo_kind)
+
         # ... (Scan button setup)
         self.btn_scan = QPushButton("Scan Devices")
         self.btn_scan.clicked.connect(lambda: asyncio.create_task(self.scan_devices()))
         self.layout.addWidget(self.btn_scan)
 
         # ... (Combo setup)
-        self.layout.addWidget(QLabel("Select Device:"))
+        self.lbl_device = QLabel("Select Device:")
+        self.layout.addWidget(self.lbl_device)
         self.combo_devices = QComboBox()
         self.layout.addWidget(self.combo_devices)
 
-        # Connect Button
+        # TCP host (only shown for TCP)
+        self.txt_host = QLineEdit()
+        self.txt_host.setPlaceholderText(f"host[:port], default port {DEFAULT_TCP_PORT} (e.g. localhost for meshtasticd)")
+        self.txt_host.returnPressed.connect(lambda: asyncio.create_task(self.connect_device()))
+        self.txt_host.hide()
+        self.layout.addWidget(self.txt_host)
+
+        # Connect Button (adds a radio; already connected radios stay connected)
         self.btn_connect = QPushButton("Connect")
         self.btn_connect.clicked.connect(lambda: asyncio.create_task(self.connect_device()))
         self.layout.addWidget(self.btn_connect)
 
-        # Disconnect Button
+        # Radios and their connection state
+        self.layout.addWidget(QLabel("Radios:"))
+        self.list_radios = QListWidget()
+        self.list_radios.itemSelectionChanged.connect(self._update_buttons)
+        self.layout.addWidget(self.list_radios)
+
+        # Disconnect Button (selected radio, or all radios if none is selected)
         self.btn_disconnect = QPushButton("Disconnect")
         self.btn_disconnect.clicked.connect(lambda: asyncio.create_task(self.disconnect_device()))
         self.btn_disconnect.setEnabled(False)
@@ -42,53 +95,181 @@ class ConnectionPanel(QWidget):
         self.lbl_status = QLabel("Status: Idle")
         self.layout.addWidget(self.lbl_status)
 
+        # RADIO events only come on state changes; keep uptime ticking in between
+        self._stats_timer = QTimer(self)
+        self._stats_timer.timeout.connect(self.refresh_radio_stats)
+        self._stats_timer.start(RADIO_STATS_INTERVAL_MS)
+
+    def _on_kind_changed(self, index):
+        kind = self.combo_kind.currentData()
+        is_tcp = kind == TCP
+        self.txt_host.setVisible(is_tcp)
+        self.lbl_device.setText("Host:" if is_tcp else "Select Device:")
+        self.combo_devices.setVisible(not is_tcp)
+        self.btn_scan.setEnabled(not is_tcp and not self._is_connecting)
+        self.btn_scan.setText("Detect Ports" if kind == SERIAL else "Scan Devices")
+        self.combo_devices.clear()
+        if kind == SERIAL:
+            # Port detection is quick, so list ports right away
+            asyncio.create_task(self.scan_devices())
+        elif kind == BLE:
+            # Whatever the background scanner has already found
+            self.update_devices(self.main.manager.scanner.devices())
+        self._update_scan_button()
+
     async def scan_devices(self):
+        if self.combo_kind.currentData() == SERIAL:
+            self.combo_devices.clear()
+            ports = await self.main.manager.scan_serial_ports()
+            # Empty address lets the library pick the radio itself
+            self.combo_devices.addItem("Auto-detect", "")
+            for device, description in ports:
+                self.combo_devices.addItem(f"{description} ({device})" if description != device else device, device)
+            self.lbl_status.setText(f"Found {len(ports)} serial ports")
+            return
+
+        # Bluetooth: the button toggles the background scanner
+        manager = self.main.manager
+        if manager.scanner.is_running:
+            await manager.stop_scan()
+            self._update_scan_button()
+            self.lbl_status.setText(f"Scan stopped; {self.combo_devices.count()} devices")
+            return
+
         self.lbl_status.setText("Waking up Bluetooth...") # Feedback for the pulse
-        devices = await self.main.manager.scan_devices()
+        devices = await manager.scan_devices()
+        self._update_scan_button()
         
-        self.combo_devices.clear()
-        for dev in devices:
-            self.combo_devices.addItem(dev.name, dev.address)
+        # Later detections stream in through update_devices()
+        self.update_devices(devices)
         
-        self.lbl_status.setText(f"Found {len(devices)} devices")
+        self.lbl_status.setText(f"Found {len(devices)} devices (still scanning)")
+
+    def update_devices(self, devices):
+        """Add or refresh BLE devices in the list as the scanner reports them."""
+        if self.combo_kind.currentData() != BLE:
+            return
+        for dev in devices:
+            text = f"{dev.name}  ({dev.rssi} dBm)" if dev.rssi is not None else dev.name
+            index = self.combo_devices.findData(dev.address)
+            if index < 0:
+                self.combo_devices.addItem(text, dev.address)
+            else:
+                self.combo_devices.setItemText(index, text)
+
+    def _update_scan_button(self):
+        kind = self.combo_kind.currentData()
+        if kind == SERIAL:
+            self.btn_scan.setText("Detect Ports")
+        elif self.main.manager.scanner.is_running:
+            self.btn_scan.setText("Stop Scanning")
+        else:
+            self.btn_scan.setText("Scan Devices")
+
+    def _update_last_button(self):
+        label = self.settings.value("last_device/label")
+        self.btn_last.setText(f"Connect to {label}" if label else "Connect to Last Device")
+        self.btn_last.setEnabled(bool(label) and not self._is_connecting)
+
+    async def connect_last_device(self):
+        kind = self.settings.value("last_device/kind")
+        if not kind:
+            return
+        address = self.settings.value("last_device/address") or None
+        await self.connect_to(address, self.settings.value("last_device/label"), kind=kind)
 
     async def connect_device(self):
-        # Don't allow multiple clicks
-        if self._is_connecting or self.main.manager.is_connected:
+        kind = self.combo_kind.currentData()
+        if kind == TCP:
+            host = self.txt_host.text().strip()
+            if not host:
+                self.lbl_status.setText("Status: Enter a host first")
+                return
+            await self.connect_to(host, host, kind=TCP)
             return
-            
+
         address = self.combo_devices.currentData()
+        if kind == SERIAL:
+            await self.connect_to(address or None, self.combo_devices.currentText() or "Serial", kind=SERIAL)
+            return
         if not address:
             self.lbl_status.setText("Status: Select a device first")
             return
-        
+        found = self.main.manager.scanner.cache.get(address)
+        await self.connect_to(address, found.name if found else self.combo_devices.currentText())
+
+    async def connect_to(self, address, label, kind=BLE, **options):
+        """Connect through the manager; also used for simulated and replayed radios."""
+        # Don't allow multiple clicks
+        if self._is_connecting:
+            return
+
         self._is_connecting = True
         self.btn_connect.setEnabled(False)
         self.btn_scan.setEnabled(False)
-        self.signals.connecting.emit(self.combo_devices.currentText())
-        self.lbl_status.setText(f"Status: Connecting to {self.combo_devices.currentText()}...")
+        self.btn_last.setEnabled(False)
+        self.signals.connecting.emit(label)
+        self.lbl_status.setText(f"Status: Connecting to {label}...")
 
         try:
             # 2. Call the manager
-            success = await self.main.manager.connect(address)
+            name = await self.main.manager.connect(address, kind=kind, **options)
             
-            if success:
-                self.btn_disconnect.setEnabled(True)
-                radio_name = self.main.manager.get_local_node_name()
-                display_name = radio_name if radio_name else address
-                self.lbl_status.setText(f"Status: Connected to {radio_name}")
-                self.signals.connected.emit(address)
+            if name:
+                radio_name = self.main.manager.get_local_node_name(name)
+                display_name = radio_name if radio_name else label
+                self.lbl_status.setText(f"Status: Connected to {display_name}")
+                self.signals.connected.emit(name)
+                if kind in (BLE, SERIAL, TCP):
+                    self.settings.setValue("last_device/kind", kind)
+                    self.settings.setValue("last_device/address", address or "")
+                    self.settings.setValue("last_device/label", label)
             else:
-                self.btn_connect.setEnabled(True)
-                self.btn_scan.setEnabled(True)
                 self.lbl_status.setText("Status: Connection Failed")
         finally:
             self._is_connecting = False
+            self.btn_connect.setEnabled(True)
+            self.btn_scan.setEnabled(self.combo_kind.currentData() != TCP)
+            self._update_scan_button()
+            self._update_last_button()
 
     async def disconnect_device(self):
-        await self.main.manager.disconnect()
-        self.btn_connect.setEnabled(True)
-        self.btn_disconnect.setEnabled(False)
-        self.lbl_status.setText("Status: Disconnected")
-        self.signals.disconnected.emit()
+        selected = self.list_radios.selectedItems()
+        name = selected[0].data(Qt.ItemDataRole.UserRole) if selected else None
+        await self.main.manager.disconnect(name)
+        self.lbl_status.setText(f"Status: Disconnected {name}" if name else "Status: Disconnected")
+        if not self.main.manager.is_connected:
+            self.signals.disconnected.emit()
+
+    def update_radios(self, radios):
+        """Called with a batch of Radio.info() dicts whenever a radio changes state."""
+        for info in radios:
+            name = info['name']
+            item = self._radio_items.get(name)
+            if info['state'] == DISCONNECTED:
+                if item is not None:
+                    self.list_radios.takeItem(self.list_radios.row(item))
+                    del self._radio_items[name]
+                continue
+            if item is None:
+                item = QListWidgetItem()
+                item.setData(Qt.ItemDataRole.UserRole, name)
+                self.list_radios.addItem(item)
+                self._radio_items[name] = item
+            local_name = self.main.manager.get_local_node_name(name) if info['state'] == CONNECTED else None
+            suffix = f" \u2014 {local_name}" if local_name else ""
+            stats = f"up {format_duration(info['uptime'])}"
+            if info['drops']:
+                stats += f", {info['drops']} drops, {info['reconnects']} reconnects"
+            item.setText(f"{name} [{info['kind']}]: {info['state']}{suffix}  ({stats})")
+        self._update_buttons()
+
+    def refresh_radio_stats(self):
+        if not self._radio_items or not self.isVisible():
+            return
+        self.update_radios([radio.info() for radio in list(self.main.manager.radios.values())])
 
+    def _update_buttons(self):
+        self.btn_disconnect.setEnabled(bool(self._radio_items))
+        selected = self.list_radios.selectedItems()
+        self.btn_disconnect.setText("Disconnect Selected" if selected else "Disconnect All")
@@ -0,0 +1,108 @@
+import json
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QFileDialog, QMessageBox)
+from PyQt6.QtCore import QTimer
+from meshtastic_mac_client.core.metrics import metrics, rates
+
+REFRESH_INTERVAL_MS = 1000
+
+def _table(headers):
+    table = QTableWidget(0, len(headers))
+    table.setHorizontalHeaderLabels(headers)
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+    table.verticalHeader().setVisible(False)
+    table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+    return table
+
+def _fill(table, rows):
+    table.setRowCount(len(rows))
+    for r, row in enumerate(rows):
+        for c, value in enumerate(row):
+            table.setItem(r, c, QTableWidgetItem(str(value)))
+
+
+class DiagnosticsPanel(QWidget):
+    """Live view of the metrics registry: packet rates, stage latencies and queue depths."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.main = parent
+        self._snapshot = None   # Previous refresh's snapshot, the baseline for rates
+        self._rates = []
+        layout = QVBoxLayout(self)
+
+        # Export
+        buttons = QHBoxLayout()
+        self.summary_label = QLabel("")
+        buttons.addWidget(self.summary_label)
+        buttons.addStretch()
+        self.btn_json = QPushButton("Export JSON")
+        self.btn_json.clicked.connect(lambda: self.export("json"))
+        buttons.addWidget(self.btn_json)
+        self.btn_prom = QPushButton("Export Prometheus")
+        self.btn_prom.clicked.connect(lambda: self.export("prometheus"))
+        buttons.addWidget(self.btn_prom)
+        layout.addLayout(buttons)
+
+        layout.addWidget(QLabel("Packets per second"))
+        self.rates_table = _table(["Counter", "Labels", "Per second", "Total"])
+        layout.addWidget(self.rates_table)
+
+        layout.addWidget(QLabel("Stage latency (ms)"))
+        self.timers_table = _table(["Stage", "Count", "p50", "p99", "Max"])
+        layout.addWidget(self.timers_table)
+
+        layout.addWidget(QLabel("Queues"))
+        self.gauges_table = _table(["Gauge", "Value"])
+        layout.addWidget(self.gauges_table)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(REFRESH_INTERVAL_MS)
+        self.refresh()
+
+    def refresh(self):
+        # Sampling is cheap, but skip table rebuilds while the tab is hidden
+        if not self.isVisible() and self._snapshot is not None:
+            return
+        snap = metrics.snapshot()
+        self._rates = rates(snap, self._snapshot)
+        self._snapshot = snap
+
+        totals = {(r['name'], tuple(sorted(r['labels'].items()))): r['value'] for r in snap['counters']}
+        _fill(self.rates_table, [
+            (r['name'],
+             ", ".join(f"{k}={v}" for k, v in sorted(r['labels'].items())),
+             f"{r['value']:.1f}",
+             totals.get((r['name'], tuple(sorted(r['labels'].items()))), 0))
+            for r in self._rates
+        ])
+        _fill(self.timers_table, [
+            (stage, t['count'], f"{t['p50'] * 1000:.2f}", f"{t['p99'] * 1000:.2f}", f"{t['max'] * 1000:.2f}")
+            for stage, t in sorted(snap['timers'].items())
+        ])
+        _fill(self.gauges_table, [(name, "-" if value is None else value)
+                                  for name, value in snap['gauges'].items()])
+
+        packets = sum(r['value'] for r in self._rates if r['name'] == "packets")
+        lag = snap['timers'].get("event_loop_lag")
+        lag_text = f"{lag['p99'] * 1000:.1f} ms" if lag else "-"
+        self.summary_label.setText(f"{packets:.1f} packets/s  |  event loop lag p99: {lag_text}")
+
+    def export(self, fmt):
+        if fmt == "json":
+            path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "metrics.json", "JSON (*.json)")
+        else:
+            path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "metrics.prom", "Prometheus (*.prom *.txt)")
+        if not path:
+            return
+        # A fresh sample; rates are relative to the last refresh, which keeps its baseline
+        snap = metrics.snapshot()
+        try:
+            with open(path, 'w') as f:
+                if fmt == "json":
+                    json.dump(dict(snap, rates=rates(snap, self._snapshot)), f, indent=2)
+                else:
+                    f.write(metrics.to_prometheus(snap))
+        except OSError as e:
+            QMessageBox.warning(self, "Export Failed", str(e))
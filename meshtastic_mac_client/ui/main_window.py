@@ -3,6 +3,7 @@ import sys
 import threading
 import time
 import asyncio
+import importlib
 import logging
 
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QTabWidget,
@@ -11,23 +12,53 @@ from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QIcon
 from PyQt6.QtCore import QTimer
 from meshtastic_mac_client.core.database import DatabaseManager
+from meshtastic_mac_client.core.maintenance import Maintenance
 from meshtastic_mac_client.core.meshtastic_manager import MeshtasticManager
+from meshtastic_mac_client.core.update_dispatcher import NODE, MESSAGE, TELEMETRY, RADIO, DEVICE
+from meshtastic_mac_client.core.outbound_queue import STATUS
+from meshtastic_mac_client.core.radio import CONNECTED, DISCONNECTED
+from meshtastic_mac_client.core.startup_profiler import profiler
+from meshtastic_mac_client.core.metrics import monitor_loop_lag
 from meshtastic_mac_client.ui.connection_panel import ConnectionPanel
-from meshtastic_mac_client.ui.chat_panel import ChatPanel
-from meshtastic_mac_client.ui.node_list_panel import NodeListPanel
-from meshtastic_mac_client.ui.config_panel import ConfigPanel
-from meshtastic_mac_client.ui.map_panel import MapPanel
-from meshtastic_mac_client.ui.telemetry_panel import TelemetryPanel
-from meshtastic_mac_client.ui.admin_panel import AdminPanel
 
 logger = logging.getLogger(__name__)
 
+# Shutdown: seconds allowed for the radios to disconnect and for a running
+# maintenance chunk to finish; the database gets DatabaseManager.shutdown_timeout()
+DISCONNECT_TIMEOUT = 2.0
+MAINTENANCE_STOP_TIMEOUT = 1.0
+
+# (attribute, tab label, module, class). Everything except the Connection tab is
+# imported and built the first time its tab is selected, so QtWebEngine (Chromium),
+# pyqtgraph and numpy are only loaded when needed.
+LAZY_PANELS = [
+    ('chat_panel', "Chat", 'meshtastic_mac_client.ui.chat_panel', 'ChatPanel'),
+    ('nodes_panel', "NodeDB", 'meshtastic_mac_client.ui.node_list_panel', 'NodeListPanel'),
+    ('config_panel', "Config", 'meshtastic_mac_client.ui.config_panel', 'ConfigPanel'),
+    ('map_panel', "Map", 'meshtastic_mac_client.ui.map_panel', 'MapPanel'),
+    ('telemetry_panel', "Telemetry", 'meshtastic_mac_client.ui.telemetry_panel', 'TelemetryPanel'),
+    ('admin_panel', "Admin", 'meshtastic_mac_client.ui.admin_panel', 'AdminPanel'),
+    ('diagnostics_panel', "Diagnostics", 'meshtastic_mac_client.ui.diagnostics_panel', 'DiagnosticsPanel'),
+]
+
 class MainWindow(QMainWindow):
-    def __init__(self, loop):
+    def __init__(self, loop, radio=None, record_path=None):
+        """
+        radio: optional (kind, address, label, options) to connect on startup,
+               e.g. a simulated mesh for load testing.
+        record_path: save all received traffic to this file (see PacketRecorder).
+        """
         super().__init__()
         self.loop = loop
-        self.db = DatabaseManager()
-        self.manager = MeshtasticManager(self.db, self.loop)
+        with profiler.phase("database"):
+            self.db = DatabaseManager()
+            # Retention, vacuum and ANALYZE on a background thread
+            self.maintenance = Maintenance(self.db, on_pruned=self.on_rows_pruned,
+                                           is_idle=self.database_idle)
+            self.maintenance.start()
+        with profiler.phase("manager"):
+            self.manager = MeshtasticManager(self.db, self.loop)
+        self._map_version = 0   # NodeRegistry version the map was last refreshed to
 
         # UI Setup
         self.setWindowTitle("Meshtastic macOS Client")
@@ -42,84 +73,145 @@ class MainWindow(QMainWindow):
         self.tabs = QTabWidget()
         layout.addWidget(self.tabs)
 
-        # Create Panels
-        self.conn_panel = ConnectionPanel(self)
-        self.chat_panel = ChatPanel(self)
-        self.nodes_panel = NodeListPanel(self)
-        self.config_panel = ConfigPanel(self)
-        self.map_panel = MapPanel(self)
-        self.telemetry_panel = TelemetryPanel(self)
-        self.admin_panel = AdminPanel(self)
-
-        # Add to Tabs
+        # Create Panels: Connection now, the rest as placeholders until first shown
+        with profiler.phase("panel: Connection"):
+            self.conn_panel = ConnectionPanel(self)
         self.tabs.addTab(self.conn_panel, "Connection")
-        self.tabs.addTab(self.chat_panel, "Chat")
-        self.tabs.addTab(self.nodes_panel, "NodeDB")
-        self.tabs.addTab(self.config_panel, "Config")
-        self.tabs.addTab(self.map_panel, "Map")
-        self.tabs.addTab(self.telemetry_panel, "Telemetry")
-        self.tabs.addTab(self.admin_panel, "Admin")
+        for attr, label, _, _ in LAZY_PANELS:
+            setattr(self, attr, None)
+            self.tabs.addTab(QWidget(), label)
+        self.tabs.currentChanged.connect(self._ensure_panel)
 
         # Status Bar
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("Disconnected")
 
-        # Connect Manager Signals to UI Slots
-        self.manager.on_message_received_cb = self.chat_panel.on_new_message
-        self.manager.on_node_updated_cb = self.on_node_updated
-        self.manager.on_node_updated_cb = self.update_ui_on_node_change
+        # Connect Manager events to UI Slots (delivered in batches, once per frame)
+        dispatcher = self.manager.dispatcher
+        dispatcher.subscribe(MESSAGE, self.on_messages_received)
+        dispatcher.subscribe(NODE, self.on_nodes_updated)
+        dispatcher.subscribe(TELEMETRY, self.on_telemetry_received)
+        dispatcher.subscribe(STATUS, self.on_message_status)
+        dispatcher.subscribe(RADIO, self.conn_panel.update_radios)
+        dispatcher.subscribe(RADIO, self.on_radios_updated)
+        dispatcher.subscribe(DEVICE, self.conn_panel.update_devices)
 
         # Connect ConnectionPanel signals to update the Status Bar
         self.conn_panel.signals.connecting.connect(self.on_connecting)
         self.conn_panel.signals.connected.connect(self.on_device_connected)
         self.conn_panel.signals.disconnected.connect(self.on_device_disconnected)
 
-        # Initial load from Database
-        QTimer.singleShot(500, self.nodes_panel.refresh_list)
-        QTimer.singleShot(1000, self.refresh_map)
-        
-        # Telemetry
-        self.manager.on_telemetry_received_cb = self.telemetry_panel.handle_real_telemetry
-
-        # Pre-populate map and list with nodes already in the database
-        if self.manager.nodes:
-            # Update the list panel immediately (standard widgets are fast)
+        # Load the NodeDB cache off the UI thread
+        self.loop.create_task(self.preload_nodes())
+
+        # Event-loop lag for the Diagnostics tab
+        self.loop.create_task(monitor_loop_lag())
+
+        self.recorder = None
+        if record_path:
+            from meshtastic_mac_client.core.simulator import PacketRecorder
+            self.recorder = PacketRecorder(record_path)
+            self.recorder.start()
+
+        if radio:
+            kind, address, label, options = radio
+            self.loop.create_task(self.conn_panel.connect_to(address, label, kind=kind, **options))
+
+    def _ensure_panel(self, index):
+        """Import and build the panel behind a tab the first time it is selected."""
+        if index < 1:
+            return
+        attr, label, module_name, class_name = LAZY_PANELS[index - 1]
+        if getattr(self, attr) is not None:
+            return
+
+        with profiler.phase(f"panel: {label}"):
+            module = importlib.import_module(module_name)
+            panel = getattr(module, class_name)(self)
+        setattr(self, attr, panel)
+
+        # Swap the placeholder for the real panel without firing currentChanged again
+        self.tabs.blockSignals(True)
+        placeholder = self.tabs.widget(index)
+        self.tabs.removeTab(index)
+        self.tabs.insertTab(index, panel, label)
+        self.tabs.setCurrentIndex(index)
+        self.tabs.blockSignals(False)
+        placeholder.deleteLater()
+
+        if attr == 'nodes_panel':
+            # Pre-populate the list with nodes already in the database; after this
+            # the list only receives upserts.
+            panel.refresh_list()
+        elif attr == 'map_panel':
+            self.refresh_map()
+
+    async def preload_nodes(self):
+        with profiler.phase("nodedb preload"):
+            await self.manager.preload_nodes()
+        if self.map_panel:
+            self.refresh_map()
+
+    def on_messages_received(self, messages):
+        if self.chat_panel:
+            self.chat_panel.on_new_messages(messages)
+
+    def on_message_status(self, updates):
+        if self.chat_panel:
+            self.chat_panel.on_status_updates(updates)
+
+    def on_telemetry_received(self, samples):
+        if self.telemetry_panel:
+            self.telemetry_panel.handle_telemetry_batch(samples)
+
+    def on_rows_pruned(self, removed):
+        """Maintenance thread: retention deleted rows the live update path never sees."""
+        if 'nodes' in removed:
+            self.loop.call_soon_threadsafe(self.resync_node_list)
+
+    def database_idle(self):
+        """Maintenance thread: True while no radio is connected or trying to be, so little is written."""
+        manager = getattr(self, 'manager', None)
+        return manager is not None and all(r.state == DISCONNECTED for r in list(manager.radios.values()))
+
+    def on_radios_updated(self, radios):
+        # A reconnect replays the NodeDB in a burst the dispatcher may have shed; catch up once
+        if any(info['state'] == CONNECTED and info['reconnects'] for info in radios):
+            self.resync_node_list()
+
+    def resync_node_list(self):
+        if self.nodes_panel:
             self.nodes_panel.refresh_list()
-            
-            # Defer the map update by 1 second to ensure the WebEngine is ready
-            # We pull the values inside the lambda to ensure we have the latest data
-            QTimer.singleShot(1000, lambda: self.map_panel.update_map(list(self.manager.nodes.values())))
 
-        # Connect the manager's update callback so new updates also refresh the map
-        self.manager.on_node_updated_cb = self.on_node_updated
+    def on_nodes_updated(self, nodes):
+        """Called once per frame with every node updated since the last frame."""
+        # Update the List (changed rows only)
+        if self.nodes_panel:
+            self.nodes_panel.upsert_nodes(nodes)
 
-    def on_node_updated(self, node):
-        """Called when a node's info is updated."""
-        # Refresh data from manager
-        all_nodes = list(self.manager.nodes.values())
-
-        # Update the Map
-        if hasattr(self, 'map_panel'):
-            self.map_panel.update_map(all_nodes)
-
-        # Update the List
-        if hasattr(self, 'node_list_panel'):
-            self.nodes_panel.refresh_list()
+        # Update the Map (marker deltas only)
+        if self.map_panel:
+            for node in nodes:
+                self.map_panel.upsert_node(node)
 
     def refresh_map(self):
-        """Fetch all nodes from DB and refresh the map markers."""
-        all_nodes = self.db.get_nodes()
-        self.map_panel.update_map(all_nodes)
+        """Send the map every node record changed since the last refresh (all of them the first time)."""
+        records, self._map_version = self.manager.nodes.changes_since(self._map_version)
+        for record in records:
+            self.map_panel.upsert_node(record)
 
     def on_connecting(self, name):
         self.status_bar.showMessage(f"Connecting to {name}...")
         logger.info(f"UI initiating connection to: {name}")
 
-    def on_device_connected(self, address):
+    def on_device_connected(self, name):
         # Fetch the radio name from the manager
-        radio_name = self.manager.get_local_node_name()
-        self.status_bar.showMessage(f"Connected: {radio_name}")
+        radios = self.manager.connected_radios()
+        if len(radios) > 1:
+            self.status_bar.showMessage(f"Connected: {len(radios)} radios")
+        else:
+            self.status_bar.showMessage(f"Connected: {self.manager.get_local_node_name(name)}")
 
     def on_device_disconnected(self):
         self.status_bar.showMessage("Disconnected")
@@ -127,14 +219,6 @@ class MainWindow(QMainWindow):
     def update_status(self, message):
         self.status_bar.showMessage(message)
 
-    def update_ui_on_node_change(self):
-        """Refreshes UI components when node data changes."""
-        nodes = self.manager.nodes.values()
-        # Update the Node List
-        self.node_list_panel.update_nodes(nodes)
-        # Update the Map
-        self.map_panel.update_map(nodes)
-
     def closeEvent(self, event):
         """Handle graceful shutdown when the user clicks 'X'."""
         # Hide the window immediately so the user sees the app 'closing'
@@ -150,30 +234,48 @@ class MainWindow(QMainWindow):
     async def handle_exit(self, event):
         """Cleanup resources and stop the loop."""
         logger.info("Starting graceful shutdown...")
-        
-        # Start a background "Reaper" thread. If the app is still
-        # running in 3 seconds, it will kill the process regardless of hangs.
+
+        # Let a running maintenance chunk finish while the radios disconnect
+        self.maintenance.stop(timeout=0)
+
+        # Start a background "Reaper" thread. If the app is still running after
+        # every step below has used up its timeout, it kills the process
+        # regardless of hangs. The deadline allows for a full write queue.
+        deadline = (DISCONNECT_TIMEOUT + MAINTENANCE_STOP_TIMEOUT
+                    + self.db.shutdown_timeout(self.db.max_queue) + 1.0)
         def reaper():
-            time.sleep(3)
+            time.sleep(deadline)
             logger.info("Failsafe: Force-terminating process.")
             os._exit(0)
         
         threading.Thread(target=reaper, daemon=True).start()
 
         try:
-            if self.manager and self.manager.is_connected:
+            if self.manager and self.manager.radios:
                 logger.info("Requesting manager disconnect...")
-                # Try to be polite for 2 seconds
-                await asyncio.wait_for(self.manager.disconnect(), timeout=2.0)
+                # Try to be polite for a couple of seconds
+                await asyncio.wait_for(self.manager.disconnect(), timeout=DISCONNECT_TIMEOUT)
         except Exception as e:
             logger.warning(f"Shutdown cleanup encountered an issue: {e}")
         finally:
+            if self.recorder:
+                self.recorder.stop()
+
+            # Both block, so they run off the loop
+            await self.loop.run_in_executor(None, self.maintenance.stop, MAINTENANCE_STOP_TIMEOUT)
+
+            # Commit anything still sitting in the database write queue
+            logger.info("Flushing pending database writes...")
+            closed = await self.loop.run_in_executor(None, self.db.close)
+
             logger.info("Closing event loop and quitting.")
             self.loop.stop()
             QApplication.instance().quit()
-            
-            # If everything closed cleanly, exit immediately
-            os._exit(0)
+
+            # If everything closed cleanly, exit immediately; otherwise the
+            # writer is still committing and the reaper ends the process
+            if closed:
+                os._exit(0)
 
 if __name__ == "__main__":
 
@@ -0,0 +1,235 @@
+# map_page.py
+# The Leaflet page is loaded into the QWebEngineView exactly once. After that the
+# Python side only pushes marker deltas through runJavaScript (see MapPanel);
+# markers are already clustered and culled to the view (see GridClusterer).
+# History layers (tracks, signal heatmap) receive data already downsampled in
+# Python and are drawn on a canvas renderer.
+# The tile source and Leaflet location are filled in by map_html(), so the same
+# page works online (OpenStreetMap, unpkg) and offline (see tile_scheme.py).
+
+ONLINE_TILE_URL = "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
+ONLINE_LEAFLET_URL = "https://unpkg.com/leaflet@1.9.4/dist/"
+MAX_ZOOM = 19
+
+MAP_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<link rel="stylesheet" href="__LEAFLET__leaflet.css">
+<script src="__LEAFLET__leaflet.js"></script>
+<style>
+  html, body, #map { height: 100%; margin: 0; padding: 0; }
+  .cluster div { width: 36px; height: 36px; border-radius: 18px; text-align: center;
+                 font: bold 12px/36px sans-serif; color: white; }
+  .cluster-small div { background: rgba(49, 163, 84, 0.85); }
+  .cluster-medium div { background: rgba(230, 145, 30, 0.85); }
+  .cluster-large div { background: rgba(215, 48, 39, 0.85); }
+</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+  // Default to Longmont, CO
+  var map = L.map('map').setView([40.1672, -105.1019], 12);
+  // Past maxNativeZoom the deepest available tiles are scaled up
+  L.tileLayer('__TILE_URL__', {
+    maxZoom: __MAX_ZOOM__,
+    minNativeZoom: __MIN_NATIVE_ZOOM__,
+    maxNativeZoom: __MAX_NATIVE_ZOOM__,
+    attribution: '&copy; OpenStreetMap contributors'
+  }).addTo(map);
+
+  var markers = {};         // item id -> L.marker (a node or a cluster)
+  var queued = [];          // deltas waiting for the next animation frame
+  var frameRequested = false;
+  var userMoved = false;    // stop auto-fitting once the user pans or zooms
+
+  map.getContainer().addEventListener('mousedown', function () { userMoved = true; });
+  map.getContainer().addEventListener('wheel', function () { userMoved = true; });
+
+  function escapeHtml(text) {
+    var div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+  }
+
+  function clusterIcon(count) {
+    var size = count < 10 ? 'small' : (count < 100 ? 'medium' : 'large');
+    return L.divIcon({html: '<div>' + count + '</div>', className: 'cluster cluster-' + size,
+                      iconSize: [36, 36]});
+  }
+
+  function zoomToCluster(e) {
+    userMoved = true;
+    var b = e.target.clusterBounds;
+    map.fitBounds([[b[0], b[1]], [b[2], b[3]]]);
+  }
+
+  function applyOne(delta) {
+    for (var i = 0; i < delta.remove.length; i++) {
+      var id = delta.remove[i];
+      if (markers[id]) { map.removeLayer(markers[id]); delete markers[id]; }
+    }
+    for (var j = 0; j < delta.upsert.length; j++) {
+      var m = delta.upsert[j];
+      var marker = markers[m.id];
+      if (m.count) {
+        if (marker) {
+          marker.setLatLng([m.lat, m.lon]);
+          marker.setIcon(clusterIcon(m.count));
+        } else {
+          marker = markers[m.id] = L.marker([m.lat, m.lon], {icon: clusterIcon(m.count)})
+            .on('click', zoomToCluster)
+            .addTo(map);
+        }
+        marker.clusterBounds = m.bounds;
+        continue;
+      }
+      var name = escapeHtml(m.name);
+      if (marker) {
+        marker.setLatLng([m.lat, m.lon]);
+        marker.setTooltipContent(name);
+        marker.setPopupContent('Node: ' + name);
+      } else {
+        markers[m.id] = L.marker([m.lat, m.lon])
+          .bindTooltip(name)
+          .bindPopup('Node: ' + name)
+          .addTo(map);
+      }
+    }
+  }
+
+  function flushQueued() {
+    frameRequested = false;
+    var batch = queued;
+    queued = [];
+    for (var i = 0; i < batch.length; i++) { applyOne(batch[i]); }
+  }
+
+  // Entry point used by MapPanel: {upsert: [{id, lat, lon, name} or
+  // {id, lat, lon, count, bounds}], remove: [id]}. Only items in view are sent.
+  function applyDeltas(delta) {
+    queued.push(delta);
+    if (!frameRequested) {
+      frameRequested = true;
+      window.requestAnimationFrame(flushQueued);
+    }
+  }
+
+  // Bounds of every node ([south, west, north, east]), until the user takes over
+  function fitNodes(b) {
+    if (userMoved) { return; }
+    if (b[0] === b[2] && b[1] === b[3]) {
+      map.setView([b[0], b[1]], map.getZoom());
+    } else {
+      map.fitBounds([[b[0], b[1]], [b[2], b[3]]], { padding: [30, 30], maxZoom: 14 });
+    }
+  }
+
+  // Current zoom and visible bounds; polled by MapPanel to cull markers and
+  // reload history layers
+  function viewState() {
+    var b = map.getBounds();
+    return JSON.stringify({zoom: map.getZoom(), south: b.getSouth(), west: b.getWest(),
+                           north: b.getNorth(), east: b.getEast(), userMoved: userMoved});
+  }
+
+  // --- Track playback ---
+
+  var canvas = L.canvas({padding: 0.5});
+  var trackLayer = L.layerGroup().addTo(map);
+  var tracks = {};          // node id -> {points: [[t, lat, lon]], line, head, shown}
+
+  function trackColor(id) {
+    var hash = 0;
+    for (var i = 0; i < id.length; i++) { hash = (hash * 31 + id.charCodeAt(i)) | 0; }
+    return 'hsl(' + (Math.abs(hash) % 360) + ', 80%, 40%)';
+  }
+
+  // Index of the last point with time <= t, or -1
+  function lastIndexAt(points, t) {
+    var lo = 0, hi = points.length - 1, found = -1;
+    while (lo <= hi) {
+      var mid = (lo + hi) >> 1;
+      if (points[mid][0] <= t) { found = mid; lo = mid + 1; } else { hi = mid - 1; }
+    }
+    return found;
+  }
+
+  function clearTracks() {
+    trackLayer.clearLayers();
+    tracks = {};
+  }
+
+  // {tracks: {id: [[t, lat, lon], ...]}, names: {id: name}, time: t}
+  function setTracks(data) {
+    clearTracks();
+    Object.keys(data.tracks).forEach(function (id) {
+      var color = trackColor(id);
+      var name = escapeHtml(data.names[id] || id);
+      tracks[id] = {
+        points: data.tracks[id],
+        line: L.polyline([], {renderer: canvas, color: color, weight: 2, opacity: 0.8}).addTo(trackLayer),
+        head: L.circleMarker([0, 0], {renderer: canvas, radius: 5, color: color, fillOpacity: 0.9})
+                .bindTooltip(name),
+        shown: -2
+      };
+    });
+    setPlaybackTime(data.time);
+  }
+
+  // Draw every track up to time t; only tracks whose visible length changed are touched
+  function setPlaybackTime(t) {
+    Object.keys(tracks).forEach(function (id) {
+      var tr = tracks[id];
+      var last = lastIndexAt(tr.points, t);
+      if (last === tr.shown) { return; }
+      tr.shown = last;
+      var latlngs = tr.points.slice(0, last + 1).map(function (p) { return [p[1], p[2]]; });
+      tr.line.setLatLngs(latlngs);
+      if (last >= 0) {
+        tr.head.setLatLng(latlngs[last]);
+        if (!trackLayer.hasLayer(tr.head)) { tr.head.addTo(trackLayer); }
+      } else if (trackLayer.hasLayer(tr.head)) {
+        trackLayer.removeLayer(tr.head);
+      }
+    });
+  }
+
+  // --- Signal heatmap ---
+
+  var heatLayer = L.layerGroup().addTo(map);
+
+  // Red (weak) through yellow to green (strong)
+  function signalColor(value, min, max) {
+    var f = Math.max(0, Math.min(1, (value - min) / (max - min)));
+    return 'hsl(' + Math.round(f * 120) + ', 90%, 45%)';
+  }
+
+  function clearHeatmap() { heatLayer.clearLayers(); }
+
+  // {cell: degrees, cells: [[south, west, mean, count]], min, max, unit}
+  function setHeatmap(data) {
+    clearHeatmap();
+    for (var i = 0; i < data.cells.length; i++) {
+      var c = data.cells[i];
+      L.rectangle([[c[0], c[1]], [c[0] + data.cell, c[1] + data.cell]], {
+        renderer: canvas, stroke: false, fillOpacity: 0.55,
+        fillColor: signalColor(c[2], data.min, data.max)
+      }).bindTooltip(c[2].toFixed(1) + ' ' + data.unit + ' (' + c[3] + ' reports)').addTo(heatLayer);
+    }
+  }
+</script>
+</body>
+</html>
+"""
+
+def map_html(tile_url=ONLINE_TILE_URL, leaflet_url=ONLINE_LEAFLET_URL, zoom_range=(0, MAX_ZOOM)):
+    """The map page for a tile URL template and the directory Leaflet is loaded from."""
+    return (MAP_TEMPLATE
+            .replace("__TILE_URL__", tile_url)
+            .replace("__LEAFLET__", leaflet_url)
+            .replace("__MAX_ZOOM__", str(MAX_ZOOM))
+            .replace("__MIN_NATIVE_ZOOM__", str(zoom_range[0]))
+            .replace("__MAX_NATIVE_ZOOM__", str(zoom_range[1])))
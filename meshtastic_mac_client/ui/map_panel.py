@@ -1,63 +1,326 @@
-import os
-import folium
-from PyQt6.QtCore import QUrl
-from PyQt6.QtWidgets import QWidget, QVBoxLayout
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from PyQt6.QtCore import Qt, QUrl, QTimer
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QPushButton, QSlider, QLabel
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineSettings
+from meshtastic_mac_client.core.metrics import metrics
+from meshtastic_mac_client.core.clustering import GridClusterer, marker_for
+from meshtastic_mac_client.core.geo import simplify_track, cell_size_deg, tile_range, tile_range_bbox
+from meshtastic_mac_client.ui.map_page import map_html, ONLINE_LEAFLET_URL
+from meshtastic_mac_client.ui import tile_scheme
+
+logger = logging.getLogger(__name__)
+
+# Roughly one animation frame; updates arriving inside this window are sent together
+FLUSH_INTERVAL_MS = 16
+
+# Map layers offered below the map
+LIVE, TRACKS, HEATMAP = "live", "tracks", "heatmap"
+LAYERS = [("Live positions", LIVE), ("Track playback", TRACKS), ("Signal heatmap (SNR)", HEATMAP)]
+
+HISTORY_RANGES = [
+    ("Last hour", 3600),
+    ("Last 24 hours", 86400),
+    ("Last 7 days", 7 * 86400),
+    ("Last 30 days", 30 * 86400),
+]
+
+# Last-heard filter for node markers (seconds, None = any time)
+AGE_FILTERS = [
+    ("Heard: any time", None),
+    ("Heard: last hour", 3600),
+    ("Heard: last 24 hours", 86400),
+    ("Heard: last 7 days", 7 * 86400),
+]
+# How often the age filter's cutoff moves forward
+AGE_REFRESH_MS = 30000
+
+# How often the page's zoom/bounds are checked (marker culling, history layers)
+VIEW_POLL_MS = 500
+# Playback: slider resolution and the time a full run takes
+PLAYBACK_STEPS = 1000
+PLAYBACK_TICK_MS = 40
+# SNR colour scale of the heatmap (dB)
+HEATMAP_RANGE = (-20.0, 10.0)
+
 
 class MapPanel(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.main = parent
         self.layout = QVBoxLayout(self)
         self.web_view = QWebEngineView()
-        
+
         # Security: Allow the local HTML to fetch Leaflet/OpenStreetMap CSS and JS
         settings = self.web_view.settings()
         settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
         settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, True)
-        
+
         self.layout.addWidget(self.web_view)
+        self._tile_handler = None
+        page_html = self._page_html()
+
+        # Every known node position; the clusterer decides what the page gets
+        self.clusterer = GridClusterer()
+        self._bounds = None   # Last node bounds sent for auto-fit
+        self._user_moved = False
+        self._page_ready = False
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self._flush)
+
+        # History layers: reloaded when the visible tiles or zoom change
+        self._loaded_tiles = None
+        self._request = 0     # Increments per history load; stale results are dropped
+        self._view_timer = QTimer(self)
+        self._view_timer.setInterval(VIEW_POLL_MS)
+        self._view_timer.timeout.connect(self._poll_view)
+        self._play_timer = QTimer(self)
+        self._play_timer.setInterval(PLAYBACK_TICK_MS)
+        self._play_timer.timeout.connect(self._playback_tick)
+        self._age_timer = QTimer(self)
+        self._age_timer.setInterval(AGE_REFRESH_MS)
+        self._age_timer.timeout.connect(self._apply_age_filter)
+        self._build_history_controls()
+
+        # Load the page once; everything after this is a delta
+        self.web_view.loadFinished.connect(self._on_load_finished)
+        self.web_view.setHtml(page_html, QUrl("http://localhost"))
+
+    def _page_html(self):
+        """Offline tiles (and Leaflet, if downloaded) when a tile file is registered."""
+        path = tile_scheme.offline_tiles_path()
+        if path is None:
+            return map_html()
+        try:
+            self._tile_handler = tile_scheme.TileSchemeHandler(path, self)
+            self.web_view.page().profile().installUrlSchemeHandler(tile_scheme.SCHEME, self._tile_handler)
+        except Exception as e:
+            logger.error(f"Could not open offline tiles {path}: {e}")
+            self._tile_handler = None
+            return map_html()
+        leaflet_url = tile_scheme.LEAFLET_URL if tile_scheme.has_local_leaflet() else ONLINE_LEAFLET_URL
+        return map_html(tile_scheme.TILE_URL, leaflet_url, self._tile_handler.store.zoom_range())
+
+    def _build_history_controls(self):
+        row = QHBoxLayout()
+        self.combo_layer = QComboBox()
+        for label, layer in LAYERS:
+            self.combo_layer.addItem(label, layer)
+        self.combo_layer.currentIndexChanged.connect(self._on_layer_changed)
+        row.addWidget(self.combo_layer)
+
+        self.combo_age = QComboBox()
+        for label, seconds in AGE_FILTERS:
+            self.combo_age.addItem(label, seconds)
+        self.combo_age.currentIndexChanged.connect(self._apply_age_filter)
+        row.addWidget(self.combo_age)
+
+        self.combo_range = QComboBox()
+        for label, seconds in HISTORY_RANGES:
+            self.combo_range.addItem(label, seconds)
+        self.combo_range.setCurrentIndex(1)
+        self.combo_range.currentIndexChanged.connect(self._reload_history)
+        row.addWidget(self.combo_range)
+
+        self.btn_play = QPushButton("Play")
+        self.btn_play.clicked.connect(self._toggle_playback)
+        row.addWidget(self.btn_play)
+
+        self.slider_time = QSlider(Qt.Orientation.Horizontal)
+        self.slider_time.setRange(0, PLAYBACK_STEPS)
+        self.slider_time.setValue(PLAYBACK_STEPS)
+        self.slider_time.valueChanged.connect(self._on_slider)
+        row.addWidget(self.slider_time, 1)
+
+        self.lbl_time = QLabel("")
+        row.addWidget(self.lbl_time)
+        self.layout.addLayout(row)
+        self._on_layer_changed()
+
+    def _on_load_finished(self, ok):
+        self._page_ready = ok
+        if ok:
+            self._view_timer.start()
+            self._poll_view()
+
+    def _schedule(self):
+        if self._page_ready and not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def upsert_node(self, node):
+        """Queue a single node's marker add/move."""
+        marker = marker_for(node)
+        if marker is not None:
+            self._queue(marker)
+
+    def _queue(self, marker):
+        if self.clusterer.markers.get(marker['id']) == marker:
+            return # Nothing moved, renamed or was heard again
+        self.clusterer.update(marker)
+        self._schedule()
 
     def update_map(self, nodes):
-        # Default to Longmont, CO
-        center_lat, center_lon = 40.1672, -105.1019
-        
-        valid_nodes = []
-        for n in nodes:
-            # Handle both dictionary objects and database row objects
-            lat = getattr(n, 'position_lat', None) or (n.get('position_lat') if isinstance(n, dict) else None)
-            lon = getattr(n, 'position_lon', None) or (n.get('position_lon') if isinstance(n, dict) else None)
-            
-            if lat and lon:
-                valid_nodes.append(n)
-
-        if valid_nodes:
-            # Center on the first valid node
-            first = valid_nodes[0]
-            center_lat = getattr(first, 'position_lat', None) or first.get('position_lat')
-            center_lon = getattr(first, 'position_lon', None) or first.get('position_lon')
-
-        m = folium.Map(
-            location=[center_lat, center_lon],
-            zoom_start=12,
-            tiles="OpenStreetMap"
-        )
-        
-        for node in valid_nodes:
-            # Extract name safely
-            if isinstance(node, dict):
-                name = node.get('user', {}).get('longName') or node.get('id', "Unknown")
-                lat, lon = node['position_lat'], node['position_lon']
-            else:
-                name = getattr(node, 'long_name', "Unknown")
-                lat, lon = node.position_lat, node.position_lon
-
-            folium.Marker(
-                [lat, lon],
-                popup=f"Node: {name}",
-                tooltip=name
-            ).add_to(m)
-
-        # Use setHtml with a baseUrl to avoid file permission/path issues
-        data = m.get_root().render()
-        self.web_view.setHtml(data, QUrl("http://localhost"))
\ No newline at end of file
+        """Sync with a full node list; the page only receives what changed in view."""
+        seen = set()
+        for node in nodes:
+            marker = marker_for(node)
+            if marker:
+                seen.add(marker['id'])
+                self._queue(marker)
+
+        for node_id in [i for i in self.clusterer.markers if i not in seen]:
+            self.clusterer.remove(node_id)
+        self._schedule()
+
+    def _apply_age_filter(self, index=None):
+        age = self.combo_age.currentData()
+        self.clusterer.set_min_last_heard(None if age is None else time.time() - age)
+        if age is None:
+            self._age_timer.stop()
+        elif not self._age_timer.isActive():
+            self._age_timer.start()
+        self._schedule()
+
+    @metrics.timed("ui.map.flush")
+    def _flush(self):
+        if not self._page_ready:
+            return
+
+        upserts, removals = self.clusterer.delta()
+        if upserts or removals:
+            delta = json.dumps({'upsert': upserts, 'remove': removals})
+            self.web_view.page().runJavaScript(f"applyDeltas({delta});")
+
+        # Keep every node in frame until the user pans or zooms
+        if not self._user_moved:
+            bounds = self.clusterer.bounds()
+            if bounds and bounds != self._bounds:
+                self._bounds = bounds
+                self.web_view.page().runJavaScript(f"fitNodes({json.dumps(bounds)});")
+
+    # --- History layers ---
+
+    def _layer(self):
+        return self.combo_layer.currentData()
+
+    def _on_layer_changed(self, index=None):
+        layer = self._layer()
+        is_tracks = layer == TRACKS
+        for widget in (self.btn_play, self.slider_time, self.lbl_time):
+            widget.setVisible(is_tracks)
+        self.combo_range.setVisible(layer != LIVE)
+        self._stop_playback()
+
+        if self._page_ready:
+            self.web_view.page().runJavaScript("clearTracks(); clearHeatmap();")
+        self._loaded_tiles = None
+        self._poll_view()
+
+    def _reload_history(self, index=None):
+        self._loaded_tiles = None
+        self._poll_view()
+
+    def _time_window(self):
+        end = time.time()
+        return end - self.combo_range.currentData(), end
+
+    def _poll_view(self):
+        if self._page_ready:
+            self.web_view.page().runJavaScript("viewState()", self._on_view_state)
+
+    def _on_view_state(self, state):
+        if not state:
+            return
+        view = json.loads(state)
+        self._user_moved = view.get('userMoved', False)
+        tiles = tile_range((view['south'], view['west'], view['north'], view['east']), int(view['zoom']))
+
+        # Markers cover the same tiles (view plus a margin), so small pans send nothing
+        if self.clusterer.set_view(tiles[0], tile_range_bbox(tiles)):
+            self._schedule()
+
+        if self._layer() == LIVE or tiles == self._loaded_tiles:
+            return # Same zoom and still inside the loaded tiles
+        self._loaded_tiles = tiles
+        self._request += 1
+        asyncio.create_task(self._load_history(self._request, self._layer(), tiles))
+
+    async def _load_history(self, request, layer, tiles):
+        """Query and downsample off the UI thread, then hand the result to the page."""
+        db = getattr(self.main, 'db', None)
+        if db is None:
+            return
+        start, end = self._time_window()
+        build = self.tracks_payload if layer == TRACKS else self.heatmap_payload
+        payload = await asyncio.get_running_loop().run_in_executor(None, build, db, tiles, start, end)
+        if request != self._request or layer != self._layer():
+            return # The view or layer changed while we were working
+
+        if layer == TRACKS:
+            payload['names'] = {node_id: self.clusterer.markers.get(node_id, {}).get('name', node_id)
+                                for node_id in payload['tracks']}
+            payload['time'] = self._slider_time()
+            self.web_view.page().runJavaScript(f"setTracks({json.dumps(payload)});")
+        else:
+            self.web_view.page().runJavaScript(f"setHeatmap({json.dumps(payload)});")
+
+    @staticmethod
+    @metrics.timed("map.tracks_payload")
+    def tracks_payload(db, tiles, start, end):
+        """Tracks inside the tiles, simplified (radial + Douglas-Peucker) for the tiles' zoom."""
+        zoom = tiles[0]
+        tracks = {}
+        for node_id, points in db.get_tracks(start, end, tile_range_bbox(tiles)).items():
+            tracks[node_id] = [[round(t, 1), lat, lon] for t, lat, lon in simplify_track(points, zoom)]
+        return {'tracks': tracks}
+
+    @staticmethod
+    @metrics.timed("map.heatmap_payload")
+    def heatmap_payload(db, tiles, start, end):
+        """Mean SNR per grid cell, with cells sized for the tiles' zoom (aggregated in SQLite)."""
+        cell = cell_size_deg(tiles[0])
+        cells = db.get_signal_grid(start, end, cell, tile_range_bbox(tiles), metric='snr')
+        return {
+            'cell': cell,
+            'cells': [[lat, lon, round(mean, 1), count] for lat, lon, mean, count in cells],
+            'min': HEATMAP_RANGE[0], 'max': HEATMAP_RANGE[1], 'unit': "dB",
+        }
+
+    # --- Playback ---
+
+    def _slider_time(self):
+        start, end = self._time_window()
+        return start + (end - start) * self.slider_time.value() / PLAYBACK_STEPS
+
+    def _on_slider(self, value):
+        t = self._slider_time()
+        self.lbl_time.setText(datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M"))
+        if self._page_ready and self._layer() == TRACKS:
+            # Only the cursor moves; the track data is already on the page
+            self.web_view.page().runJavaScript(f"setPlaybackTime({t});")
+
+    def _toggle_playback(self):
+        if self._play_timer.isActive():
+            self._stop_playback()
+            return
+        if self.slider_time.value() >= PLAYBACK_STEPS:
+            self.slider_time.setValue(0)
+        self._play_timer.start()
+        self.btn_play.setText("Pause")
+
+    def _stop_playback(self):
+        self._play_timer.stop()
+        self.btn_play.setText("Play")
+
+    def _playback_tick(self):
+        value = self.slider_time.value() + 1
+        self.slider_time.setValue(value)
+        if value >= PLAYBACK_STEPS:
+            self._stop_playback()
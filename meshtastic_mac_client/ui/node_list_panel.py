@@ -1,4 +1,7 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTableView, QHeaderView, QLineEdit
+from PyQt6.QtCore import Qt, QSortFilterProxyModel
+from meshtastic_mac_client.core.metrics import metrics
+from meshtastic_mac_client.ui.node_table_model import NodeTableModel, SORT_ROLE, node_to_row
 
 class NodeListPanel(QWidget):
     def __init__(self, parent=None):
@@ -7,38 +10,57 @@ class NodeListPanel(QWidget):
         self.main = parent
         self.layout = QVBoxLayout(self)
 
-        self.table = QTableWidget()
-        # Increased to 8 columns
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels([
-            "ID", "Long Name", "Short Name", "SNR", "Battery", "Last Heard", "Lat", "Lon"
-        ])
+        # Filter box (matches any column)
+        self.txt_filter = QLineEdit()
+        self.txt_filter.setPlaceholderText("Filter nodes...")
+        self.layout.addWidget(self.txt_filter)
+
+        # Model keyed by node ID; sorting and filtering happen in the proxy
+        self.model = NodeTableModel(self)
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setSortRole(SORT_ROLE)
+        self.proxy.setFilterKeyColumn(-1)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.proxy.setDynamicSortFilter(True)
+        self.txt_filter.textChanged.connect(self.proxy.setFilterFixedString)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(5, Qt.SortOrder.DescendingOrder)  # Last Heard
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.layout.addWidget(self.table)
 
+        # Database change sequence the table is up to date with. Live updates
+        # arrive through upsert_nodes(); refresh_list() only runs when rows may
+        # have changed outside that path (first show, retention, a reconnect).
+        self._seq = 0
+
     def on_node_update(self, node):
-        self.refresh_list()
+        self.upsert_node(node)
+
+    def upsert_node(self, node):
+        """Apply a single live node update without touching the other rows."""
+        self.model.upsert(node_to_row(node))
+
+    @metrics.timed("ui.nodes.upsert")
+    def upsert_nodes(self, nodes):
+        """Apply a batch of live node updates."""
+        self.model.upsert_many([node_to_row(n) for n in nodes])
 
+    @metrics.timed("ui.nodes.refresh")
     def refresh_list(self):
-        nodes = self.main.db.get_nodes()
-        self.table.setRowCount(len(nodes))
-        
-        for row, node_data in enumerate(nodes):
-            # Map the SQLite row fields to the table columns
-            self.table.setItem(row, 0, QTableWidgetItem(str(node_data['id'])))
-            self.table.setItem(row, 1, QTableWidgetItem(node_data['long_name'] or "Unknown"))
-            self.table.setItem(row, 2, QTableWidgetItem(node_data['short_name'] or "N/A"))
-            self.table.setItem(row, 3, QTableWidgetItem(f"{node_data['snr']:.2f}" if node_data['snr'] else "0.00"))
-            
-            # Battery formatting
-            batt = node_data['battery']
-            self.table.setItem(row, 4, QTableWidgetItem(f"{batt}%" if batt else "N/A"))
-            
-            # Last Heard
-            self.table.setItem(row, 5, QTableWidgetItem(str(node_data['last_heard'])))
-            
-            # GPS Coordinates
-            lat = node_data['position_lat']
-            lon = node_data['position_lon']
-            self.table.setItem(row, 6, QTableWidgetItem(f"{lat:.4f}" if lat else "N/A"))
-            self.table.setItem(row, 7, QTableWidgetItem(f"{lon:.4f}" if lon else "N/A"))
\ No newline at end of file
+        """Load every node the first time, then only rows changed since the last call."""
+        first = self._seq == 0
+        while True:
+            changes = self.main.db.get_changes_since(self._seq, tables=['nodes'])
+            rows = [dict(r) for r in changes['nodes']]
+            if first and self.model.rowCount() == 0:
+                self.model.set_rows(rows)
+            else:
+                self.model.upsert_many(rows)
+            self.model.remove_ids(changes['deleted']['nodes'])
+            self._seq = changes['seq']
+            if not changes['more']:
+                break
@@ -0,0 +1,134 @@
+from datetime import datetime
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+from meshtastic_mac_client.core.node_registry import NodeRecord
+
+COLUMNS = ["ID", "Long Name", "Short Name", "SNR", "Battery", "Last Heard", "Lat", "Lon"]
+FIELDS = ['id', 'long_name', 'short_name', 'snr', 'battery', 'last_heard', 'position_lat', 'position_lon']
+NUMERIC_FIELDS = {'snr', 'battery', 'position_lat', 'position_lon'}
+
+# Raw (unformatted) value used by the proxy model for sorting
+SORT_ROLE = Qt.ItemDataRole.UserRole
+
+
+def node_to_row(node):
+    """Convert a NodeRecord or a library node dict into the same shape as a `nodes` table row."""
+    if isinstance(node, NodeRecord):
+        return node.to_row()
+    user = node.get('user', {})
+    pos = node.get('position', {})
+    metrics = node.get('deviceMetrics') or node.get('device_metrics') or {}
+    # Match the ISO strings stored in the database so the column sorts consistently
+    last_heard = node.get('lastHeard')
+    last_heard = datetime.fromtimestamp(last_heard) if last_heard else datetime.now()
+    return {
+        'id': user.get('id'),
+        'long_name': user.get('longName'),
+        'short_name': user.get('shortName'),
+        'snr': node.get('snr'),
+        'battery': metrics.get('batteryLevel', metrics.get('battery_level')),
+        'last_heard': last_heard.isoformat(),
+        'position_lat': pos.get('latitude', node.get('position_lat')),
+        'position_lon': pos.get('longitude', node.get('position_lon')),
+    }
+
+
+class NodeTableModel(QAbstractTableModel):
+    """Node table keyed by node ID so a single update touches a single row."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []      # List of row dicts, in insertion order
+        self._index = {}     # node id -> row number
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section]
+        return QVariant()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        row = self._rows[index.row()]
+        field = FIELDS[index.column()]
+        value = row.get(field)
+
+        if role == SORT_ROLE:
+            # Keep missing values comparable with the rest of the column
+            if value is None:
+                return float('-inf') if field in NUMERIC_FIELDS else ""
+            return value
+        if role != Qt.ItemDataRole.DisplayRole:
+            return QVariant()
+
+        if field == 'id':
+            return str(value)
+        if field == 'long_name':
+            return value or "Unknown"
+        if field == 'short_name':
+            return value or "N/A"
+        if field == 'snr':
+            return f"{value:.2f}" if value else "0.00"
+        if field == 'battery':
+            return f"{value}%" if value else "N/A"
+        if field in ('position_lat', 'position_lon'):
+            return f"{value:.4f}" if value else "N/A"
+        return str(value)
+
+    def set_rows(self, rows):
+        """Replace the whole table (initial load from the database)."""
+        self.beginResetModel()
+        self._rows = [dict(r) for r in rows if r['id']]
+        self._index = {r['id']: i for i, r in enumerate(self._rows)}
+        self.endResetModel()
+
+    def upsert(self, row):
+        """Insert or update a single node, emitting only row-level change signals."""
+        self.upsert_many([row])
+
+    def upsert_many(self, rows):
+        """Update known nodes in place and append new ones in a single insert."""
+        new_rows = {}
+        for row in rows:
+            node_id = row.get('id')
+            if not node_id:
+                continue
+
+            existing = self._index.get(node_id)
+            if existing is None:
+                new_rows[node_id] = dict(row)
+                continue
+
+            # Only overwrite fields the update actually carries
+            current = self._rows[existing]
+            changed = False
+            for field, value in row.items():
+                if value is not None and current.get(field) != value:
+                    current[field] = value
+                    changed = True
+            if changed:
+                self.dataChanged.emit(self.index(existing, 0), self.index(existing, len(COLUMNS) - 1))
+
+        if new_rows:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_rows) - 1)
+            for node_id, row in new_rows.items():
+                self._index[node_id] = len(self._rows)
+                self._rows.append(row)
+            self.endInsertRows()
+
+    def remove_ids(self, node_ids):
+        """Drop rows for nodes deleted from the database."""
+        rows = sorted((self._index[i] for i in node_ids if i in self._index), reverse=True)
+        if not rows:
+            return
+        for row in rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._rows[row]
+            self.endRemoveRows()
+        self._index = {r['id']: i for i, r in enumerate(self._rows)}
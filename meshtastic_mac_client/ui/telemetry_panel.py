@@ -1,9 +1,24 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel
+import time
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton
 from PyQt6.QtWidgets import QGridLayout
 from PyQt6.QtGui import QFont
 from PyQt6.QtCore import QTimer
 import pyqtgraph as pg
 import numpy as np
+from meshtastic_mac_client.core.metrics import metrics
+from meshtastic_mac_client.core.ring_buffer import TelemetryBuffers
+
+# History ranges offered in the UI, in seconds
+HISTORY_RANGES = [
+    ("Last hour", 3600),
+    ("Last 24 hours", 86400),
+    ("Last 7 days", 7 * 86400),
+    ("Last 30 days", 30 * 86400),
+]
+# Target number of buckets per history query, independent of range
+HISTORY_POINTS = 500
+# Live samples kept in memory per node and metric (buffers grow to this as they fill)
+LIVE_CAPACITY = 20000
 
 class TelemetryPanel(QWidget):
     def __init__(self, parent=None):
@@ -11,47 +26,120 @@ class TelemetryPanel(QWidget):
         self.main = parent
         self.layout = QVBoxLayout(self)
 
-        # Setup Plot
-        self.plot_widget = pg.PlotWidget(title="Battery Voltage & RSSI")
+        # Live node selector
+        live_controls = QHBoxLayout()
+        live_controls.addWidget(QLabel("Live node:"))
+        self.combo_live_node = QComboBox()
+        self.combo_live_node.currentTextChanged.connect(self.redraw_live)
+        live_controls.addWidget(self.combo_live_node)
+        live_controls.addStretch()
+        self.layout.addLayout(live_controls)
+
+        # Setup Plot (x axis is real time)
+        self.plot_widget = pg.PlotWidget(title="Battery Voltage & RSSI", axisItems={'bottom': pg.DateAxisItem()})
         self.plot_widget.showGrid(x=True, y=True)
         self.plot_widget.addLegend()
+        # Only draw what is visible, peak-downsampled to the pixel width
+        self.plot_widget.setDownsampling(auto=True, mode='peak')
+        self.plot_widget.setClipToView(True)
         self.layout.addWidget(self.plot_widget)
-        
-        # Data Buffers (50 points)
-        self.x_data = np.arange(0, 50)
-        self.y_batt = np.zeros(50)
-        self.y_rssi = np.zeros(50)
-        
-        self.curve_batt = self.plot_widget.plot(self.x_data, self.y_batt, pen=pg.mkPen('b', width=2), name="Voltage (V)")
-        self.curve_rssi = self.plot_widget.plot(self.x_data, self.y_rssi, pen=pg.mkPen('r', width=2), name="RSSI (dBm)")
-
-    def handle_real_telemetry(self, voltage, rssi):
-        """Update the charts with real data from the radio."""
-        # Ensure we have valid numbers
-        v = voltage if voltage else 0.0
-        r = rssi if rssi else -100.0
-
-        # Shift data
-        self.y_batt = np.roll(self.y_batt, -1)
-        self.y_rssi = np.roll(self.y_rssi, -1)
-        
-        # Add real data
-        self.y_batt[-1] = v
-        self.y_rssi[-1] = r
-        
-        # Update plot
-        self.curve_batt.setData(self.y_batt)
-        self.curve_rssi.setData(self.y_rssi)
-
-    def update_plots(self):
-        # Shift data
-        self.y_batt = np.roll(self.y_batt, -1)
-        self.y_rssi = np.roll(self.y_rssi, -1)
-        
-        # Add new random data (Simulated for demo)
-        self.y_batt[-1] = np.random.uniform(3.5, 4.2)
-        self.y_rssi[-1] = np.random.uniform(-60, -90)
-        
-        self.curve_batt.setData(self.y_batt)
-        self.curve_rssi.setData(self.y_rssi)
 
+        # Ring buffers, one per (node, metric)
+        self.buffers = TelemetryBuffers(LIVE_CAPACITY)
+
+        self.curve_batt = self.plot_widget.plot(pen=pg.mkPen('b', width=2), name="Voltage (V)")
+        self.curve_rssi = self.plot_widget.plot(pen=pg.mkPen('r', width=2), name="RSSI (dBm)")
+
+        # History controls: aggregated buckets straight from the telemetry table
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Node:"))
+        self.combo_node = QComboBox()
+        controls.addWidget(self.combo_node)
+        controls.addWidget(QLabel("Metric:"))
+        self.combo_metric = QComboBox()
+        self.combo_metric.addItem("Voltage (V)", "voltage")
+        self.combo_metric.addItem("Battery (%)", "battery_level")
+        self.combo_metric.addItem("RSSI (dBm)", "rssi")
+        self.combo_metric.addItem("SNR (dB)", "snr")
+        self.combo_metric.addItem("Channel Util (%)", "channel_utilization")
+        self.combo_metric.addItem("Air Util TX (%)", "air_util_tx")
+        controls.addWidget(self.combo_metric)
+        self.combo_range = QComboBox()
+        for label, seconds in HISTORY_RANGES:
+            self.combo_range.addItem(label, seconds)
+        controls.addWidget(self.combo_range)
+        self.btn_load = QPushButton("Load History")
+        self.btn_load.clicked.connect(self.load_history)
+        controls.addWidget(self.btn_load)
+        self.layout.addLayout(controls)
+
+        # History plot: mean line with a min/max band
+        self.history_widget = pg.PlotWidget(title="History", axisItems={'bottom': pg.DateAxisItem()})
+        self.history_widget.showGrid(x=True, y=True)
+        self.layout.addWidget(self.history_widget)
+        self.curve_hist_mean = self.history_widget.plot(pen=pg.mkPen('b', width=2))
+        self.curve_hist_min = self.history_widget.plot(pen=pg.mkPen((0, 0, 255, 60)))
+        self.curve_hist_max = self.history_widget.plot(pen=pg.mkPen((0, 0, 255, 60)))
+        self.history_widget.addItem(pg.FillBetweenItem(self.curve_hist_min, self.curve_hist_max, brush=(0, 0, 255, 40)))
+
+        self.refresh_nodes()
+
+    def refresh_nodes(self):
+        """Populate the node selector from stored telemetry."""
+        current = self.combo_node.currentText()
+        self.combo_node.clear()
+        self.combo_node.addItems(self.main.db.get_telemetry_nodes())
+        if current:
+            self.combo_node.setCurrentText(current)
+
+    def load_history(self):
+        node_id = self.combo_node.currentText()
+        if not node_id:
+            self.refresh_nodes()
+            node_id = self.combo_node.currentText()
+            if not node_id:
+                return
+
+        span = self.combo_range.currentData()
+        end = time.time()
+        start = end - span
+        rows = self.main.db.get_telemetry_buckets(
+            node_id, self.combo_metric.currentData(), start, end, span / HISTORY_POINTS
+        )
+
+        x = np.array([r['bucket_start'] for r in rows], dtype=float)
+        self.curve_hist_mean.setData(x, np.array([r['mean'] for r in rows], dtype=float))
+        self.curve_hist_min.setData(x, np.array([r['min'] for r in rows], dtype=float))
+        self.curve_hist_max.setData(x, np.array([r['max'] for r in rows], dtype=float))
+        self.history_widget.setTitle(f"{node_id}: {self.combo_metric.currentText()}")
+
+    @metrics.timed("ui.telemetry.batch")
+    def handle_telemetry_batch(self, samples):
+        """Batch entry point used by the update dispatcher."""
+        for node_id, timestamp, voltage, rssi in samples:
+            self.handle_real_telemetry(node_id, timestamp, voltage, rssi)
+        self.redraw_live()
+
+    def handle_real_telemetry(self, node_id, timestamp, voltage, rssi):
+        """Record a live sample; O(1) and allocation-free."""
+        if node_id is None:
+            return
+        node_id = str(node_id)
+        if self.combo_live_node.findText(node_id) < 0:
+            self.combo_live_node.addItem(node_id)
+
+        # Skip missing readings rather than plotting fake zeros
+        if voltage:
+            self.buffers.append(node_id, 'voltage', timestamp, voltage)
+        if rssi:
+            self.buffers.append(node_id, 'rssi', timestamp, rssi)
+
+    def redraw_live(self, *args):
+        """Point the live curves at the selected node's buffers."""
+        node_id = self.combo_live_node.currentText()
+        for metric, curve in (('voltage', self.curve_batt), ('rssi', self.curve_rssi)):
+            buf = self.buffers.get(node_id, metric)
+            if buf is None:
+                curve.setData([], [])
+            else:
+                curve.setData(*buf.view())
@@ -0,0 +1,97 @@
+# tile_scheme.py
+# Serves the map page's offline resources through a custom URL scheme:
+#
+#   meshtiles://tiles/{z}/{x}/{y}      tiles from the MBTiles file (see MBTilesStore)
+#   meshtiles://app/leaflet/<file>     a local copy of Leaflet, if one was downloaded
+#
+# Requests are answered from memory or SQLite inside the browser process's IPC,
+# with no network round trip. The scheme must be registered before the
+# QApplication is created, so main() calls register_tile_scheme() first.
+
+import logging
+import mimetypes
+import os
+
+from PyQt6.QtCore import QBuffer, QIODevice
+from PyQt6.QtWebEngineCore import QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
+
+from meshtastic_mac_client.core.metrics import metrics
+from meshtastic_mac_client.core.tile_store import MBTilesStore, ASSETS_DIR
+
+logger = logging.getLogger(__name__)
+
+SCHEME = b"meshtiles"
+TILE_URL = "meshtiles://tiles/{z}/{x}/{y}"
+LEAFLET_DIR = os.path.join(ASSETS_DIR, "leaflet")
+LEAFLET_URL = "meshtiles://app/leaflet/"
+
+_tiles_path = None   # Set once the scheme is registered with an MBTiles file
+
+def register_tile_scheme(tiles_path):
+    """Register the scheme (before QApplication exists) if there is an offline tile file."""
+    global _tiles_path
+    if not tiles_path or not os.path.exists(tiles_path):
+        return False
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.Flag.SecureScheme |
+                    QWebEngineUrlScheme.Flag.LocalAccessAllowed |
+                    QWebEngineUrlScheme.Flag.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+    _tiles_path = tiles_path
+    logger.info(f"Offline tiles from {tiles_path}")
+    return True
+
+def offline_tiles_path():
+    return _tiles_path
+
+def has_local_leaflet():
+    return os.path.exists(os.path.join(LEAFLET_DIR, "leaflet.js"))
+
+
+class TileSchemeHandler(QWebEngineUrlSchemeHandler):
+    def __init__(self, tiles_path, parent=None):
+        super().__init__(parent)
+        self.store = MBTilesStore(tiles_path)
+        if self.store.mime_type is None:
+            logger.warning(f"Unsupported tile format '{self.store.format}' in {tiles_path}")
+        metrics.gauge("tile_cache_bytes", self.store.cached_bytes)
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        parts = url.path().strip("/").split("/")
+        try:
+            if url.host() == "tiles" and len(parts) == 3:
+                z, x, y = (int(p) for p in parts)
+                with metrics.timer("map.tile"):
+                    data = self.store.get_tile(z, x, y)
+                self._reply(job, self.store.mime_type, data)
+            elif url.host() == "app" and parts[0] == "leaflet":
+                self._reply_file(job, os.path.join(LEAFLET_DIR, *parts[1:]))
+            else:
+                job.fail(QWebEngineUrlRequestJob.Error.UrlInvalid)
+        except Exception as e:
+            logger.error(f"Error serving {url.toString()}: {e}")
+            job.fail(QWebEngineUrlRequestJob.Error.RequestFailed)
+
+    def _reply(self, job, mime_type, data):
+        if data is None or mime_type is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        # The job reads the buffer after we return; parenting keeps it alive until then
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        job.reply(mime_type.encode(), buffer)
+
+    def _reply_file(self, job, path):
+        path = os.path.normpath(path)
+        if not path.startswith(LEAFLET_DIR + os.sep) or not os.path.isfile(path):
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        self._reply(job, mimetypes.guess_type(path)[0] or "application/octet-stream", data)
+
+    def close(self):
+        self.store.close()